@@ -0,0 +1,103 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+
+from metrics import registry
+from timeseries import TimeSeries
+
+LOCAL_ANOMALIES = registry.counter(
+    "local_anomalies_total", "Von der lokalen Erkennung markierte Leistungswerte")
+
+# Umrechnung MAD -> Standardabweichung bei normalverteilten Werten
+MAD_TO_STD = 1.4826
+
+
+class AnomalyDetector:
+    """Lokale Anomalieerkennung auf den Leistungswerten.
+
+    Ergänzt die Markierungen des externen Autoencoders (latestAnomaly), falls
+    dieser hinterherhinkt. Jeder Wert wird gegen einen exponentiell gleitenden
+    Mittelwert und dessen Varianz als z-Wert bewertet (O(1) pro Wert). Ausreißer
+    fließen nur gekappt in die Statistik ein, damit sie sich nicht selbst
+    "wegmitteln". Die letzten ``size`` Werte liegen in einem Ringpuffer; aus ihm
+    werden Lage und Streuung alle ``size`` Werte robust (Median/MAD) neu
+    geschätzt, also amortisiert ebenfalls O(1).
+    """
+
+    def __init__(self, size=600, alpha=0.02, threshold=6.0, warmup=60,
+                 min_scale=5.0, hold=timedelta(seconds=30)):
+        self.ring = np.zeros(size, dtype=np.float64)
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = min(warmup, size)
+        self.min_scale = min_scale  # W, sonst gilt bei konstanter Last jede Änderung als Ausreißer
+        self.hold = hold
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.score = 0.0
+        self.last_time = None
+        self.flagged_at = None
+
+    def add(self, ts, value):
+        """Bewertet einen Messwert und gibt zurück, ob gerade eine Anomalie angezeigt wird."""
+        if value is None or (self.last_time is not None and ts <= self.last_time):
+            return self.active()
+        x = float(value)
+        self.last_time = ts
+        self.ring[self.count % len(self.ring)] = x
+        self.count += 1
+        if self.count <= self.warmup:
+            if self.count == self.warmup:
+                self.__reseed()
+            return False
+
+        scale = max(math.sqrt(self.var), self.min_scale)
+        self.score = (x - self.mean) / scale
+        if abs(self.score) > self.threshold:
+            self.flagged_at = ts
+            LOCAL_ANOMALIES.inc()
+        # Gekappter Wert für EWMA-Mittelwert und -Varianz
+        limit = self.threshold * scale
+        diff = min(max(x - self.mean, -limit), limit)
+        step = self.alpha * diff
+        self.mean += step
+        self.var = (1 - self.alpha) * (self.var + diff * step)
+        if self.count % len(self.ring) == 0:
+            self.__reseed()
+        return self.active()
+
+    def add_series(self, series):
+        """Bewertet alle Werte einer TimeSeries (z.B. die neuen Werte eines Abrufs).
+
+        Von sehr langen Reihen (erster Abruf: 24h) zählen nur die letzten
+        ``size`` Werte; ältere stünden ohnehin nicht mehr im Ringpuffer und
+        lägen weit vor ``hold``.
+        """
+        start = max(len(series) - len(self.ring), 0)
+        tail = TimeSeries(series.times[start:], series.values[start:])
+        for ts, value in zip(tail.datetimes(), tail.values.tolist()):
+            self.add(ts, value)
+        return self.active()
+
+    def __reseed(self):
+        # Robuste Neuschätzung über den (ggf. erst teilweise gefüllten) Ringpuffer
+        values = self.ring[:min(self.count, len(self.ring))]
+        median = float(np.median(values))
+        mad = float(np.median(np.abs(values - median)))
+        self.mean = median
+        self.var = (MAD_TO_STD * mad) ** 2
+
+    def active(self):
+        """Anomalie innerhalb von ``hold`` vor dem letzten Messwert."""
+        return (self.flagged_at is not None
+                and self.last_time - self.flagged_at <= self.hold)
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.score = 0.0
+        self.last_time = None
+        self.flagged_at = None
@@ -1,27 +1,97 @@
-import os
+from startup_profile import StartupProfile
+
+# Vor allen übrigen Imports anlegen, damit --profile-startup sie mitmisst.
+# matplotlib, influxdb_client und qdarkstyle werden erst bei Bedarf geladen.
+startup_profile = StartupProfile()
+
+import asyncio
 import sys
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
-import matplotlib.dates as mdates
-import matplotlib.ticker as ticker
-import qdarkstyle
+import qasync
 from dotenv import load_dotenv
-from influxdb_client import InfluxDBClient
-from matplotlib.backends.backend_qt5agg import \
-    FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
-from PyQt5.QtGui import QFont, QFontDatabase
-from PyQt5.QtWidgets import (QApplication, QFrame, QGridLayout, QGroupBox,
-                             QHBoxLayout, QLabel, QLCDNumber, QProgressBar,
-                             QPushButton, QSizePolicy, QSpacerItem,
+from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QFontDatabase, QKeySequence
+from PyQt5.QtWidgets import (QApplication, QComboBox, QFrame,
+                             QGraphicsOpacityEffect, QGridLayout, QGroupBox,
+                             QHBoxLayout, QInputDialog, QLabel,
+                             QLCDNumber, QListWidget, QPushButton, QShortcut, QSizePolicy, QSpacerItem,
                              QStackedWidget, QVBoxLayout, QWidget)
 
+from channels import ChannelRegistry
+from countdown import RefreshCountdown
+from anomaly import AnomalyDetector
+from diagnostics import DiagnosticsView, LoopMonitor
+from downsample import choose_window
+from influx_client import InfluxService
+from ingest import LineProtocolListener
 from local_storage import DataHandler
-import matplotlib.pyplot as plt
+from metrics import registry, serve_metrics
+from remote import (DashboardClient, RemoteEnergyFetcher, RemotePlotFetcher,
+                    RemoteRollupFetcher, RemoteStatsFetcher)
+from pipeline import (ROLE_FIELDS, EnergyFetcher, PlotFetcher, RollupFetcher,
+                      StatsFetcher)
+from sample_cache import SampleCache
+from scheduler import FetchJob, FetchScheduler
+from sessions import SessionLog
+from snapshot import SnapshotStore
+from tariff import WH_PER_KWH, CostEngine, Tariff
+from timeseries import TimeSeries
+from view_binding import ViewBinder
+
+startup_profile.mark("Module importiert")
+
+SIGNAL_DELAY_SECONDS = registry.histogram(
+    "stats_signal_delay_seconds", "Zeit vom emit im Worker bis zum Slot im GUI-Thread")
+PLOT_SIGNAL_DELAY_SECONDS = registry.histogram(
+    "plot_signal_delay_seconds", "Zeit vom emit im Worker bis zum Slot im GUI-Thread")
+DISPLAY_SECONDS = registry.histogram(
+    "update_display_seconds", "Dauer von update_display")
+PLOT_DRAW_SECONDS = registry.histogram(
+    "update_plot_seconds", "Dauer von update_plot im GUI-Thread (ohne Zeichnen)")
+
+# Wählbare Zeiträume der Verlaufsseite
+PLOT_RANGES = (
+    ("12h", timedelta(hours=12)),
+    ("24h", timedelta(days=1)),
+    ("7T", timedelta(days=7)),
+    ("30T", timedelta(days=30)),
+)
+
+# Ab diesen Marken ist der Start abgeschlossen (--profile-startup)
+STARTUP_MILESTONES = ("Erstes Bild", "Erste Daten angezeigt")
+
+# Anzeigewerte und die Felder, aus denen sie berechnet werden. Ist eines davon
+# veraltet, wird das Widget blass dargestellt (Kanäle kommen in MyApp dazu).
+# Die Anomalie-Flags fehlen hier bewusst: sie verfallen (siehe ANOMALY_FIELDS).
+STALE_VIEWS = {
+    "zaehlerstand": ("currentCounter",),
+    "ts_counter": ("currentCounter",),
+    "zaehlerstand_ein": ("currentCounterDelivery",),
+    "current": ("latestValue",),
+    "ts_current": ("latestValue",),
+    "min": ("minValue",),
+    "max": ("maxValue",),
+    "avg": ("avgValue",),
+    "today": ("currentCounter", "startofdayCounter"),
+}
+
+
+# Anomalie-Flags des Autoencoders; ohne aktuelle Zeile gilt "keine Anomalie"
+ANOMALY_FIELDS = ("latestError", "latestAnomaly", "recentAnomaly")
+
+
+def mark_stale(widget, stale):
+    """Stellt ein Widget mit veraltetem Wert blass dar."""
+    if stale:
+        effect = QGraphicsOpacityEffect(widget)
+        effect.setOpacity(0.35)
+        widget.setGraphicsEffect(effect)
+    else:
+        widget.setGraphicsEffect(None)
 
-plt.style.use('dark_background')
 glow_style = """
 QLabel {
     color: #f8f8f2;
@@ -32,9 +102,6 @@ QLabel {
     text-shadow: 0 0 10px rgba(255, 255, 255, 0.7);
 }
 """
-def watt_formatter(x, pos):
-    return f"{int(x)} W"
-
 def load_stylesheet(file_path):
     """Lädt ein Stylesheet aus einer Datei in einen String."""
     try:
@@ -45,182 +112,107 @@ def load_stylesheet(file_path):
         return ""
 
 
-class DataThread(QThread):
-    # Signal zum Senden der Daten an das Hauptfenster
-    dataFetched = pyqtSignal(dict)
+class DataThread(QObject):
+    # run() wird vom FetchScheduler in dessen Thread-Pool aufgerufen
+    # Signal zum Senden der Daten an das Hauptfenster, dazu die neuen
+    # Leistungswerte (TimeSeries) für die lokale Anomalieerkennung und der
+    # Zeitpunkt, zu dem die Werte bestätigt sind (None = nur aus einem Cache)
+    dataFetched = pyqtSignal(dict, object, object)
 
-    def __init__(self, url):
+    def __init__(self, influx, channels, cache=None, client=None):
         super().__init__()
-        self.url = url
+        # Mit client (--server URL) kommen die Daten vom Headless-Server statt aus der InfluxDB
+        if client is not None:
+            self.fetcher = RemoteStatsFetcher(client)
+        else:
+            self.fetcher = StatsFetcher(influx, channels, cache)
+        self.stats = self.fetcher.stats
+
+    def restore(self):
+        return self.fetcher.restore()
+
+    def flush(self):
+        self.fetcher.flush()
 
     def run(self):
-        client = InfluxDBClient(
-            url=os.environ.get("influx_url"),
-            token=os.environ.get("influx_token"),
-            org=os.environ.get("influx_org"),
-        )
-        query_api = client.query_api()
-        query = """
-import "date"
-
-dataWattage = from(bucket: "Strom")
-  |> range(start: -24h)
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "value")
-  |> filter(fn: (r) => r["uuid"] == "1810eb97-3799-46d8-9764-2ab1c4ea7cb4")
-  |> group(columns: ["uuid"])
-
-// Tageszähler (Bezug)
-dataCounter = from(bucket: "Strom")
-  |> range(start: date.truncate(t: now(), unit: 1d), stop: now())
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "value")
-  |> filter(fn: (r) => r["uuid"] == "22792059-416a-4117-8b3a-420e34a841a1")
-  |> group(columns: ["uuid"])
-
-// Tageszähler (Einspeisung)
-dataCounterDeliver = from(bucket: "Strom")
-  |> range(start: date.truncate(t: now(), unit: 1d), stop: now())
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "value")
-  |> filter(fn: (r) => r["uuid"] == "86ef6af6-c13a-4084-beed-6183b44c0a17")
-  |> group(columns: ["uuid"])
-
-// ---- Autoencoder: letzter Fehler ----
-latestError = from(bucket: "Strom")
-  |> range(start: -10m)
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "error")
-  |> filter(fn: (r) => r["uuid"] == "1810eb97-3799-46d8-9764-2ab1c4ea7cb4")
-  |> last()
-  |> set(key: "_field", value: "latestError")
-
-// ---- Autoencoder: aktueller Anomaly-Indikator (0/1) ----
-latestAnomaly = from(bucket: "Strom")
-  |> range(start: -10m)
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "anomaly")
-  |> filter(fn: (r) => r["uuid"] == "1810eb97-3799-46d8-9764-2ab1c4ea7cb4")
-  |> last()
-  |> set(key: "_field", value: "latestAnomaly")
-
-// ---- Autoencoder: War in den letzten 5 Minuten eine Anomalie? ----
-recentAnomaly = from(bucket: "Strom")
-  |> range(start: -5m)
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "anomaly")
-  |> filter(fn: (r) => r["uuid"] == "1810eb97-3799-46d8-9764-2ab1c4ea7cb4")
-  |> max()            // wenn max == 1 → es gab eine Anomalie
-  |> set(key: "_field", value: "recentAnomaly")
-
-// ---- Bestehende Werte ----
-latestCounterDelivery = dataCounterDeliver |> last() |> set(key: "_field", value: "currentCounterDelivery")
-latestCounter = dataCounter |> last() |> set(key: "_field", value: "currentCounter")
-startCounter = dataCounter |> first() |> set(key: "_field", value: "startofdayCounter")
-minValue = dataWattage |> min() |> set(key: "_field", value: "minValue")
-maxValue = dataWattage |> max() |> set(key: "_field", value: "maxValue")
-avgValue = dataWattage |> mean() |> set(key: "_field", value: "avgValue")
-latestValue = dataWattage |> last() |> set(key: "_field", value: "latestValue")
-
-// ---- Alle Werte zusammenführen ----
-union(tables: [
-  minValue,
-  maxValue,
-  avgValue,
-  latestValue,
-  latestCounter,
-  startCounter,
-  latestCounterDelivery,
-  latestError,
-  latestAnomaly,
-  recentAnomaly
-])
-"""
-        result = query_api.query(query=query)
-        data_dict = {}
-
-        for table in result:
-            for record in table.records:
-                # Verwende _field als Schlüssel im Dictionary
-                field_key = (
-                    record.get_field()
-                )  # Dies könnte 'minValue', 'maxValue' oder 'currentCounter' sein, je nachdem wie Sie 'set' in Ihrer Flux-Abfrage verwenden
-                if field_key:
-                    data_dict[field_key] = {
-                        "_time": record.get_time(),
-                        "_value": record.get_value(),
-                        "_measurement": record.get_measurement(),
-                        "uuid": record.values.get("uuid"),
-                    }
-
-        client.close()
-        self.dataFetched.emit(data_dict)
-
-class PlotDataThread(QThread):
-    dataFetchedForPlot = pyqtSignal(list, list)  # x, y Werte für Plot
-
-    def __init__(self, url):
+        data = self.fetcher.fetch()
+        self.emitted_at = time.perf_counter()
+        self.dataFetched.emit(data, self.fetcher.new_samples, self.fetcher.fetched_at)
+
+class PlotDataThread(QObject):
+    # run() wird vom FetchScheduler in dessen Thread-Pool aufgerufen
+    # TimeSeries mit den neuen Punkten; replace_from gibt an, ab wann vorhandene
+    # Punkte ersetzt werden (None = kompletter Neuaufbau). Dazu (Zeitraum,
+    # Fenster in Sekunden), für den die Punkte abgefragt wurden.
+    dataFetchedForPlot = pyqtSignal(object, object)
+
+    def __init__(self, influx, channels, cache=None, client=None):
         super().__init__()
-        self.url = url
+        if client is not None:
+            self.fetcher = RemotePlotFetcher(client)
+        else:
+            self.fetcher = PlotFetcher(influx, channels, cache)
 
-    def run(self):
-        client = InfluxDBClient(
-            url=os.environ.get("influx_url"),
-            token=os.environ.get("influx_token"),
-            org=os.environ.get("influx_org"),
-        )
-        query_api = client.query_api()
-        query = """
-from(bucket: "Strom")
-  |> range(start: -12h)
-  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
-  |> filter(fn: (r) => r["_field"] == "value")
-  |> filter(fn: (r) => r["uuid"] == "1810eb97-3799-46d8-9764-2ab1c4ea7cb4")
-  |> aggregateWindow(every: 1m, fn: mean, createEmpty: false)
-"""
-        result = query_api.query(query=query)
-        x_data = []
-        y_data = []
-        for table in result:
-            for record in table.records:
-                x_data.append(record.get_time())
-                y_data.append(record.get_value())
-
-        client.close()
-        x_data = [self.__convert_utc_to_local(x) for x in x_data]
-        self.dataFetchedForPlot.emit(x_data, y_data)
-
-    def __convert_utc_to_local(self, utc_time):
-        # Stelle sicher, dass die Zeit als UTC markiert ist
-        utc_time = utc_time.replace(tzinfo=timezone.utc)
+    def restore(self):
+        return self.fetcher.restore()
 
-        # Konvertiere die Zeit in die gewünschte Zeitzone ('Europe/Berlin')
-        local_time = utc_time.astimezone(ZoneInfo("Europe/Berlin"))
-        return local_time
+    def plot_range(self):
+        return (self.fetcher.span, self.fetcher.every)
 
-class MplCanvas(FigureCanvas):
-    def __init__(self, parent=None, dpi=100):
-        # Berechne die Größe in Zoll basierend auf der maximalen Pixelgröße und der DPI
-        width_in_inches = 500 / dpi  # Max. 500 Pixel breit
-        height_in_inches = 300 / dpi  # Max. 250 Pixel hoch
-        
-        # Erstelle eine Figur mit den berechneten Dimensionen
-        fig = Figure(figsize=(width_in_inches, height_in_inches), dpi=dpi)
-        self.axes = fig.add_subplot(111)
-        
-        super(MplCanvas, self).__init__(fig)
+    def run(self):
+        series = self.fetcher.fetch()
+        self.emitted_at = time.perf_counter()
+        self.dataFetchedForPlot.emit(series, self.plot_range())
 
 class MyApp(QWidget):
-    def __init__(self, kiosk_mode=False):
+    def __init__(self, kiosk_mode=False, stream_port=None, influx=None, cache=None,
+                 local_anomaly=False, server=None):
         super().__init__()
         if kiosk_mode:
             # Setze das Fenster in den Vollbildmodus und entferne die Dekoration
             self.showFullScreen()
             self.setWindowFlags(Qt.FramelessWindowHint)
         self.cumcounter = DataHandler()
+        # Kanäle (UUID, Einheit, Skalierung, Seite) aus channels.json
+        self.channels = ChannelRegistry.load()
+        # Gemeinsamer InfluxDB-Client für alle Abfrage-Threads (benchmark.py
+        # übergibt einen Client für die nachgebildete InfluxDB)
+        self.influx = influx if influx is not None else InfluxService()
+        # Client-Modus: Daten vom Headless-Server (server.py), keine eigenen Influx-Abfragen
+        self.client = DashboardClient(server) if server else None
+        # Lokaler Cache der abgerufenen Messwerte (für schnellen Start)
+        self.cache = cache if cache is not None else SampleCache()
+        # Kosten nach Tarif (tariff.json) aus 15-Minuten-Zählerständen
+        self.costs = CostEngine(Tariff.load(), self.cache)
+        self.costs.restore()
+        # Benannte kumulative Zähler (mehrere gleichzeitig) samt Verlauf
+        self.sessions = SessionLog(self.cumcounter, self.costs)
         self.zaehlerstand = 0
         self.zaehlerstand_ein = 0
-        self.canvas = MplCanvas(self, dpi=100)
+        # Streaming-Modus: Messwerte werden per UDP gepusht statt alle 2s abgefragt
+        self.stream_port = stream_port
+        self.stats_interval = 600 if stream_port is not None else 2
+        # Letzter bekannter Stand je Feld; unvollständige Abrufe frieren die
+        # Anzeige nicht ein, lange nicht bestätigte Werte werden markiert
+        stream_fields = list(ROLE_FIELDS.values()) + ["latestValue"] + [
+            channel.key for channel in self.channels]
+        self.snapshot = SnapshotStore(
+            stale_after=timedelta(seconds=max(30, 3 * self.stats_interval)),
+            overrides={field: timedelta(seconds=60) for field in stream_fields}
+            if stream_port is not None else None,
+            expiring=ANOMALY_FIELDS)
+        self.stale_views = dict(STALE_VIEWS)
+        for channel in self.channels.paged():
+            self.stale_views[channel.key] = (channel.key,)
+        self.stream_times = []
+        self.stream_values = []
+        # Optionale lokale Anomalieerkennung zusätzlich zum externen Autoencoder
+        self.anomalies = AnomalyDetector() if local_anomaly else None
+        # Der Plot wird erst mit der Verlaufsseite erzeugt (siehe build_history_page)
+        # und erst dann abgefragt
+        self.canvas = None
+        self.plot_job = None
+        self.page_builders = {}  # Seite -> (Titel, Aufbaufunktion, Inhalt-Layout)
         self.initUI()
 
     def initUI(self):
@@ -231,6 +223,7 @@ class MyApp(QWidget):
             "wwDigital.ttf")  # Pfad zur Schriftartdatei
         font_name = QFontDatabase.applicationFontFamilies(
             font_id)[0]  # Name der geladenen Schriftart
+        self.font_name = font_name
         # Größe der Schriftart festlegen
         self.custom_si_font = QFont(font_name, 14)
         self.custom_info_font = QFont(font_name, 9)
@@ -238,13 +231,18 @@ class MyApp(QWidget):
         self.ts_label_current.setFont(self.custom_info_font)
         self.ts_label_counter = QLabel("Warten auf Daten")
         self.ts_label_counter.setFont(self.custom_info_font)
+        # Einheit, Skalierung und Stellen der festen Seiten kommen aus den Kanälen
+        self.import_channel = self.channels.fixed("import")
+        self.export_channel = self.channels.fixed("export")
+        self.power_channel = self.channels.fixed("power")
+
         # Zählerstand
         self.lcd_zaehlerstand = QLCDNumber(self)
         self.lcd_zaehlerstand.setSizePolicy(
             QSizePolicy.Expanding, QSizePolicy.Expanding
         )
         # Anzahl der Ziffern, die angezeigt werden können
-        self.lcd_zaehlerstand.setDigitCount(6)
+        self.lcd_zaehlerstand.setDigitCount(self.import_channel.digits)
         self.lcd_zaehlerstand.display(000000)  # Beispielwert
 
 
@@ -255,7 +253,7 @@ class MyApp(QWidget):
             QSizePolicy.Expanding, QSizePolicy.Expanding
         )
         # Anzahl der Ziffern, die angezeigt werden können
-        self.lcd_zaehlerstand_ein.setDigitCount(6)
+        self.lcd_zaehlerstand_ein.setDigitCount(self.export_channel.digits)
         self.lcd_zaehlerstand_ein.display(000000)  # Beispielwert
 
         self.lcd_kulm = QLCDNumber(self)
@@ -270,7 +268,7 @@ class MyApp(QWidget):
         self.lcd_current.setSizePolicy(
             QSizePolicy.Expanding, QSizePolicy.Expanding)
         # Anzahl der Ziffern, die angezeigt werden können
-        self.lcd_current.setDigitCount(6)
+        self.lcd_current.setDigitCount(self.power_channel.digits)
         self.lcd_current.display(88888)  # Beispielwert
 
         # Hauptlayout
@@ -282,86 +280,26 @@ class MyApp(QWidget):
 
         # Stacked Widget
         self.stackedWidget = QStackedWidget(self)
+        self.stackedWidget.currentChanged.connect(self.build_page)
+        self.stackedWidget.currentChanged.connect(self.follow_plot_page)
 
         content_layout1 = self.create_page("Zählerstand Bezug")
-        content_layout1.addWidget(self.get_si('kWh'), alignment=Qt.AlignRight)
+        content_layout1.addWidget(self.get_si(self.import_channel.unit), alignment=Qt.AlignRight)
         content_layout1.addWidget(self.lcd_zaehlerstand)
         content_layout1.addWidget(self.ts_label_counter)
 
         content_layout1a = self.create_page("Zählerstand Einspeisung")
-        content_layout1a.addWidget(self.get_si('Wh'), alignment=Qt.AlignRight)
+        content_layout1a.addWidget(self.get_si(self.export_channel.unit), alignment=Qt.AlignRight)
         content_layout1a.addWidget(self.lcd_zaehlerstand_ein)
         content_layout1a.addWidget(self.ts_label_counter)
 
         content_layout2 = self.create_page("Leistungsaufnahme")
-        content_layout2.addWidget(self.get_si('W'), alignment=Qt.AlignRight)
+        content_layout2.addWidget(self.get_si(self.power_channel.unit), alignment=Qt.AlignRight)
         content_layout2.addWidget(self.lcd_current)
         content_layout2.addWidget(self.ts_label_current)
 
-        content_layout3 = self.create_page("Tagesstatistik")
-
-        # self.lcd_min = QLCDNumber(self)
-        # self.lcd_max = QLCDNumber(self)
-        # self.lcd_avg = QLCDNumber(self)
-        # self.lcd_w24 = QLCDNumber(self)
-        # self.lcd_wtoday = QLCDNumber(self)
-        # self.label_c24 = QLabel('---,--- €')
-        # self.label_ctoday = QLabel('---,--- €')
-
-        p3_top_container = QWidget(self)
-        p3_top_layout = QVBoxLayout(p3_top_container)
-
-        groupBox = QGroupBox(
-            "GroupBox", self
-        )  # Titel der GroupBox kann angepasst werden
-        gridLayout = QGridLayout(groupBox)
-
-        # Verbrauch heute
-        labelToday = QLabel("Verbrauch heute")
-        gridLayout.addWidget(labelToday, 0, 0)
-
-        self.consumptionToday = QLabel("----")
-        self.consumptionToday.setStyleSheet(glow_style)
-        self.consumptionToday.setFont(QFont(font_name, 20))
-        gridLayout.addWidget(self.consumptionToday, 0, 1)
-
-        gridLayout.addWidget(QLabel("kWh"), 0, 2)
-
-        self.labelTodayCost = QLabel("")
-        self.labelTodayCost.setStyleSheet(glow_style)
-        self.labelTodayCost.setFont(QFont(font_name, 20))
-        gridLayout.addWidget(self.labelTodayCost, 0, 3)
-        gridLayout.addWidget(QLabel('€'), 0, 4)
-
-        p3_top_layout.addWidget(groupBox)
-
-        # QGroupBox für Max-Wert
-        self.groupBoxMax = QGroupBox("MAX(P) der letzten 24h")
-        verticalLayoutMax = QVBoxLayout(self.groupBoxMax)
-        self.maxW = QLabel("12345 W")
-        self.maxW.setFont(QFont("Arial", 12))
-
-        self.groupBoxMin = QGroupBox("MIN(P) der letzten 24h")
-        verticalLayoutMin = QVBoxLayout(self.groupBoxMin)
-        self.minW = QLabel("12345 W")
-        self.minW.setFont(QFont("Arial", 12))
-        verticalLayoutMin.addWidget(self.minW)
-
-        p3_top_layout.addWidget(self.groupBoxMax)
-
-        # QGroupBox für Avg-Wert
-        self.groupBoxAvg = QGroupBox("Ø(P) der letzten 24h")
-        verticalLayoutAvg = QVBoxLayout(self.groupBoxAvg)
-        self.avgW = QLabel("12345 W")
-        self.avgW.setFont(QFont("Arial", 12))
-
-        verticalLayoutAvg.addWidget(self.avgW)
-        verticalLayoutMax.addWidget(self.maxW)
-        p3_top_layout.addWidget(self.groupBoxMin)
-
-        p3_top_layout.addWidget(self.groupBoxAvg)
-
-        content_layout3.addWidget(p3_top_container)
+        # Statistik und Verlauf werden erst beim ersten Anzeigen aufgebaut
+        self.create_page("Tagesstatistik", self.build_statistics_page)
 
         content_layout4 = self.create_page("Kumulativer Zähler")
         self.lable_cumstat = self.get_si('8888888888888888888888888888888')
@@ -369,6 +307,10 @@ class MyApp(QWidget):
 
         controll_container_widget = QWidget(self)
         controll_container_layout = QHBoxLayout(controll_container_widget)
+        # Auswahl der laufenden Sitzung, letzter Eintrag startet eine neue
+        self.session_box = QComboBox(self)
+        self.session_box.currentIndexChanged.connect(self.update_session_display)
+        controll_container_layout.addWidget(self.session_box)
         self.startStopButton = QPushButton("Start / Stop")
         self.startStopButton.clicked.connect(self.startStopClicked)
         controll_container_layout.addWidget(self.startStopButton)
@@ -377,17 +319,39 @@ class MyApp(QWidget):
 
         content_layout4.addWidget(self.lcd_kulm)
 
-        content_layout5 = self.create_page("Verlauf")
-    
-        content_layout5.addWidget(self.canvas)
+        # Abgeschlossene Sitzungen (Verbrauch und Kosten aus dem Zählerstand-Index)
+        self.session_history = QListWidget(self)
+        self.session_history.setMaximumHeight(80)
+        content_layout4.addWidget(self.session_history)
+        self.refresh_sessions()
+
+        # Zusätzliche Seiten für konfigurierte Kanäle
+        self.channel_lcds = {}
+        for channel in self.channels.paged():
+            channel_layout = self.create_page(channel.page)
+            channel_layout.addWidget(self.get_si(channel.unit), alignment=Qt.AlignRight)
+            lcd = QLCDNumber(self)
+            lcd.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+            lcd.setDigitCount(channel.digits)
+            lcd.display(0)
+            channel_layout.addWidget(lcd)
+            self.channel_lcds[channel.name] = lcd
+
+        # Tages-/Monatswerte aus dem lokalen Cache
+        self.create_page("Kalender", self.build_calendar_page)
+        self.create_page("Verlauf", self.build_history_page)
+        self.page_count = self.stackedWidget.count()
+
+        # Versteckte Diagnoseseite (F12)
+        self.create_page("Diagnose", self.build_diagnostics_page)
+        self.diagnostics_shortcut = QShortcut(QKeySequence("F12"), self)
+        self.diagnostics_shortcut.activated.connect(self.toggle_diagnostics)
 
         middle_layout.addWidget(self.stackedWidget)
+        self.bind_view()
 
-        # ProgressBar
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setValue(0)
-        self.progress_bar.setMaximum(100)
-        self.progress_bar.setFormat("")
+        # ProgressBar: zeigt die Zeit bis zur nächsten Abfrage (steuert sie nicht)
+        self.progress_bar = RefreshCountdown(max_fps=10)
         middle_layout.addWidget(self.progress_bar)
 
         # Button links
@@ -413,66 +377,224 @@ class MyApp(QWidget):
         # self.timer.timeout.connect(self.fetch_data)
         self.timer.start()
 
-        # Fortschrittsbalken-Timer: Aktualisiert die ProgressBar jede Sekunde
-        self.progress_value = 0
-        self.progress_timer = QTimer(self)
-        # 1000 Millisekunden == 1 Sekunde
-        self.progress_timer.setInterval(20)
-        self.progress_timer.timeout.connect(self.update_progress_bar)
-        self.progress_timer.start()
-
         # Thread für Netzwerkanfragen
-        self.dataThread = DataThread(
-            "http://localhost:5000/api/energy/consumption")
-        self.dataThread.dataFetched.connect(self.update_display)
-        self.plotDataThread = PlotDataThread("http://localhost:8086")
-        self.plotDataThread.dataFetchedForPlot.connect(self.update_plot)
-        self.start_plot_data_thread()
-        self.plot_timer = QTimer(self)
-        #self.plot_timer.setInterval(10000)
-        self.plot_timer.setInterval(600000) 
-        self.plot_timer.timeout.connect(self.start_plot_data_thread)
-        self.plot_timer.start()
-
-
-        
-
-    def update_plot(self, x_data, y_data):
-        # Hier kannst du die Daten in einem Matplotlib-Plot darstellen
-        self.canvas.axes.clear()  # Vorhandene Daten im Plot löschen
-        self.canvas.axes.plot(x_data, y_data)  # Daten als rote Linie plotten
-        self.canvas.axes.xaxis.set_major_formatter(mdates.DateFormatter('%Hh', tz=ZoneInfo("Europe/Berlin")))
-        self.canvas.axes.xaxis.set_major_locator(mdates.HourLocator(interval=1))
-        self.canvas.axes.yaxis.set_major_formatter(ticker.FuncFormatter(watt_formatter))
-        self.canvas.draw()
-
-    def start_plot_data_thread(self):
-        if not self.plotDataThread.isRunning():
-            self.plotDataThread.start()
+        self.dataThread = DataThread(self.influx, self.channels, self.cache, self.client)
+        self.dataThread.dataFetched.connect(self.on_data_fetched)
+        self.plotDataThread = PlotDataThread(self.influx, self.channels, self.cache, self.client)
+        self.plotDataThread.dataFetchedForPlot.connect(self.on_plot_fetched)
+
+        # Anzeige sofort aus dem lokalen Cache füllen, aus der InfluxDB wird
+        # danach nur noch der fehlende Rest nachgeladen
+        # (gilt bis zur ersten Antwort als veraltet)
+        self.update_display(self.dataThread.restore(), confirmed=False)
+
+        if self.stream_port is not None:
+            self.listener = LineProtocolListener(port=self.stream_port)
+            self.listener.sampleReceived.connect(self.on_stream_sample)
+            self.listener.start()
+            # Gestreamte Werte gesammelt in den lokalen Cache schreiben
+            self.stream_flush_timer = QTimer(self)
+            self.stream_flush_timer.setInterval(60000)
+            self.stream_flush_timer.timeout.connect(self.flush_stream_samples)
+            self.stream_flush_timer.start()
+
+        # Alle Abfragen laufen über einen gemeinsamen Scheduler. Im Streaming-Modus
+        # kommen Zählerstand zu Tagesbeginn und Anomalie-Flags weiterhin aus der
+        # InfluxDB, aber nur noch alle 10 Minuten.
+        self.scheduler = FetchScheduler(max_workers=2)
+        stats_job = self.scheduler.add_job(FetchJob(
+            "stats", self.dataThread.run,
+            interval=self.stats_interval, timeout=10, jitter=0.2))
+        # Im Client-Modus lädt der Headless-Server beides aus der InfluxDB nach,
+        # hier wird nur sein Ergebnis übernommen
+        if self.client is None:
+            self.energyFetcher = EnergyFetcher(self.influx, self.channels, self.costs)
+            self.rollupFetcher = RollupFetcher(self.influx, self.channels, self.cache)
+        else:
+            self.energyFetcher = RemoteEnergyFetcher(self.client, self.costs)
+            self.rollupFetcher = RemoteRollupFetcher(self.client, self.cache)
+        # Lücken in den 15-Minuten-Zählerständen für die Kosten schließen
+        self.scheduler.add_job(FetchJob(
+            "energy", self.energyFetcher.fetch, interval=3600, timeout=60, jitter=5,
+            background=True))
+        # Abgeschlossene Tage für die Kalenderseite zusammenfassen
+        self.scheduler.add_job(FetchJob(
+            "rollups", self.rollupFetcher.fetch, interval=3600, timeout=300, jitter=10,
+            background=True))
+        self.progress_bar.follow(stats_job)
+        self.scheduler.start()
+
+        # Werte veralten auch, wenn gar keine Antworten mehr kommen
+        self.stale_timer = QTimer(self)
+        self.stale_timer.setInterval(5000)
+        self.stale_timer.timeout.connect(self.mark_stale_views)
+        self.stale_timer.start()
+
+        registry.gauge("scheduler_queue_depth", self.scheduler.queue_depth,
+                       "Wartende Abfragen im FetchScheduler")
+        registry.gauge("scheduler_missed_deadlines", lambda: self.scheduler.metrics()["missed_deadlines"],
+                       "Verpasste Abfragetermine")
+        registry.gauge("influx_reconnects_total", lambda: self.influx.reconnect_count,
+                       "Neu aufgebaute InfluxDB-Verbindungen")
+        registry.gauge("snapshot_stale_fields", lambda: len(self.snapshot.stale_fields()),
+                       "Anzeigewerte, die zu lange nicht bestätigt wurden")
+        registry.gauge("view_applied_total", lambda: self.view.applied,
+                       "An Widgets weitergegebene Werte")
+        registry.gauge("view_skipped_total", lambda: self.view.skipped,
+                       "Unveränderte oder vorgemerkte Werte")
+        self.loop_monitor = LoopMonitor(self)
+        self.loop_monitor.start()
+
+
+    def on_data_fetched(self, data, samples, fetched_at):
+        SIGNAL_DELAY_SECONDS.observe(time.perf_counter() - self.dataThread.emitted_at)
+        if self.anomalies is not None:
+            self.anomalies.add_series(samples)
+        with DISPLAY_SECONDS.time():
+            self.update_display(data, confirmed=fetched_at is not None, confirmed_at=fetched_at)
+
+    def on_plot_fetched(self, series, plot_range):
+        PLOT_SIGNAL_DELAY_SECONDS.observe(time.perf_counter() - self.plotDataThread.emitted_at)
+        self.update_plot(series, plot_range)
+
+    def update_plot(self, series, plot_range=None):
+        # Übergibt nur an den Render-Thread, matplotlib läuft nicht im GUI-Thread
+        with PLOT_DRAW_SECONDS.time():
+            # Anderer Zeitraum: Linie leeren, die Punkte kommen dann komplett
+            if plot_range is not None and plot_range != self.canvas.plot_range:
+                self.canvas.set_range(*plot_range)
+            # Neue Punkte an die bestehende Linie anhängen (kein kompletter Neuaufbau)
+            self.canvas.update_series(series)
+
+    def select_plot_range(self, span):
+        self.plotDataThread.fetcher.set_range(span, self.canvas.pixels)
+        # Gröbere Fenster ändern sich seltener, entsprechend seltener abfragen
+        every, _ = choose_window(span, self.canvas.pixels)
+        self.plot_job.interval = max(10, every // 6)
+        # Verdeckt wird erst beim nächsten Anzeigen abgefragt (siehe follow_plot_page)
+        if not self.plot_job.paused:
+            self.scheduler.trigger("plot")
+
+    def on_plot_resized(self, pixels):
+        # Neu abfragen nur, wenn sich bei der neuen Breite das Fenster ändert
+        fetcher = self.plotDataThread.fetcher
+        if self.plot_job is not None and choose_window(fetcher.span, pixels)[0] != fetcher.every:
+            self.select_plot_range(fetcher.span)
+
+    def on_stream_sample(self, uuid, ts, value):
+        # Gestreamte Messwerte laufen über denselben Weg (update_display) wie abgefragte
+        record = {
+            "_time": ts,
+            "_value": value,
+            "_measurement": "vz_measurement",
+            "uuid": uuid,
+        }
+        channel = self.channels.by_uuid(uuid)
+        if channel is None:
+            return
+        if channel.role == "power":
+            if not self.dataThread.stats.add(ts, value):
+                return
+            self.dataThread.stats.evict()
+            if self.anomalies is not None:
+                self.anomalies.add(ts, value)
+            self.stream_times.append(ts.timestamp())
+            self.stream_values.append(value)
+        data = {channel.key: record}
+        if channel.role in ROLE_FIELDS:
+            data[ROLE_FIELDS[channel.role]] = record
+        if channel.role == "power":
+            data.update(self.dataThread.stats.as_records("vz_measurement", uuid))
+        with DISPLAY_SECONDS.time():
+            self.update_display(data)
+
+    def flush_stream_samples(self):
+        if not self.stream_times:
+            return
+        self.cache.add_samples(
+            "wattage", TimeSeries.from_epoch(self.stream_times, self.stream_values))
+        self.stream_times = []
+        self.stream_values = []
 
     def startStopClicked(self):
         # Funktion, die ausgelöst wird, wenn der "Start / Stop" Button geklickt wird
-        if self.cumcounter.data.get('cum_counter_start_value', None) is not None and self.cumcounter.data.get('cum_counter_start_time', None) is not None:
-            self.cumcounter.reset_data()
-            self.lcd_kulm.display(0)
-            self.lable_cumstat.setText(
-                'Gestoppt')
+        name = self.session_box.currentData()
+        if name is not None:
+            self.sessions.stop(name, self.zaehlerstand)
+            self.view.set("kulm", 0)
+            self.view.set("cumstat", 'Gestoppt')
+            self.refresh_sessions()
         else:
-            self.cumcounter.set_data(self.zaehlerstand)
-            self.lable_cumstat.setText(
-                'Gestartet...')
+            name, ok = QInputDialog.getText(
+                self, "Neue Sitzung", "Name:", text=self.sessions.next_name())
+            if not ok or not name.strip() or name.strip() in self.sessions.running():
+                return
+            self.sessions.start(name.strip(), self.zaehlerstand)
+            self.refresh_sessions(select=name.strip())
+            self.view.set("cumstat", 'Gestartet...')
+
+    def refresh_sessions(self, select=None):
+        """Füllt Sitzungsauswahl und Verlauf neu."""
+        current = select or self.session_box.currentData()
+        self.session_box.blockSignals(True)
+        self.session_box.clear()
+        for name in sorted(self.sessions.running()):
+            self.session_box.addItem(name, name)
+        self.session_box.addItem("Neue Sitzung…", None)
+        index = self.session_box.findData(current) if current is not None else -1
+        self.session_box.setCurrentIndex(max(index, 0))
+        self.session_box.blockSignals(False)
+
+        self.session_history.clear()
+        for entry in self.sessions.history(limit=200):
+            self.session_history.addItem(
+                f"{entry['name']}: {entry['kwh']:.1f} kWh, {entry['cost']:.2f} € "
+                f"({entry['start_time']} – {entry['stop_time']})")
+        self.update_session_display()
+
+    def update_session_display(self):
+        # Wird schon beim Aufbau der Seite gerufen, bevor die Anzeige verknüpft ist
+        view = getattr(self, "view", None)
+        if view is None:
+            return
+        name = self.session_box.currentData()
+        session = self.sessions.current(name, self.zaehlerstand) if name is not None else None
+        if session is not None:
+            view.set("kulm", int(session['kwh']))
+            view.set("cumstat", f"-> EUR {session['cost']:.2f} seit {session['start_time']} | kWh")
+        else:
+            view.set("cumstat", 'Gestoppt')
         
 
 
 
+    def shutdown(self):
+        """Beendet Empfang und Verbindungen beim Schließen der Anwendung."""
+        self.scheduler.stop()
+        if self.stream_port is not None:
+            self.listener.stop()
+            self.flush_stream_samples()
+        if self.canvas is not None:
+            self.canvas.stop()
+        self.influx.close()
+        if self.client is not None:
+            self.client.close()
+        self.dataThread.flush()
+        self.costs.persist()
+        self.cache.close()
+        self.cumcounter.flush()
+        startup_profile.report()
+
     def show_previous_page(self):
         index = self.stackedWidget.currentIndex()
         if index > 0:
             self.stackedWidget.setCurrentIndex(index - 1)
 
     def show_next_page(self):
+        # Die Diagnoseseite liegt hinter der letzten regulären Seite und ist
+        # nur über F12 erreichbar
         index = self.stackedWidget.currentIndex()
-        if index < self.stackedWidget.count() - 1:
+        if index < self.page_count - 1:
             self.stackedWidget.setCurrentIndex(index + 1)
 
     def fetch_data(self):
@@ -483,68 +605,246 @@ class MyApp(QWidget):
         label.setFont(self.custom_si_font)
         return label
 
-    def update_progress_bar(self):
-        if self.progress_value < 100:
-            self.progress_value += 1  # Erhöht um 10% jede Sekunde
+    def backfill_gaps(self):
+        """Stößt den EnergyFetcher an, wenn die CostEngine Live-Werte wegen einer Lücke verwirft."""
+        # Höchstens einmal pro Minute, falls die Quelle noch nichts Neueres hat
+        if self.costs.gaps:
+            self.scheduler.trigger_idle("energy", min_interval=60)
+
+    def update_display(self, data, confirmed=True, confirmed_at=None):
+        """Mischt (auch unvollständige) Daten in den Snapshot und zeigt dessen Stand an."""
+        if confirmed:
+            self.costs.update(data)
+            self.backfill_gaps()
+        self.snapshot.merge(data, confirmed=confirmed, now=confirmed_at)
+        snapshot = self.snapshot
+
+        # Alle Werte laufen über den ViewBinder, der nur geänderte Werte auf
+        # sichtbaren Seiten an die Widgets weitergibt
+        view = self.view
+
+        # Zählerstand (Sitzungen rechnen unabhängig von der Anzeige in kWh)
+        counter = snapshot.get("currentCounter")
+        if counter is not None:
+            self.zaehlerstand = counter["_value"] / WH_PER_KWH
+            view.set("zaehlerstand", int(self.import_channel.scaled(counter["_value"])))
+            view.set("ts_counter", self.__convert_to_local_time_str(
+                counter["_time"], "Datensatz vom"))
+        delivery = snapshot.get("currentCounterDelivery")
+        if delivery is not None:
+            self.zaehlerstand_ein = delivery["_value"] / WH_PER_KWH
+            view.set("zaehlerstand_ein", int(self.export_channel.scaled(delivery["_value"])))
 
-        else:
-            self.progress_value = 0
-            if not self.dataThread.isRunning():
-                self.dataThread.start()
-        self.progress_bar.setValue(self.progress_value)
+        # Leistung
+        latest = snapshot.get("latestValue")
+        if latest is not None:
+            view.set("current", int(self.power_channel.scaled(latest["_value"])))
+            view.set("ts_current", self.__convert_to_local_time_str(
+                latest["_time"], "Datensatz vom"))
 
-    def update_display(self, data):
-        # Aktualisieren Sie hier Ihre Info-Displays basierend auf den empfangenen Daten
-        # self.page1.setText(str(data))  # Beispiel zur Anzeige der Daten
-        self.zaehlerstand = data["currentCounter"]["_value"] / 1000
-        self.zaehlerstand_ein = data["currentCounterDelivery"]["_value"] #/ 1000
+        # Kul
+        self.update_session_display()
+
+        for key, field in (("min", "minValue"), ("max", "maxValue"), ("avg", "avgValue")):
+            record = snapshot.get(field)
+            if record is not None:
+                power = self.power_channel
+                view.set(key, f'{power.scaled(record["_value"]):.1f} {power.unit}')
+        startofday = snapshot.get("startofdayCounter")
+        if counter is not None and startofday is not None:
+            today_total = (counter["_value"] - startofday["_value"]) / WH_PER_KWH
+            view.set("today", f'{today_total:.1f}')
+        # Bezugskosten abzüglich Einspeisevergütung laut Tarif, ab derselben
+        # Mitternacht (Ortszeit) wie der Zählerstand zu Tagesbeginn
+        midnight = datetime.now(ZoneInfo("Europe/Berlin")).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        view.set("today_cost", f'{self.costs.summary(midnight)["net_cost"]:.2f}')
+
+        for channel in self.channels.paged():
+            record = snapshot.get(channel.key)
+            if record is not None:
+                view.set(channel.key, int(channel.scaled(record["_value"])))
+
+        self.mark_stale_views()
+        if counter is not None:
+            startup_profile.mark("Erste Daten angezeigt")
+            startup_profile.report(after=STARTUP_MILESTONES)
+
+    def update_anomaly(self):
+        # Verfallene Flags liefert der Snapshot nicht mehr, sie zählen als "keine Anomalie"
+        anomaly = self.snapshot.get("latestAnomaly")
+        local_anomaly = self.anomalies is not None and self.anomalies.active()
+        self.view.set("anomaly", (anomaly is not None and anomaly["_value"] == 1) or local_anomaly)
+
+    def mark_stale_views(self):
+        self.update_anomaly()
+        stale = set(self.snapshot.stale_fields())
+        for key, fields in self.stale_views.items():
+            self.view.set(f"stale:{key}", any(
+                field in stale or field not in self.snapshot for field in fields))
+
+    def bind_stale(self, key, widget):
+        self.view.bind(f"stale:{key}", widget, lambda stale: mark_stale(widget, stale))
+
+    def build_statistics_page(self, content_layout3):
 
-        # Zählerstand
-        self.lcd_zaehlerstand.display(
-            int(self.zaehlerstand))
+        # self.lcd_min = QLCDNumber(self)
+        # self.lcd_max = QLCDNumber(self)
+        # self.lcd_avg = QLCDNumber(self)
+        # self.lcd_w24 = QLCDNumber(self)
+        # self.lcd_wtoday = QLCDNumber(self)
+        # self.label_c24 = QLabel('---,--- €')
+        # self.label_ctoday = QLabel('---,--- €')
 
-        self.lcd_zaehlerstand_ein.display(
-            int(self.zaehlerstand_ein))
+        p3_top_container = QWidget(self)
+        p3_top_layout = QVBoxLayout(p3_top_container)
 
-        # Leistung
-        if data["latestAnomaly"]["_value"] == 1:
-            self.lcd_current.setStyleSheet("QLCDNumber { color: yellow; }")
-        else:
-            self.lcd_current.setStyleSheet("QLCDNumber { color: white; }")
+        groupBox = QGroupBox(
+            "GroupBox", self
+        )  # Titel der GroupBox kann angepasst werden
+        gridLayout = QGridLayout(groupBox)
 
-        self.lcd_current.display(int(data["latestValue"]["_value"]))
+        # Verbrauch heute
+        labelToday = QLabel("Verbrauch heute")
+        gridLayout.addWidget(labelToday, 0, 0)
 
-        # Kul
-        if self.cumcounter.data.get('cum_counter_start_value', None) is not None and self.cumcounter.data.get('cum_counter_start_time', None) is not None:
-            self.lcd_kulm.display(
-                int(self.zaehlerstand - self.cumcounter.data.get('cum_counter_start_value')))
-            self.lable_cumstat.setText(
-                f"-> EUR {((self.zaehlerstand - self.cumcounter.data.get('cum_counter_start_value'))*.31):.2f} seit {self.cumcounter.data.get('cum_counter_start_time')} | kWh")
-        else:
-            self.lable_cumstat.setText('Gestoppt')
+        self.consumptionToday = QLabel("----")
+        self.consumptionToday.setStyleSheet(glow_style)
+        self.consumptionToday.setFont(QFont(self.font_name, 20))
+        gridLayout.addWidget(self.consumptionToday, 0, 1)
 
-      
+        gridLayout.addWidget(QLabel("kWh"), 0, 2)
 
-        self.ts_label_current.setText(
-            self.__convert_to_local_time_str(
-                data["latestValue"]["_time"], "Datensatz vom"
-            )
-        )
+        self.labelTodayCost = QLabel("")
+        self.labelTodayCost.setStyleSheet(glow_style)
+        self.labelTodayCost.setFont(QFont(self.font_name, 20))
+        gridLayout.addWidget(self.labelTodayCost, 0, 3)
+        gridLayout.addWidget(QLabel('€'), 0, 4)
+
+        p3_top_layout.addWidget(groupBox)
+
+        # QGroupBox für Max-Wert
+        self.groupBoxMax = QGroupBox("MAX(P) der letzten 24h")
+        verticalLayoutMax = QVBoxLayout(self.groupBoxMax)
+        self.maxW = QLabel("12345 W")
+        self.maxW.setFont(QFont("Arial", 12))
+
+        self.groupBoxMin = QGroupBox("MIN(P) der letzten 24h")
+        verticalLayoutMin = QVBoxLayout(self.groupBoxMin)
+        self.minW = QLabel("12345 W")
+        self.minW.setFont(QFont("Arial", 12))
+        verticalLayoutMin.addWidget(self.minW)
+
+        p3_top_layout.addWidget(self.groupBoxMax)
+
+        # QGroupBox für Avg-Wert
+        self.groupBoxAvg = QGroupBox("Ø(P) der letzten 24h")
+        verticalLayoutAvg = QVBoxLayout(self.groupBoxAvg)
+        self.avgW = QLabel("12345 W")
+        self.avgW.setFont(QFont("Arial", 12))
+
+        verticalLayoutAvg.addWidget(self.avgW)
+        verticalLayoutMax.addWidget(self.maxW)
+        p3_top_layout.addWidget(self.groupBoxMin)
+
+        p3_top_layout.addWidget(self.groupBoxAvg)
+
+        content_layout3.addWidget(p3_top_container)
+
+        view = self.view
+        view.bind("min", self.minW, self.minW.setText)
+        view.bind("max", self.maxW, self.maxW.setText)
+        view.bind("avg", self.avgW, self.avgW.setText)
+        view.bind("today", self.consumptionToday, self.consumptionToday.setText)
+        view.bind("today_cost", self.labelTodayCost, self.labelTodayCost.setText)
+        for key, widget in (("min", self.minW), ("max", self.maxW), ("avg", self.avgW),
+                            ("today", self.consumptionToday)):
+            self.bind_stale(key, widget)
+
+    def build_history_page(self, content_layout5):
+        # matplotlib erst hier laden, das kostet auf dem Pi mehrere Sekunden
+        from history_plot import PlotView
+
+        # Gezeichnet wird in einem eigenen Thread, hier wird nur das Bild angezeigt
+        self.canvas = PlotView(self)
+        self.canvas.pixelsChanged.connect(self.on_plot_resized)
+        content_layout5.addWidget(self.canvas)
+        # Zeitraum des Verlaufs wählen
+        range_layout = QHBoxLayout()
+        for label, span in PLOT_RANGES:
+            button = QPushButton(label, self)
+            button.clicked.connect(lambda checked, span=span: self.select_plot_range(span))
+            range_layout.addWidget(button)
+        content_layout5.addLayout(range_layout)
+
+        cached_series = self.plotDataThread.restore()
+        if cached_series:
+            self.update_plot(cached_series)
+        # Es werden nur noch neue Minuten abgefragt, daher geht häufiger
+        self.plot_job = self.scheduler.add_job(FetchJob(
+            "plot", self.plotDataThread.run, interval=10, timeout=30, jitter=1))
+
+    def build_calendar_page(self, content_layout):
+        from calendar_view import CalendarView
+
+        content_layout.addWidget(CalendarView(self.cache, self, self.custom_info_font))
+
+    def build_diagnostics_page(self, content_layout):
+        content_layout.addWidget(DiagnosticsView(self))
+
+    def toggle_diagnostics(self):
+        if self.stackedWidget.currentIndex() >= self.page_count:
+            self.stackedWidget.setCurrentIndex(self.page_count - 1)
+        else:
+            self.stackedWidget.setCurrentIndex(self.page_count)
+
+    def follow_plot_page(self, index):
+        """Fragt den Verlauf nur ab, solange seine Seite angezeigt wird."""
+        if self.plot_job is None:
+            return
+        if self.stackedWidget.widget(index).isAncestorOf(self.canvas):
+            self.scheduler.resume("plot")
+        else:
+            self.scheduler.pause("plot")
+
+    def build_page(self, index):
+        """Baut eine verzögerte Seite beim ersten Anzeigen auf."""
+        page = self.stackedWidget.widget(index)
+        pending = self.page_builders.pop(page, None)
+        if pending is not None:
+            title, builder, content_layout = pending
+            builder(content_layout)
+            startup_profile.mark(f"Seite '{title}' aufgebaut")
+
+    def paintEvent(self, event):
+        startup_profile.mark("Erstes Bild")
+        startup_profile.report(after=STARTUP_MILESTONES)
+        super().paintEvent(event)
+
+    def bind_view(self):
+        """Verknüpft die Anzeigewerte aus update_display mit ihren Widgets."""
+        self.view = ViewBinder(self.stackedWidget)
+        view = self.view
+        view.bind("zaehlerstand", self.lcd_zaehlerstand, self.lcd_zaehlerstand.display)
+        view.bind("zaehlerstand_ein", self.lcd_zaehlerstand_ein, self.lcd_zaehlerstand_ein.display)
+        view.bind("anomaly", self.lcd_current, lambda anomaly: self.lcd_current.setStyleSheet(
+            "QLCDNumber { color: yellow; }" if anomaly else "QLCDNumber { color: white; }"))
+        view.bind("current", self.lcd_current, self.lcd_current.display)
+        view.bind("kulm", self.lcd_kulm, self.lcd_kulm.display)
+        view.bind("cumstat", self.lable_cumstat, self.lable_cumstat.setText)
+        view.bind("ts_current", self.ts_label_current, self.ts_label_current.setText)
+        view.bind("ts_counter", self.ts_label_counter, self.ts_label_counter.setText)
+        for channel in self.channels.paged():
+            lcd = self.channel_lcds[channel.name]
+            view.bind(channel.key, lcd, lcd.display)
+            self.bind_stale(channel.key, lcd)
+        for key, widget in (("zaehlerstand", self.lcd_zaehlerstand),
+                            ("zaehlerstand_ein", self.lcd_zaehlerstand_ein),
+                            ("current", self.lcd_current),
+                            ("ts_current", self.ts_label_current),
+                            ("ts_counter", self.ts_label_counter)):
+            self.bind_stale(key, widget)
 
-        self.ts_label_counter.setText(
-            self.__convert_to_local_time_str(
-                data["currentCounter"]["_time"], "Datensatz vom"
-            )
-        )
-        
-        today_total = (data["currentCounter"]["_value"] -
-                       data["startofdayCounter"]["_value"]) / 1000
-        self.minW.setText(f'{data["minValue"]["_value"]:.1f} W')
-        self.maxW.setText(f'{data["maxValue"]["_value"]:.1f} W')
-        self.avgW.setText(f'{data["avgValue"]["_value"]:.1f} W')
-        self.consumptionToday.setText(f'{today_total:.1f}')
-        self.labelTodayCost.setText(f'{(today_total * 0.31):.2f}')
-    
     def __convert_to_local_time_str(self, utc_time, prefix=None, suffix=None):
         # Angenommen, data["currentCounter"]["_time"] ist ein datetime-Objekt in UTC
         utc_time = utc_time.replace(tzinfo=timezone.utc)
@@ -562,7 +862,8 @@ class MyApp(QWidget):
         # Formatierung des Datums in deutschem Format
         return berlin_time
 
-    def create_page(self, title):
+    def create_page(self, title, builder=None):
+        """Legt eine Seite an; mit ``builder`` wird ihr Inhalt erst beim ersten Anzeigen aufgebaut."""
         page = QWidget()
         page_layout = QVBoxLayout(page)
 
@@ -589,15 +890,68 @@ class MyApp(QWidget):
         page_layout.addLayout(content_layout)
 
         self.stackedWidget.addWidget(page)
+        if builder is not None:
+            self.page_builders[page] = (title, builder, content_layout)
         return content_layout  # Gibt das Layout für Inhalte zurück
 
 
 if __name__ == "__main__":
     load_dotenv()
+    # --export START STOP VERZEICHNIS [...]: Verlauf als CSV/Parquet exportieren (siehe export.py)
+    if "--export" in sys.argv:
+        from export import main as export_main
+        sys.exit(export_main(sys.argv[sys.argv.index("--export") + 1:]))
+    # --headless [port]: ohne Oberfläche, Daten per HTTP/WebSocket für mehrere Displays
+    if "--headless" in sys.argv:
+        from server import run_headless
+        port = 5000
+        idx = sys.argv.index("--headless")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            port = int(sys.argv[idx + 1])
+        run_headless(port=port)
+        sys.exit(0)
+    # --profile-startup: Zeitmarken bis zur ersten Anzeige ausgeben
+    startup_profile.enabled = "--profile-startup" in sys.argv
     app = QApplication(sys.argv)
+    startup_profile.mark("QApplication erstellt")
+    # asyncio-Eventloop für den FetchScheduler in die Qt-Eventloop integrieren
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    import qdarkstyle
     app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
+    startup_profile.mark("Stylesheet geladen")
     kiosk_mode = "--kiosk" in sys.argv
-
-    ex = MyApp(kiosk_mode=kiosk_mode)
+    # --stream [port]: Messwerte per UDP/Line-Protocol empfangen statt abfragen
+    stream_port = None
+    if "--stream" in sys.argv:
+        stream_port = 8094
+        idx = sys.argv.index("--stream")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            stream_port = int(sys.argv[idx + 1])
+
+    # --local-anomaly: Leistungswerte zusätzlich lokal auf Ausreißer prüfen
+    local_anomaly = "--local-anomaly" in sys.argv
+
+    # --server URL: Daten vom Headless-Server (--headless) lesen statt aus der InfluxDB
+    server = None
+    if "--server" in sys.argv:
+        idx = sys.argv.index("--server")
+        server = "http://localhost:5000"
+        if idx + 1 < len(sys.argv) and not sys.argv[idx + 1].startswith("--"):
+            server = sys.argv[idx + 1]
+
+    # --metrics [port]: Metriken für Prometheus (/metrics) bzw. als JSON (/metrics.json)
+    if "--metrics" in sys.argv:
+        metrics_port = 9100
+        idx = sys.argv.index("--metrics")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            metrics_port = int(sys.argv[idx + 1])
+        serve_metrics(metrics_port)
+
+    ex = MyApp(kiosk_mode=kiosk_mode, stream_port=stream_port, local_anomaly=local_anomaly,
+               server=server)
+    startup_profile.mark("Hauptfenster aufgebaut")
+    app.aboutToQuit.connect(ex.shutdown)
     ex.show()
-    sys.exit(app.exec_())
+    with loop:
+        loop.run_forever()
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Offline-Benchmark für Abfrage, Aufbereitung und Anzeige.
+#
+# Eine nachgebildete InfluxDB (/api/v2/query, annotiertes CSV) liefert
+# synthetische oder aufgezeichnete volkszähler-Daten. Jede Datenmenge läuft in
+# einem eigenen Prozess mit Qt auf der Offscreen-Plattform, damit der
+# maximale Speicherverbrauch (RSS) pro Datenmenge vergleichbar bleibt.
+#
+#   python benchmark.py                       alle Datenmengen (1h bis 30 Tage)
+#   python benchmark.py --sizes 1h,7d -n 20   Auswahl, 20 Wiederholungen
+#   python benchmark.py --replay export.csv   aufgezeichnete Werte (Zeit;Wert)
+#   python benchmark.py --json > before.json  Ergebnisse zum Vergleichen
+
+SIZES = {
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "24h": timedelta(days=1),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
+CSV_HEADER = (
+    "#datatype,string,long,dateTime:RFC3339,double,string,string,string\r\n"
+    "#group,false,false,false,false,true,true,true\r\n"
+    "#default,_result,,,,,,\r\n"
+    ",result,table,_time,_value,_field,_measurement,uuid\r\n"
+)
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def synthetic_series(span, interval=2.0, seed=1):
+    """Leistung mit Grundlast, Tagesgang und kurzen Spitzen (Zeit in s seit 1970)."""
+    rng = np.random.default_rng(seed)
+    end = time.time()
+    times = np.arange(end - span.total_seconds(), end, interval)
+    hours = (times % 86400) / 3600
+    values = 250 + 400 * np.clip(np.sin((hours - 6) / 24 * 2 * np.pi), 0, None)
+    values += rng.normal(0, 20, len(times))
+    spikes = rng.random(len(times)) < 0.002
+    values[spikes] += rng.uniform(1000, 3000, spikes.sum())
+    return times, np.maximum(values, 0)
+
+
+def load_recording(filename, span):
+    """Liest Zeit;Wert (Unix-Zeit oder ISO-Datum) und wiederholt die Aufnahme bis ``span``."""
+    times, values = [], []
+    with open(filename, "r") as file:
+        for line in file:
+            parts = re.split(r"[;,\t]", line.strip())
+            if len(parts) < 2:
+                continue
+            try:
+                value = float(parts[1])
+                stamp = float(parts[0]) if re.fullmatch(r"[\d.]+", parts[0]) \
+                    else datetime.fromisoformat(parts[0].replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue  # Kopfzeile
+            times.append(stamp / 1000 if stamp > 1e11 else stamp)
+            values.append(value)
+    times = np.asarray(times) - max(times)
+    values = np.asarray(values)
+    length = max(times[-1] - times[0], 1.0)
+    copies = int(np.ceil(span.total_seconds() / length))
+    times = np.concatenate([times - i * (length + 1) for i in range(copies)][::-1])
+    values = np.tile(values, copies)
+    keep = times >= -span.total_seconds()
+    return times[keep] + time.time(), values[keep]
+
+
+def parse_start(expr, now):
+    relative = re.fullmatch(r"-(\d+)([smhd])", expr.strip())
+    if relative:
+        return now - int(relative.group(1)) * UNITS[relative.group(2)]
+    absolute = re.search(r'time\(v: "([^"]+)"\)', expr)
+    if absolute:
+        return datetime.fromisoformat(absolute.group(1)).timestamp()
+    return now - 86400  # date.truncate(...) u.ä.: hier nicht relevant
+
+
+def to_csv_rows(table, times, values, field, uuid):
+    stamps = np.datetime_as_string(
+        (np.asarray(times) * 1e6).astype("datetime64[us]"), unit="us")
+    return "".join(
+        f",,{table},{stamp}Z,{value!r},{field},vz_measurement,{uuid}\r\n"
+        for stamp, value in zip(stamps, np.asarray(values, dtype=float).tolist()))
+
+
+class FakeInflux:
+    """Beantwortet die Flux-Abfragen von StatsFetcher und PlotFetcher aus Arrays.
+
+    Ausgewertet werden nur ``range(start: ...)`` und ``aggregateWindow(every: ...)``,
+    alles andere wird anhand der Variablennamen der Teilabfragen erkannt.
+    """
+
+    def __init__(self, times, values, channels):
+        self.times = times
+        self.values = values
+        self.power = channels.by_role("power").uuid
+        self.counters = [channel.uuid for channel in channels if channel.counter]
+        self.rows = 0  # Zeilen der letzten Antwort
+
+    def respond(self, query):
+        now = time.time()
+        if "aggregateWindow" in query:
+            return self.__plot(query, now)
+        parts = []
+        table = 0
+        if "dataWattage" in query:
+            section = query[query.index("dataWattage ="):]
+            start = parse_start(re.search(r"range\(start: ([^)]+\)?)\)", section).group(1), now)
+            mask = self.times > start
+            parts.append(to_csv_rows(table, self.times[mask], self.values[mask], "wattage", self.power))
+            self.rows = int(mask.sum())
+            table += 1
+        else:
+            self.rows = 0
+        if "channelsLatest" in query:
+            for uuid in [self.power] + self.counters:
+                value = self.values[-1] if uuid == self.power else 34_200_000.0
+                parts.append(to_csv_rows(table, [self.times[-1]], [value], "channel", uuid))
+                table += 1
+        if "startCounters" in query:
+            for uuid in self.counters:
+                parts.append(to_csv_rows(table, [now - 3600], [34_190_000.0], "startofday", uuid))
+                table += 1
+        if "latestAnomaly" in query:
+            for field in ("latestError", "latestAnomaly", "recentAnomaly"):
+                parts.append(to_csv_rows(table, [self.times[-1]], [0.0], field, self.power))
+                table += 1
+        return CSV_HEADER + "".join(parts) + "\r\n"
+
+    def __plot(self, query, now):
+        start = parse_start(re.search(r"range\(start: ([^)]+\)?)\)", query).group(1), now)
+        every = re.search(r"every: (\d+)([smhd])", query)
+        every = int(every.group(1)) * UNITS[every.group(2)]
+        mask = self.times >= start
+        window = (self.times[mask] // every).astype(np.int64)
+        if len(window) == 0:
+            self.rows = 0
+            return CSV_HEADER + "\r\n"
+        window -= window[0]
+        counts = np.bincount(window)
+        sums = np.bincount(window, weights=self.values[mask])
+        filled = counts > 0
+        first = self.times[mask][0] // every
+        # aggregateWindow stempelt jedes Fenster mit seinem Ende
+        stamps = (first + np.nonzero(filled)[0] + 1) * every
+        means = sums[filled] / counts[filled]
+        self.rows = int(filled.sum())
+        return CSV_HEADER + to_csv_rows(0, stamps, means, "value", self.power) + "\r\n"
+
+    def serve(self, host="127.0.0.1", port=0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Sonst verzögert Nagle + Delayed ACK jede kleine Antwort um ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                query = json.loads(self.rfile.read(length))["query"]
+                body = fake.respond(query).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max()),
+    }
+
+
+def run_size(label, repeat, replay=None, interval=2.0):
+    """Misst eine Datenmenge im aktuellen Prozess und gibt die Ergebnisse zurück."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import asyncio
+
+    import qasync
+    from PyQt5.QtWidgets import QApplication
+
+    span = SIZES[label]
+    if replay:
+        times, values = load_recording(replay, span)
+    else:
+        times, values = synthetic_series(span, interval)
+
+    qt_app = QApplication.instance() or QApplication(sys.argv[:1])
+    loop = qasync.QEventLoop(qt_app)
+    asyncio.set_event_loop(loop)
+
+    import app as dashboard
+    from channels import ChannelRegistry
+    from influx_client import InfluxService
+    from sample_cache import SampleCache
+    from startup_profile import peak_rss_bytes
+
+    fake = FakeInflux(times, values, ChannelRegistry.load())
+    server = fake.serve()
+    influx = InfluxService(url=f"http://127.0.0.1:{server.server_address[1]}",
+                           token="benchmark", org="benchmark")
+    cache_dir = tempfile.TemporaryDirectory()
+    cache = SampleCache(os.path.join(cache_dir.name, "cache.sqlite"))
+
+    window = dashboard.MyApp(influx=influx, cache=cache)
+    # Abfragen laufen hier nicht nach Zeitplan, sondern werden einzeln gemessen
+    window.scheduler.stop()
+    window.show()
+    window.stackedWidget.setCurrentIndex(window.page_count - 1)
+    qt_app.processEvents()
+
+    stats = window.dataThread.fetcher
+    plot = window.plotDataThread.fetcher
+    timings = {name: [] for name in (
+        "stats_fetch", "stats_incremental", "update_display",
+        "plot_fetch", "update_plot", "plot_render", "stats_end_to_end")}
+    rows = {"stats": 0, "plot": 0}
+
+    def measure(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name].append(time.perf_counter() - start)
+        return result
+
+    for _ in range(repeat):
+        # Kalter Abruf: komplettes 24h-Fenster bzw. kompletter Verlauf
+        stats.stats.clear()
+        stats.queries.invalidate()
+        data = measure("stats_fetch", stats.fetch)
+        rows["stats"] = fake.rows
+        measure("update_display", lambda: (window.update_display(data), qt_app.processEvents()))
+        measure("stats_incremental", stats.fetch)
+        measure("stats_end_to_end", lambda: (window.dataThread.run(), qt_app.processEvents()))
+
+        plot.set_range(span)
+        series = measure("plot_fetch", plot.fetch)
+        rows["plot"] = fake.rows
+        plot_range = window.plotDataThread.plot_range()
+        measure("update_plot", lambda: (window.update_plot(series, plot_range), qt_app.processEvents()))
+        # Restzeit, bis der Render-Thread das Bild fertig hat und es angezeigt wird
+        measure("plot_render", lambda: (window.canvas.renderer.wait_idle(), qt_app.processEvents()))
+
+    result = {
+        "size": label,
+        "samples": int(len(times)),
+        "rows": rows,
+        "repeat": repeat,
+        "peak_rss_mib": peak_rss_bytes() / 2**20,
+        "stages": {name: percentiles(values) for name, values in timings.items()},
+        "throughput_rows_per_s": {
+            "stats": rows["stats"] / float(np.median(timings["stats_fetch"])),
+            "plot": rows["plot"] / float(np.median(timings["plot_fetch"])),
+        },
+    }
+    window.shutdown()
+    server.shutdown()
+    cache_dir.cleanup()
+    return result
+
+
+def print_header():
+    print(f"{'Größe':<6} {'Werte':>9} {'Zeilen':>13} {'RSS':>8}  Stufe              "
+          f"{'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)")
+
+
+def print_table(results):
+    for result in results:
+        head = (f"{result['size']:<6} {result['samples']:>9} "
+                f"{result['rows']['stats']:>6}/{result['rows']['plot']:<6} "
+                f"{result['peak_rss_mib']:>5.0f} MiB")
+        for name, stage in result["stages"].items():
+            print(f"{head}  {name:<18} {stage['p50_ms']:8.1f} {stage['p90_ms']:8.1f} "
+                  f"{stage['p99_ms']:8.1f} {stage['max_ms']:8.1f}")
+            head = " " * 38
+        throughput = result["throughput_rows_per_s"]
+        print(f"{head}  Durchsatz: {throughput['stats']:.0f} Zeilen/s (Statistik), "
+              f"{throughput['plot']:.0f} Zeilen/s (Verlauf)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-Benchmark mit nachgebildeter InfluxDB")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        help="Datenmengen, kommagetrennt (%(default)s)")
+    parser.add_argument("-n", "--repeat", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="Abstand der synthetischen Messwerte in Sekunden")
+    parser.add_argument("--replay", help="Aufgezeichnete Werte (Zeit;Wert) statt synthetischer")
+    parser.add_argument("--json", action="store_true", help="Ergebnisse als JSON ausgeben")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_size(args.child, args.repeat, args.replay, args.interval)))
+        return
+
+    results = []
+    if not args.json:
+        print_header()
+    for label in args.sizes.split(","):
+        if label not in SIZES:
+            parser.error(f"unbekannte Größe {label}, möglich: {', '.join(SIZES)}")
+        command = [sys.executable, os.path.abspath(__file__), "--child", label,
+                   "--repeat", str(args.repeat), "--interval", str(args.interval)]
+        if args.replay:
+            command += ["--replay", args.replay]
+        output = subprocess.run(command, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if output.returncode != 0:
+            print(output.stderr, file=sys.stderr)
+            sys.exit(f"Benchmark für {label} fehlgeschlagen")
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        if not args.json:
+            print_table(results[-1:])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
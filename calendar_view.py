@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+
+from PyQt5.QtCore import QRectF, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter
+from PyQt5.QtWidgets import (QGridLayout, QHBoxLayout, QLabel, QPushButton,
+                             QSizePolicy, QVBoxLayout, QWidget)
+
+MONTH_NAMES = ("Jan", "Feb", "Mär", "Apr", "Mai", "Jun",
+               "Jul", "Aug", "Sep", "Okt", "Nov", "Dez")
+
+EMPTY_COLOR = QColor("#2b2b2b")
+LOW_COLOR = QColor("#1f3b4d")
+HIGH_COLOR = QColor("#ffb000")
+
+
+def blend(low, high, t):
+    return QColor(
+        round(low.red() + (high.red() - low.red()) * t),
+        round(low.green() + (high.green() - low.green()) * t),
+        round(low.blue() + (high.blue() - low.blue()) * t),
+    )
+
+
+class YearHeatmap(QWidget):
+    """Ein Jahr als Raster (Spalten = Wochen, Zeilen = Mo..So), Farbe nach Tagesbezug."""
+
+    # Tag im Format 'JJJJ-MM-TT'
+    daySelected = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.year = date.today().year
+        self.days = {}
+        self.scale = 1.0
+
+    def set_year(self, year, days):
+        """``days``: Tag -> Tageswerte (aus SampleCache.load_rollups)."""
+        self.year = year
+        self.days = days
+        values = sorted(row["import_kwh"] for row in days.values()
+                        if row["import_kwh"] is not None)
+        # 95%-Quantil statt Maximum, ein einzelner Ausreißertag bleicht sonst alles aus
+        self.scale = values[min(len(values) - 1, int(len(values) * 0.95))] if values else 1.0
+        self.update()
+
+    def __first_monday(self):
+        jan1 = date(self.year, 1, 1)
+        return jan1 - timedelta(days=jan1.weekday())
+
+    def __cell(self):
+        return min(self.width() / 54, self.height() / 7)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        size = self.__cell()
+        first = self.__first_monday()
+        day = date(self.year, 1, 1)
+        while day.year == self.year:
+            offset = (day - first).days
+            rect = QRectF((offset // 7) * size, (offset % 7) * size, size - 1, size - 1)
+            row = self.days.get(day.isoformat())
+            if row is None or row["import_kwh"] is None:
+                color = EMPTY_COLOR
+            else:
+                color = blend(LOW_COLOR, HIGH_COLOR, min(row["import_kwh"] / max(self.scale, 1e-9), 1.0))
+            painter.fillRect(rect, color)
+            day += timedelta(days=1)
+
+    def mousePressEvent(self, event):
+        size = self.__cell()
+        column, row = int(event.x() // size), int(event.y() // size)
+        if row > 6:
+            return
+        day = self.__first_monday() + timedelta(days=column * 7 + row)
+        if day.year == self.year:
+            self.daySelected.emit(day.isoformat())
+
+
+class CalendarView(QWidget):
+    """Kalenderseite: Tagesbezug eines Jahres als Heatmap plus Monatssummen.
+
+    Liest ausschließlich die Tages- und Monatswerte aus dem lokalen Cache
+    (siehe RollupFetcher), ein Jahr sind damit zwei kleine SQLite-Abfragen.
+    Aktualisiert wird beim Anzeigen der Seite.
+    """
+
+    def __init__(self, cache, parent=None, font=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.year = date.today().year
+        self.days = {}
+
+        layout = QVBoxLayout(self)
+        navigation = QHBoxLayout()
+        previous_button = QPushButton("<", self)
+        previous_button.clicked.connect(lambda: self.show_year(self.year - 1))
+        next_button = QPushButton(">", self)
+        next_button.clicked.connect(lambda: self.show_year(self.year + 1))
+        self.year_label = QLabel(self)
+        self.year_label.setAlignment(Qt.AlignCenter)
+        navigation.addWidget(previous_button)
+        navigation.addWidget(self.year_label, 1)
+        navigation.addWidget(next_button)
+        layout.addLayout(navigation)
+
+        self.heatmap = YearHeatmap(self)
+        self.heatmap.daySelected.connect(self.show_day)
+        layout.addWidget(self.heatmap, 1)
+
+        months = QGridLayout()
+        self.month_labels = []
+        for month, name in enumerate(MONTH_NAMES):
+            label = QLabel(f"{name}\n–", self)
+            label.setAlignment(Qt.AlignCenter)
+            months.addWidget(label, month // 6, month % 6)
+            self.month_labels.append(label)
+        layout.addLayout(months)
+
+        self.detail = QLabel("Tag antippen für Details", self)
+        layout.addWidget(self.detail)
+        if font is not None:
+            for label in self.month_labels + [self.year_label, self.detail]:
+                label.setFont(font)
+
+    def show_year(self, year):
+        self.year = year
+        self.year_label.setText(str(year))
+        days = self.cache.load_rollups("day", f"{year}-01-01", f"{year + 1}-01-01")
+        self.days = {row["start"]: row for row in days}
+        self.heatmap.set_year(year, self.days)
+        months = {row["start"]: row for row in self.cache.load_rollups(
+            "month", f"{year}-01", f"{year + 1}-01")}
+        for month, label in enumerate(self.month_labels, start=1):
+            row = months.get(f"{year}-{month:02d}")
+            value = "–" if row is None or row["import_kwh"] is None else f"{row['import_kwh']:.0f} kWh"
+            label.setText(f"{MONTH_NAMES[month - 1]}\n{value}")
+
+    def show_day(self, day):
+        row = self.days.get(day)
+        shown = date.fromisoformat(day).strftime("%d.%m.%Y")
+        if row is None:
+            self.detail.setText(f"{shown}: keine Daten")
+            return
+
+        def fmt(value, unit, digits=1):
+            return "–" if value is None else f"{value:.{digits}f} {unit}"
+
+        self.detail.setText(
+            f"{shown}: Bezug {fmt(row['import_kwh'], 'kWh')}, "
+            f"Einspeisung {fmt(row['export_kwh'], 'kWh', 2)} | "
+            f"min {fmt(row['min_w'], 'W', 0)}, max {fmt(row['max_w'], 'W', 0)}, "
+            f"Ø {fmt(row['avg_w'], 'W', 0)}")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.show_year(self.year)
@@ -0,0 +1,125 @@
+import json
+import os
+
+# Standardbelegung, falls keine channels.json vorhanden ist
+default_channels = [
+    {
+        "name": "leistung",
+        "uuid": "1810eb97-3799-46d8-9764-2ab1c4ea7cb4",
+        "unit": "W",
+        "role": "power",
+    },
+    {
+        "name": "bezug",
+        "uuid": "22792059-416a-4117-8b3a-420e34a841a1",
+        "unit": "kWh",
+        "scale": 0.001,
+        "role": "import",
+        "counter": True,
+    },
+    {
+        "name": "einspeisung",
+        "uuid": "86ef6af6-c13a-4084-beed-6183b44c0a17",
+        "unit": "Wh",
+        "role": "export",
+        "counter": True,
+    },
+]
+
+
+def flux_set(uuids):
+    """UUIDs als Flux-Array für ``contains(value: r["uuid"], set: [...])``."""
+    return "[" + ", ".join(f'"{uuid}"' for uuid in uuids) + "]"
+
+
+class Channel:
+    """Ein volkszähler-Kanal.
+
+    ``role`` markiert die Kanäle, die die festen Seiten speisen (``power``,
+    ``import``, ``export``). Ist ``page`` gesetzt, bekommt der Kanal eine
+    eigene Anzeigeseite mit diesem Titel.
+    """
+
+    def __init__(self, name, uuid, unit="", scale=1.0, page=None, role=None,
+                 counter=False, digits=6):
+        self.name = name
+        self.uuid = uuid
+        self.unit = unit
+        self.scale = scale
+        self.page = page
+        self.role = role
+        self.counter = counter
+        self.digits = digits
+
+    @property
+    def key(self):
+        """Schlüssel des aktuellen Werts im data_dict."""
+        return f"channel:{self.name}"
+
+    @property
+    def startofday_key(self):
+        return f"startofday:{self.name}"
+
+    def scaled(self, value):
+        return value * self.scale
+
+
+class ChannelRegistry:
+    """Alle Kanäle eines Standorts, geladen aus einer JSON-Datei."""
+
+    def __init__(self, channels):
+        self.channels = list(channels)
+        self._by_uuid = {channel.uuid: channel for channel in self.channels}
+        self._by_role = {channel.role: channel for channel in self.channels if channel.role}
+
+    @classmethod
+    def load(cls, filename='channels.json'):
+        """Lädt die Kanäle aus einer JSON-Datei, bei Fehlern gilt die Standardbelegung."""
+        entries = default_channels
+        try:
+            if os.path.exists(filename):
+                with open(filename, 'r') as file:
+                    entries = json.load(file)["channels"]
+        except (json.JSONDecodeError, KeyError) as e:
+            print(f"Invalid channel config {filename}: {e}")
+        except Exception as e:
+            print(f"General error when accessing file: {e}")
+        try:
+            registry = cls(Channel(**entry) for entry in entries)
+            # Ohne Leistungskanal laufen StatsFetcher und PlotFetcher nicht
+            if registry.by_role("power") is None:
+                raise ValueError("no channel with role 'power'")
+            return registry
+        except (TypeError, ValueError) as e:
+            print(f"Invalid channel config {filename}: {e}")
+            return cls(Channel(**entry) for entry in default_channels)
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def __len__(self):
+        return len(self.channels)
+
+    def by_uuid(self, uuid):
+        return self._by_uuid.get(uuid)
+
+    def by_role(self, role):
+        return self._by_role.get(role)
+
+    def fixed(self, role):
+        """Kanal einer festen Seite; ohne konfigurierten Kanal gilt die Standardbelegung."""
+        channel = self.by_role(role)
+        if channel is None:
+            channel = next(Channel(**entry) for entry in default_channels if entry["role"] == role)
+        return channel
+
+    def uuids(self, counters_only=False):
+        return [channel.uuid for channel in self.channels
+                if channel.counter or not counters_only]
+
+    def paged(self):
+        return [channel for channel in self.channels if channel.page]
+
+    def flux_set(self, counters_only=False):
+        """UUIDs als Flux-Array für ``contains(value: r["uuid"], set: [...])``."""
+        return flux_set(self.uuids(counters_only))
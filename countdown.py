@@ -0,0 +1,75 @@
+import time
+
+from PyQt5.QtCore import QAbstractAnimation, QPropertyAnimation, Qt
+from PyQt5.QtWidgets import QApplication, QProgressBar
+
+# Zustände, in denen nichts gezeichnet werden muss (Fenster versteckt, Bildschirm aus)
+SUSPENDED_STATES = (Qt.ApplicationHidden, Qt.ApplicationSuspended)
+
+
+class RefreshCountdown(QProgressBar):
+    """Fortschrittsbalken, der die Zeit bis zur nächsten Abfrage anzeigt.
+
+    Der Balken steuert keine Abfragen, er folgt nur dem Zeitplan des
+    FetchSchedulers (``follow(job)``). Animiert wird über eine einzige
+    QPropertyAnimation; die Auflösung des Balkens begrenzt die Neuzeichnungen
+    auf ``max_fps`` pro Sekunde. Ist der Balken nicht sichtbar oder die
+    Anwendung inaktiv (z.B. Bildschirm aus), wird die Animation angehalten.
+    """
+
+    def __init__(self, parent=None, max_fps=10):
+        super().__init__(parent)
+        self.max_fps = max_fps
+        self.setFormat("")
+        self.setTextVisible(False)
+        self.setMaximum(100)
+        self.setValue(0)
+        self._deadline = None
+        self._animation = QPropertyAnimation(self, b"value", self)
+        QApplication.instance().applicationStateChanged.connect(self.__on_state_changed)
+
+    def follow(self, job):
+        """Registriert den Balken als Beobachter eines FetchJobs."""
+        job.listeners.append(self.restart)
+
+    def restart(self, job):
+        # Wird vom Scheduler aufgerufen, sobald der nächste Termin feststeht
+        self._deadline = job.next_run
+        steps = max(1, round(job.interval * self.max_fps))
+        if steps != self.maximum():
+            self.setMaximum(steps)
+        self.__animate()
+
+    def __animate(self):
+        self._animation.stop()
+        if self._deadline is None or not self.__active():
+            return
+        remaining_ms = int((self._deadline - time.time()) * 1000)
+        if remaining_ms <= 0:
+            self.setValue(self.maximum())
+            return
+        # Der Balken läuft von seinem aktuellen Stand bis zum Termin voll
+        interval_ms = self.maximum() * 1000 / self.max_fps
+        start = max(0, round(self.maximum() * (1 - remaining_ms / interval_ms)))
+        self._animation.setStartValue(start)
+        self._animation.setEndValue(self.maximum())
+        self._animation.setDuration(remaining_ms)
+        self._animation.start()
+
+    def __active(self):
+        # "Inactive" (anderes Fenster hat den Fokus) zählt noch als sichtbar
+        return self.isVisible() and QApplication.applicationState() not in SUSPENDED_STATES
+
+    def __on_state_changed(self, state):
+        if state not in SUSPENDED_STATES:
+            self.__animate()
+        elif self._animation.state() == QAbstractAnimation.Running:
+            self._animation.stop()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.__animate()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._animation.stop()
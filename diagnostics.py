@@ -0,0 +1,89 @@
+import time
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import QLabel, QSizePolicy
+
+from metrics import registry
+from startup_profile import peak_rss_bytes
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "Verspätung des Qt-Heartbeat-Timers")
+LOOP_STALLS = registry.counter(
+    "event_loop_stalls_total", "Heartbeats, die mehr als stall_threshold zu spät kamen")
+
+
+registry.gauge("process_peak_rss_bytes", peak_rss_bytes, "Maximaler Speicherverbrauch")
+
+
+class LoopMonitor(QObject):
+    """Misst Hänger der Qt-Eventloop über einen Heartbeat-Timer.
+
+    Jeder Timeout wird mit dem erwarteten Zeitpunkt verglichen; die
+    Verspätung landet im Histogramm, größere Verspätungen zählen als Hänger.
+    """
+
+    def __init__(self, parent=None, interval=0.5, stall_threshold=0.2):
+        super().__init__(parent)
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self._expected = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(interval * 1000))
+        self._timer.timeout.connect(self.__beat)
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def __beat(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected)
+        LOOP_LAG_SECONDS.observe(lag)
+        if lag > self.stall_threshold:
+            LOOP_STALLS.inc()
+        self._expected = now + self.interval
+
+
+def format_metrics(snapshot):
+    """Metriken als Textblock für die Diagnoseseite (Dauern in ms)."""
+    lines = []
+    for name, hist in snapshot["histograms"].items():
+        if "p50" not in hist:
+            lines.append(f"{name:<26} n=0")
+            continue
+        lines.append(
+            f"{name:<26} n={hist['count']:<6} p50 {hist['p50'] * 1000:7.1f}  "
+            f"p99 {hist['p99'] * 1000:7.1f}  max {hist['max'] * 1000:7.1f} ms")
+    for name, value in snapshot["counters"].items():
+        lines.append(f"{name:<26} {value}")
+    for name, value in snapshot["gauges"].items():
+        lines.append(f"{name:<26} {value}")
+    return "\n".join(lines)
+
+
+class DiagnosticsView(QLabel):
+    """Zeigt die Metriken an, aktualisiert nur solange sie sichtbar ist."""
+
+    def __init__(self, parent=None, interval_ms=1000):
+        super().__init__(parent)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        self.setText(format_metrics(registry.snapshot()))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._timer.stop()
@@ -0,0 +1,64 @@
+import numpy as np
+
+# Mögliche Aggregationsfenster für aggregateWindow (Sekunden, Flux-Dauer)
+AGGREGATION_WINDOWS = [
+    (60, "1m"),
+    (120, "2m"),
+    (300, "5m"),
+    (600, "10m"),
+    (900, "15m"),
+    (1800, "30m"),
+    (3600, "1h"),
+    (7200, "2h"),
+    (10800, "3h"),
+    (21600, "6h"),
+    (43200, "12h"),
+    (86400, "1d"),
+]
+
+
+def choose_window(span, pixels, oversampling=2):
+    """Wählt das kleinste Aggregationsfenster, bei dem ``span`` höchstens
+    ``pixels * oversampling`` Punkte ergibt.
+
+    Die leichte Überabtastung lässt LTTB anschließend Spitzen erhalten, die
+    ein gröberes Mittelwertfenster bereits glattgebügelt hätte.
+    """
+    target = span.total_seconds() / (pixels * oversampling)
+    for seconds, flux in AGGREGATION_WINDOWS:
+        if seconds >= target:
+            return seconds, flux
+    return AGGREGATION_WINDOWS[-1]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: reduziert (x, y) auf ``threshold`` Punkte.
+
+    Aus jedem Bucket wird der Punkt behalten, der mit dem zuletzt gewählten
+    Punkt und dem Mittel des nächsten Buckets das größte Dreieck bildet.
+    Dadurch bleiben Spitzen erhalten, anders als beim Mitteln.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return x[selected], y[selected]
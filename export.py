@@ -0,0 +1,326 @@
+import argparse
+import csv
+import glob
+import importlib.util
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from channels import ChannelRegistry, flux_set
+from flux_csv import parse_times, read_rows
+from influx_client import InfluxService
+from timeseries import LOCAL_TZ
+
+# Export des Messwert-Verlaufs für die Auswertung außerhalb der Anzeige.
+#
+# Der Zeitraum wird in Blöcke (Standard: 1 Tag, fest an Vielfachen der
+# Blockgröße seit 1970 ausgerichtet) zerlegt, die parallel abgefragt und
+# jeweils direkt aus der CSV-Antwort in eine eigene Datei geschrieben werden.
+# Im Speicher liegt dabei je Block höchstens ein Zwischenpuffer von
+# EXPORT_ROWS Zeilen. Fertige Blöcke werden erst am Ende umbenannt und gelten
+# damit als Checkpoint: ein abgebrochener oder später wiederholter Export
+# (auch mit "-30d now") fragt nur die fehlenden bzw. angeschnittenen Blöcke
+# am Rand des Zeitraums neu ab.
+#
+#   python app.py --export 2024-01-01 2024-04-01 export/
+#   python app.py --export -30d now export/ --format parquet --workers 8
+#   python app.py --export 2024-01-01 2024-02-01 export/ --channels leistung --chunk 6h
+
+UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+# Zeilen je Parquet-Zeilengruppe bzw. CSV-Schreibpuffer
+EXPORT_ROWS = 65536
+
+EXPORT_FLUX = """
+from(bucket: "Strom")
+  |> range(start: time(v: "%(start)s"), stop: time(v: "%(stop)s"))
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => contains(value: r["uuid"], set: %(uuids)s))
+  |> keep(columns: ["_time", "_value", "uuid"])
+"""
+
+
+def parse_duration(text):
+    """'6h', '1d', '30m' als timedelta."""
+    match = re.fullmatch(r"(\d+)([mhd])", text.strip())
+    if not match or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"ungültige Dauer {text!r} (z.B. 6h, 1d)")
+    return timedelta(seconds=int(match.group(1)) * UNITS[match.group(2)])
+
+
+def parse_point(text, now):
+    """Zeitpunkt als 'now', relativ ('-30d') oder ISO-Datum (ohne Zone: Ortszeit)."""
+    text = text.strip()
+    if text == "now":
+        return now
+    if text.startswith("-"):
+        return now - parse_duration(text[1:])
+    try:
+        point = datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ungültiger Zeitpunkt {text!r}")
+    if point.tzinfo is None:
+        point = point.replace(tzinfo=LOCAL_TZ)
+    return point.astimezone(timezone.utc)
+
+
+def plan_chunks(start, stop, chunk):
+    """Blöcke [Beginn, Ende) im festen Raster (Vielfache von ``chunk`` seit 1970, UTC).
+
+    Der erste und letzte Block werden auf ``start`` bzw. ``stop`` gekürzt,
+    alle übrigen liegen unabhängig vom gewählten Zeitraum immer gleich.
+    """
+    step = int(chunk.total_seconds())
+    cell = datetime.fromtimestamp(int(start.timestamp()) // step * step, tz=timezone.utc)
+    chunks = []
+    while cell < stop:
+        end = cell + chunk
+        chunks.append((max(cell, start), min(end, stop)))
+        cell = end
+    return chunks
+
+
+def part_name(start, stop, fmt):
+    # Beginn und Ende im Namen: ein gekürzter Randblock ist kein Checkpoint
+    # für den vollständigen Block an derselben Stelle
+    def stamp(point):
+        return point.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"part-{stamp(start)}-{stamp(stop)}.{fmt}"
+
+
+class CsvPartWriter:
+    """Schreibt die Zeilen eines Blocks als CSV (Zeit in UTC, Rohwerte wie in der InfluxDB)."""
+
+    def __init__(self, filename):
+        self.file = open(filename, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(("time", "channel", "value"))
+        self.rows = []
+
+    def add(self, time_text, channel, value_text):
+        self.rows.append((time_text, channel, value_text))
+        if len(self.rows) >= EXPORT_ROWS:
+            self.flush()
+
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ParquetPartWriter:
+    """Schreibt die Zeilen eines Blocks spaltenweise als Parquet (benötigt pyarrow)."""
+
+    def __init__(self, filename):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("time", pa.timestamp("ns", tz="UTC")),
+            ("channel", pa.string()),
+            ("value", pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(filename, self.schema, compression="zstd")
+        self.times = []
+        self.channels = []
+        self.values = []
+
+    def add(self, time_text, channel, value_text):
+        self.times.append(time_text)
+        self.channels.append(channel)
+        self.values.append(value_text)
+        if len(self.times) >= EXPORT_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.times:
+            return
+        pa = self.pa
+        batch = pa.record_batch([
+            pa.array(parse_times(self.times), type=self.schema.field("time").type),
+            pa.array(self.channels, type=pa.string()),
+            pa.array(np.array(self.values, dtype=np.float64)),
+        ], schema=self.schema)
+        self.writer.write_batch(batch)
+        self.times = []
+        self.channels = []
+        self.values = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvPartWriter, "parquet": ParquetPartWriter}
+
+
+class HistoryExport:
+    """Exportiert die Rohwerte der gewählten Kanäle zwischen ``start`` und ``stop``.
+
+    Jeder Block wird unter ``<name>.tmp`` geschrieben und erst nach der letzten
+    Zeile umbenannt; vorhandene Blockdateien werden übersprungen. Blockdateien,
+    die nicht zum aktuellen Zeitraum passen (gekürzte Randblöcke eines früheren
+    Laufs, Blöcke außerhalb des Zeitraums), werden entfernt, das Verzeichnis
+    enthält also nie doppelte Zeilen. In ``export.json`` stehen Format, Kanäle,
+    Blockgröße und der Zeitraum des letzten Laufs; ein Fortsetzen mit anderen
+    Kanälen oder anderer Blockgröße wird abgelehnt.
+    """
+
+    def __init__(self, influx, channels, directory, fmt="csv", chunk=timedelta(days=1)):
+        self.influx = influx
+        self.channels = list(channels)
+        self.names = {channel.uuid: channel.name for channel in self.channels}
+        self.directory = directory
+        self.fmt = fmt
+        self.chunk = chunk
+
+    def manifest(self, start, stop):
+        return {
+            "format": self.fmt,
+            "channels": sorted(self.names.values()),
+            "chunk_seconds": int(self.chunk.total_seconds()),
+            "start": start.astimezone(timezone.utc).isoformat(),
+            "stop": stop.astimezone(timezone.utc).isoformat(),
+        }
+
+    def prepare(self, start, stop):
+        """Legt das Zielverzeichnis an, prüft ``export.json`` und trägt den Zeitraum ein."""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self.manifest(start, stop)
+        filename = os.path.join(self.directory, "export.json")
+        if os.path.exists(filename):
+            with open(filename, "r") as file:
+                previous = json.load(file)
+            for key in ("format", "channels", "chunk_seconds"):
+                if previous.get(key) != manifest[key]:
+                    raise ValueError(f"{self.directory} enthält einen Export mit anderem Wert "
+                                     f"für {key} ({previous.get(key)})")
+        # Erst umbenennen, wenn die Datei vollständig ist (wie local_storage)
+        tmp = f"{filename}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(manifest, file)
+        os.replace(tmp, filename)
+
+    def pending(self, start, stop):
+        """Blöcke ohne fertige Datei; Dateien, die nicht zum Zeitraum passen, werden entfernt."""
+        planned = {
+            part_name(chunk_start, chunk_stop, self.fmt): (chunk_start, chunk_stop)
+            for chunk_start, chunk_stop in plan_chunks(start, stop, self.chunk)}
+        existing = {os.path.basename(filename) for filename in
+                    glob.glob(os.path.join(self.directory, f"part-*.{self.fmt}"))}
+        outdated = existing - planned.keys()
+        for name in outdated:
+            os.remove(os.path.join(self.directory, name))
+        if outdated:
+            print(f"{len(outdated)} Blockdateien außerhalb des Zeitraums bzw. mit "
+                  f"anderen Grenzen entfernt")
+        return [(chunk_start, chunk_stop, os.path.join(self.directory, name))
+                for name, (chunk_start, chunk_stop) in sorted(planned.items())
+                if name not in existing]
+
+    def export_chunk(self, start, stop, filename):
+        """Fragt einen Block ab und schreibt ihn zeilenweise; gibt die Anzahl Zeilen zurück."""
+        lines = self.influx.query_lines(EXPORT_FLUX % {
+            "start": start.astimezone(timezone.utc).isoformat(),
+            "stop": stop.astimezone(timezone.utc).isoformat(),
+            "uuids": flux_set(self.names)})
+        tmp = f"{filename}.tmp"
+        writer = WRITERS[self.fmt](tmp)
+        rows = 0
+        try:
+            for (time_text, value_text, uuid), _ in read_rows(lines, ("_time", "_value", "uuid")):
+                if value_text == "":
+                    continue
+                writer.add(time_text, self.names.get(uuid, uuid), value_text)
+                rows += 1
+        finally:
+            writer.close()
+        os.replace(tmp, filename)
+        return rows
+
+    def run(self, start, stop, workers=4):
+        """Exportiert alle fehlenden Blöcke mit ``workers`` parallelen Abfragen.
+
+        Gibt die Anzahl fehlgeschlagener Blöcke zurück (0 = vollständig).
+        """
+        self.prepare(start, stop)
+        chunks = self.pending(start, stop)
+        total = len(plan_chunks(start, stop, self.chunk))
+        print(f"{total - len(chunks)} von {total} Blöcken bereits vorhanden, "
+              f"{len(chunks)} werden abgefragt")
+        began = time.perf_counter()
+        rows = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as executor:
+            futures = {executor.submit(self.export_chunk, *chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk_start, chunk_stop, filename = futures[future]
+                try:
+                    count = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Error exporting {os.path.basename(filename)}: {e}")
+                    continue
+                rows += count
+                print(f"{os.path.basename(filename)}: {count} Zeilen")
+        elapsed = time.perf_counter() - began
+        print(f"{rows} Zeilen in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} Zeilen/s)"
+              + (f", {failed} Blöcke fehlgeschlagen (erneut aufrufen zum Fortsetzen)" if failed else ""))
+        return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app.py --export", description="Messwert-Verlauf blockweise als CSV oder Parquet exportieren")
+    parser.add_argument("start", help="Beginn: ISO-Datum (Ortszeit), -30d o.ä.")
+    parser.add_argument("stop", help="Ende: ISO-Datum (Ortszeit), -1d, now")
+    parser.add_argument("directory", help="Zielverzeichnis, eine Datei je Block")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--chunk", type=parse_duration, default=timedelta(days=1),
+                        help="Zeitraum je Abfrage und Datei (Standard: 1d)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallele Abfragen (%(default)s)")
+    parser.add_argument("--channels", help="Kanalnamen, kommagetrennt (Standard: alle)")
+    args = parser.parse_args(argv)
+
+    now = datetime.now(timezone.utc)
+    try:
+        start = parse_point(args.start, now)
+        stop = parse_point(args.stop, now)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if start >= stop:
+        parser.error("Beginn muss vor dem Ende liegen")
+    if args.workers < 1:
+        parser.error("--workers muss mindestens 1 sein")
+
+    channels = ChannelRegistry.load()
+    if args.channels:
+        names = [name.strip() for name in args.channels.split(",")]
+        unknown = [name for name in names if name not in {channel.name for channel in channels}]
+        if unknown:
+            parser.error(f"unbekannte Kanäle: {', '.join(unknown)}")
+        channels = [channel for channel in channels if channel.name in names]
+    if args.format == "parquet":
+        if importlib.util.find_spec("pyarrow") is None:
+            parser.error("Parquet-Export benötigt pyarrow (pip install pyarrow)")
+
+    # Eine Verbindung je Worker, sonst warten die Abfragen auf den urllib3-Pool
+    influx = InfluxService(pool_size=args.workers)
+    export = HistoryExport(influx, channels, args.directory, args.format, args.chunk)
+    try:
+        return 1 if export.run(start, stop, args.workers) else 0
+    except ValueError as e:
+        print(f"Export aborted: {e}")
+        return 1
+    finally:
+        influx.close()
@@ -0,0 +1,154 @@
+import csv
+from datetime import datetime, timezone
+from operator import itemgetter
+
+import numpy as np
+
+from timeseries import TimeSeries
+
+# Spalten eines Datensatzes im data_dict, alle übrigen werden übersprungen
+RECORD_COLUMNS = ("_time", "_value", "_field", "_measurement", "uuid")
+
+# Zeitreihen werden blockweise umgewandelt, der Zwischenspeicher für die
+# Texte bleibt daher unabhängig von der Größe des Ergebnisses
+CHUNK_ROWS = 4096
+
+
+class FluxError(RuntimeError):
+    """Fehlermeldung, die InfluxDB innerhalb der CSV-Antwort meldet."""
+
+
+def parse_time(text):
+    """RFC3339-Zeitstempel (UTC) als datetime; Nanosekunden werden abgeschnitten."""
+    text = text[:-1] if text.endswith("Z") else text
+    if "." in text:
+        head, fraction = text.split(".", 1)
+        text = f"{head}.{fraction[:6].ljust(6, '0')}"
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc)
+
+
+def parse_times(texts):
+    """Viele RFC3339-Zeitstempel (UTC) auf einmal als datetime64[ns]."""
+    return np.array([text[:-1] if text.endswith("Z") else text for text in texts],
+                    dtype="datetime64[ns]")
+
+
+CONVERTERS = {
+    "double": float,
+    "long": int,
+    "unsignedLong": int,
+    "boolean": lambda text: text == "true",
+    "dateTime:RFC3339": parse_time,
+    "dateTime:RFC3339Nano": parse_time,
+}
+
+
+def convert(text, datatype):
+    """Wandelt einen Text der CSV-Antwort anhand des #datatype in einen Wert um."""
+    if text == "":
+        return None
+    return CONVERTERS.get(datatype, str)(text)
+
+
+def _picker(indexes, fallback):
+    # Normalfall (alle Spalten vorhanden, keine #default-Werte) komplett in C
+    if len(indexes) > 1 and None not in indexes and not any(fallback):
+        return itemgetter(*indexes)
+    return lambda row: tuple(row[i] or default if i is not None else default
+                             for i, default in zip(indexes, fallback))
+
+
+def read_rows(lines, columns):
+    """Liest annotiertes CSV (InfluxDB-Antwort) Zeile für Zeile.
+
+    Liefert je Datenzeile die Texte der Spalten ``columns`` (fehlende Spalten
+    als "") und die zugehörigen Datentypen. Es werden keine FluxTable- oder
+    FluxRecord-Objekte aufgebaut und nichts über die aktuelle Zeile hinaus
+    festgehalten.
+    """
+    datatypes = defaults = None
+    pick = types = None
+    expect_header = True
+    error_column = None
+    for row in csv.reader(lines):
+        if not row or not any(row):
+            # Leerzeile trennt Tabellen mit unterschiedlichem Aufbau
+            expect_header = True
+            continue
+        marker = row[0]
+        if marker.startswith("#"):
+            if marker == "#datatype":
+                datatypes = row
+            elif marker == "#default":
+                defaults = row
+            expect_header = True
+            continue
+        if expect_header:
+            expect_header = False
+            if "error" in row and "reference" in row:
+                error_column = row.index("error")
+                continue
+            indexes = [row.index(column) if column in row else None for column in columns]
+            types = tuple(datatypes[i] if datatypes and i is not None else "string"
+                          for i in indexes)
+            pick = _picker(indexes, tuple(defaults[i] if defaults and i is not None else ""
+                                          for i in indexes))
+            continue
+        if error_column is not None:
+            raise FluxError(row[error_column])
+        yield pick(row), types
+
+
+class SeriesBuilder:
+    """Sammelt Zeit/Wert-Texte und wandelt sie blockweise vektorisiert in Arrays um."""
+
+    def __init__(self):
+        self._times = []
+        self._values = []
+        self._time_chunks = []
+        self._value_chunks = []
+
+    def add(self, time_text, value_text):
+        if value_text == "":
+            return
+        self._times.append(time_text)
+        self._values.append(value_text)
+        if len(self._times) >= CHUNK_ROWS:
+            self.__convert()
+
+    def __convert(self):
+        if not self._times:
+            return
+        self._time_chunks.append(parse_times(self._times))
+        self._value_chunks.append(np.array(self._values, dtype=np.float64))
+        self._times = []
+        self._values = []
+
+    def series(self, replace_from=None):
+        self.__convert()
+        if not self._time_chunks:
+            return TimeSeries(replace_from=replace_from)
+        times = np.concatenate(self._time_chunks)
+        values = np.concatenate(self._value_chunks)
+        self._time_chunks = []
+        self._value_chunks = []
+        return TimeSeries(times, values, replace_from)
+
+
+def read_series(lines, replace_from=None):
+    """Liest ``_time``/``_value`` aller Tabellen direkt in eine TimeSeries."""
+    builder = SeriesBuilder()
+    for (time_text, value_text), _ in read_rows(lines, ("_time", "_value")):
+        builder.add(time_text, value_text)
+    return builder.series(replace_from)
+
+
+def read_series_by(lines, column):
+    """Wie read_series, aber eine TimeSeries je Wert der Spalte ``column`` (z.B. uuid)."""
+    builders = {}
+    for (key, time_text, value_text), _ in read_rows(lines, (column, "_time", "_value")):
+        builder = builders.get(key)
+        if builder is None:
+            builder = builders[key] = SeriesBuilder()
+        builder.add(time_text, value_text)
+    return {key: builder.series() for key, builder in builders.items()}
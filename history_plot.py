@@ -0,0 +1,294 @@
+import threading
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+import matplotlib.dates as mdates
+import matplotlib.style
+import matplotlib.ticker as ticker
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PyQt5.QtCore import QSize, QThread, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QSizePolicy, QWidget
+
+from downsample import lttb
+from metrics import registry
+from plot_buffer import RingBuffer
+
+# Dieses Modul wird erst beim ersten Öffnen der Verlaufsseite importiert,
+# matplotlib verlängert sonst den Programmstart um mehrere Sekunden
+matplotlib.style.use('dark_background')
+
+RENDER_SECONDS = registry.histogram(
+    "plot_render_seconds", "Rastern des Verlaufs im Render-Thread")
+RENDERS_COALESCED = registry.counter(
+    "plot_updates_coalesced_total", "Verlaufs-Updates, die ohne eigenes Bild übernommen wurden")
+RENDERS_CACHED = registry.counter(
+    "plot_renders_cached_total", "Updates ohne Änderung, das letzte Bild wurde weiterverwendet")
+
+
+def watt_formatter(x, pos):
+    return f"{int(x)} W"
+
+
+class PlotFigure:
+    """Die matplotlib-Figur des Verlaufs, gerastert mit Agg (ohne Qt).
+
+    Wird ausschließlich vom PlotRenderer-Thread benutzt.
+    """
+
+    def __init__(self, window=timedelta(hours=12), headroom=timedelta(minutes=30)):
+        self.figure = Figure()
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot(111)
+
+        # Eine einzige Linie, deren Daten aus einem Ringpuffer (1 Punkt je
+        # Aggregationsfenster) kommen; gezeichnet werden höchstens so viele
+        # Punkte, wie das Bild Pixel breit ist
+        self.line, = self.axes.plot([], [], animated=True)
+        self.axes.yaxis.set_major_formatter(ticker.FuncFormatter(watt_formatter))
+        self.size = None
+        self.set_range(window, 60, headroom)
+
+        # Hintergrund (Achsen, Beschriftung) für Blitting zwischenspeichern
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self.__on_draw)
+
+    def __on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.axes.draw_artist(self.line)
+
+    def set_range(self, window, every, headroom=None):
+        """Stellt Zeitraum und Auflösung (Sekunden je Punkt) um und leert die Linie."""
+        self.time_window = window
+        self.headroom = headroom if headroom is not None else window / 24
+        capacity = int((window + self.headroom).total_seconds() // every) + 1
+        self.buffer = RingBuffer(capacity)
+        self.line.set_data([], [])
+
+        tz = ZoneInfo("Europe/Berlin")
+        if window <= timedelta(hours=12):
+            locator, label = mdates.HourLocator(interval=1), '%Hh'
+        elif window <= timedelta(days=1):
+            locator, label = mdates.HourLocator(interval=3), '%Hh'
+        elif window <= timedelta(days=7):
+            locator, label = mdates.DayLocator(tz=tz), '%d.%m.'
+        else:
+            locator, label = mdates.DayLocator(interval=5, tz=tz), '%d.%m.'
+        self.axes.xaxis.set_major_locator(locator)
+        self.axes.xaxis.set_major_formatter(mdates.DateFormatter(label, tz=tz))
+        # Achsen beim nächsten Bild neu aufbauen
+        self.axes.set_xlim(0, 1)
+        self._background = None
+
+    def update_series(self, series):
+        """Übernimmt neue Punkte in den Puffer. Gibt False zurück, wenn sich nichts geändert hat."""
+        if series.replace_from is None:
+            self.buffer.clear()
+            if series:
+                self.buffer.extend(mdates.date2num(series.times), series.values)
+            return True
+        xs, ys = self.buffer.view()
+        cut = int(np.searchsorted(xs, mdates.date2num(series.replace_from), side="right"))
+        new_xs = mdates.date2num(series.times) if series else np.empty(0)
+        # Das letzte Fenster wird bei jedem Abruf erneut geliefert, meist unverändert
+        if np.array_equal(xs[cut:], new_xs) and np.array_equal(ys[cut:], series.values):
+            return False
+        self.buffer.truncate_after(mdates.date2num(series.replace_from))
+        if series:
+            self.buffer.extend(new_xs, series.values)
+        return True
+
+    def render(self, width, height, dpi):
+        """Rastert die Figur mit ``width`` x ``height`` Pixeln und gibt ein QImage zurück."""
+        if self.size != (width, height, dpi):
+            self.size = (width, height, dpi)
+            self.figure.set_dpi(dpi)
+            self.figure.set_size_inches(width / dpi, height / dpi)
+            self._background = None
+
+        xs, ys = self.buffer.view()
+        if len(xs) == 0:
+            self.line.set_data(xs, ys)
+            self.canvas.draw()
+        else:
+            # Mehr Punkte als Pixel bringen nichts, LTTB erhält dabei die Spitzen
+            self.line.set_data(*lttb(xs, ys, width))
+            if self.__out_of_bounds(xs, ys):
+                self.__rescale(xs, ys)
+                self.canvas.draw()
+            elif self._background is None:
+                self.canvas.draw()
+            else:
+                self.canvas.restore_region(self._background)
+                self.axes.draw_artist(self.line)
+
+        buffer = self.canvas.buffer_rgba()
+        rows, columns = buffer.shape[:2]
+        # copy(): der Agg-Puffer wird beim nächsten Bild überschrieben
+        return QImage(buffer, columns, rows, QImage.Format_RGBA8888).copy()
+
+    def __out_of_bounds(self, xs, ys):
+        left, right = self.axes.get_xlim()
+        bottom, top = self.axes.get_ylim()
+        return xs[-1] > right or xs[-1] < left or ys.max() > top or ys.min() < bottom
+
+    def __rescale(self, xs, ys):
+        # Rechts etwas Platz lassen, damit neue Punkte eine Weile ohne
+        # kompletten Neuaufbau (nur per Blitting) gezeichnet werden können
+        right = xs[-1] + self.headroom / timedelta(days=1)
+        left = right - self.time_window / timedelta(days=1)
+        self.axes.set_xlim(left, right)
+        span = max(ys.max() - min(ys.min(), 0), 1)
+        self.axes.set_ylim(min(ys.min(), 0), ys.max() + span * 0.1)
+
+
+class PlotRenderer(QThread):
+    """Rastert den Verlauf in einem eigenen Thread.
+
+    Änderungen (neue Punkte, anderer Zeitraum, andere Größe) werden nur in
+    eine Warteschlange gestellt. Der Thread übernimmt jeweils alle
+    angefallenen Änderungen auf einmal und zeichnet danach ein einziges Bild;
+    was während des Zeichnens eintrifft, landet gesammelt im nächsten Bild.
+    Ohne Änderung wird nichts gezeichnet, das letzte Bild bleibt gültig.
+    """
+
+    # Fertiges Bild (QImage), wird im GUI-Thread in ein QPixmap umgewandelt
+    frameReady = pyqtSignal(object)
+
+    def __init__(self, window=timedelta(hours=12), headroom=timedelta(minutes=30)):
+        super().__init__()
+        self.plot = PlotFigure(window, headroom)
+        self._cond = threading.Condition()
+        self._updates = []
+        self._size = None
+        self._frame_size = None
+        self._busy = False
+        self._running = True
+        self.frames = 0
+
+    def set_range(self, window, every, headroom=None):
+        self.__submit(("range", (window, every, headroom)))
+
+    def update_series(self, series):
+        self.__submit(("series", series))
+
+    def resize(self, width, height, dpi):
+        with self._cond:
+            self._size = (width, height, dpi)
+            self._cond.notify()
+
+    def __submit(self, update):
+        with self._cond:
+            self._updates.append(update)
+            self._cond.notify()
+
+    def __idle(self):
+        return not self._busy and not self._updates and (
+            self._size is None or self._size == self._frame_size)
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: not self._running or not self.__idle())
+                if not self._running:
+                    return
+                updates, self._updates = self._updates, []
+                size = self._size
+                self._busy = True
+            try:
+                changed = False
+                for kind, value in updates:
+                    if kind == "range":
+                        self.plot.set_range(*value)
+                        changed = True
+                    elif self.plot.update_series(value):
+                        changed = True
+                    else:
+                        RENDERS_CACHED.inc()
+                if len(updates) > 1:
+                    RENDERS_COALESCED.inc(len(updates) - 1)
+                if size is not None and (changed or size != self._frame_size):
+                    with RENDER_SECONDS.time():
+                        image = self.plot.render(*size)
+                    self.frames += 1
+                    self.frameReady.emit(image)
+            finally:
+                with self._cond:
+                    self._frame_size = size
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Wartet, bis alle Änderungen gezeichnet sind (für Tests und benchmark.py)."""
+        with self._cond:
+            return self._cond.wait_for(self.__idle, timeout)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self.wait()
+
+
+class PlotView(QWidget):
+    """Zeigt den Verlauf als fertiges Bild; gezeichnet wird im PlotRenderer.
+
+    Im GUI-Thread wird nur das fertige Bild übernommen, matplotlib blockiert
+    so weder Touch-Eingaben noch die übrigen Anzeigen.
+    """
+
+    # Neue Breite in physischen Pixeln (bestimmt das Aggregationsfenster der Abfrage)
+    pixelsChanged = pyqtSignal(int)
+
+    def __init__(self, parent=None, window=timedelta(hours=12),
+                 headroom=timedelta(minutes=30)):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        # Bildbreite in physischen Pixeln, nach der sich die Abfrage-Auflösung
+        # richtet; bis zum ersten resizeEvent die Breite aus sizeHint
+        self.pixels = 500
+        self.plot_range = (window, 60)
+        self.pixmap = None
+        self.renderer = PlotRenderer(window, headroom)
+        self.renderer.frameReady.connect(self.__show_frame)
+        self.renderer.start()
+
+    def sizeHint(self):
+        return QSize(500, 300)
+
+    def set_range(self, window, every, headroom=None):
+        """Stellt Zeitraum und Auflösung (Sekunden je Punkt) um und leert die Linie."""
+        self.plot_range = (window, every)
+        self.renderer.set_range(window, every, headroom)
+
+    def update_series(self, series):
+        """Übergibt neue Punkte an den Render-Thread, gezeichnet wird dort."""
+        self.renderer.update_series(series)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # In physischen Pixeln und mit der DPI des Bildschirms rastern
+        ratio = self.devicePixelRatioF()
+        size = event.size()
+        if size.width() > 0 and size.height() > 0:
+            width = round(size.width() * ratio)
+            self.renderer.resize(width, round(size.height() * ratio), self.logicalDpiY() * ratio)
+            if width != self.pixels:
+                self.pixels = width
+                self.pixelsChanged.emit(width)
+
+    def __show_frame(self, image):
+        self.pixmap = QPixmap.fromImage(image)
+        self.pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.update()
+
+    def paintEvent(self, event):
+        if self.pixmap is None:
+            return
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.pixmap)
+
+    def stop(self):
+        self.renderer.stop()
@@ -0,0 +1,156 @@
+import io
+import os
+import threading
+import time
+
+from urllib3.exceptions import HTTPError
+
+from metrics import registry
+
+QUERY_SECONDS = registry.histogram(
+    "influx_query_seconds", "Dauer einer Flux-Abfrage inkl. Antwort-Parsing im Client")
+QUERY_ERRORS = registry.counter(
+    "influx_query_errors_total", "Verbindungsfehler bei Flux-Abfragen")
+
+
+class InfluxService:
+    """Langlebiger InfluxDB-Client, der von allen Threads gemeinsam benutzt wird.
+
+    Der Client hält seine HTTP-Verbindungen per Keep-Alive im urllib3-Pool offen,
+    statt bei jeder Abfrage eine neue Verbindung aufzubauen. Bricht die Verbindung
+    ab, wird der Client mit exponentiellem Backoff neu aufgebaut.
+    """
+
+    def __init__(self, url=None, token=None, org=None, pool_size=4,
+                 max_retries=3, backoff_start=0.5, backoff_max=30.0):
+        self.url = url or os.environ.get("influx_url")
+        self.token = token or os.environ.get("influx_token")
+        self.org = org or os.environ.get("influx_org")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._query_api = None
+        # Nach close() wird der Client nicht wieder aufgebaut
+        self._closed = False
+
+        # Latenz-Zähler pro Abfrage (Millisekunden)
+        self.query_count = 0
+        self.error_count = 0
+        self.reconnect_count = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    def __connect(self):
+        # Erst bei der ersten Abfrage importieren, das Paket verzögert sonst den Start
+        from influxdb_client import InfluxDBClient
+
+        self._client = InfluxDBClient(
+            url=self.url,
+            token=self.token,
+            org=self.org,
+            connection_pool_maxsize=self.pool_size,
+        )
+        self._query_api = self._client.query_api()
+
+    def query_api(self):
+        """Gibt die (geteilte) QueryApi zurück und baut den Client bei Bedarf auf."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("InfluxService is closed")
+            if self._client is None:
+                self.__connect()
+            return self._query_api
+
+    def reconnect(self):
+        with self._lock:
+            if self._client is not None:
+                try:
+                    self._client.close()
+                except Exception as e:
+                    print(f"Error closing influx client: {e}")
+            self._client = None
+            self._query_api = None
+            self.reconnect_count += 1
+
+    def query(self, query):
+        """Führt eine Flux-Abfrage aus, bei Verbindungsfehlern mit Reconnect und Backoff."""
+        return self._call(lambda api: api.query(query=query))
+
+    def query_lines(self, query):
+        """Führt eine Flux-Abfrage aus und liefert die Antwort (annotiertes CSV) zeilenweise.
+
+        Die Anfrage wird sofort gestellt, die Antwort aber nicht vorab komplett
+        geladen, sondern erst beim Iterieren aus der Verbindung gelesen (siehe
+        flux_csv). Gemessen wird bis zur letzten gelesenen Zeile.
+        """
+        start = time.perf_counter()
+        response = self._call(lambda api: api.query_raw(query=query), record=False)
+        return self.__read_lines(response, start)
+
+    def __read_lines(self, response, start):
+        # Sonst schließt urllib3 die Antwort am Ende, bevor TextIOWrapper seinen Puffer geleert hat
+        response.auto_close = False
+        complete = False
+        try:
+            yield from io.TextIOWrapper(response, encoding="utf-8", newline="")
+            complete = True
+        finally:
+            if complete:
+                response.release_conn()
+            else:
+                # Nicht zu Ende gelesene Verbindung nicht in den Pool zurückgeben
+                response.close()
+        self.__record_latency((time.perf_counter() - start) * 1000)
+
+    def _call(self, fn, record=True):
+        backoff = self.backoff_start
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = fn(self.query_api())
+            except (HTTPError, OSError) as e:
+                self.error_count += 1
+                QUERY_ERRORS.inc()
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"Influx connection error ({e}), reconnect in {backoff:.1f}s")
+                self.reconnect()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            if record:
+                self.__record_latency((time.perf_counter() - start) * 1000)
+            return result
+
+    def __record_latency(self, elapsed_ms):
+        self.query_count += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        QUERY_SECONDS.observe(elapsed_ms / 1000)
+
+    def stats(self):
+        """Liefert die Latenz-Zähler als Dictionary."""
+        return {
+            "queries": self.query_count,
+            "errors": self.error_count,
+            "reconnects": self.reconnect_count,
+            "last_ms": self.last_ms,
+            "max_ms": self.max_ms,
+            "avg_ms": self.total_ms / self.query_count if self.query_count else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+            self._query_api = None
@@ -0,0 +1,85 @@
+import socket
+from datetime import datetime, timezone
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+def parse_line(line):
+    """Zerlegt eine Zeile im InfluxDB-Line-Protocol.
+
+    Beispiel: ``vz_measurement,uuid=1810eb97-... value=512.3 1713451920000000000``
+
+    Gibt (measurement, tags, fields, zeit) zurück oder None, wenn die Zeile
+    nicht verarbeitet werden kann. Ohne Zeitstempel wird die Empfangszeit benutzt.
+    Escapes und String-Felder werden nicht unterstützt (liefert volkszähler nicht).
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    parts = line.split(" ")
+    if len(parts) < 2:
+        return None
+    series, field_set = parts[0], parts[1]
+    measurement, *tag_pairs = series.split(",")
+    try:
+        tags = dict(pair.split("=", 1) for pair in tag_pairs)
+        fields = {}
+        for pair in field_set.split(","):
+            key, value = pair.split("=", 1)
+            fields[key] = float(value.rstrip("i"))
+        if len(parts) > 2:
+            ts = datetime.fromtimestamp(int(parts[2]) / 1e9, tz=timezone.utc)
+        else:
+            ts = datetime.now(timezone.utc)
+    except ValueError:
+        return None
+    return measurement, tags, fields, ts
+
+
+class LineProtocolListener(QThread):
+    """Empfängt Messwerte per UDP im Line-Protocol (z.B. von vzlogger/Telegraf).
+
+    Zum Testen ohne Zähler reicht:
+    ``echo "vz_measurement,uuid=<uuid> value=500" | nc -u -w0 localhost 8094``
+    """
+
+    # uuid, Zeitpunkt (UTC), Wert
+    sampleReceived = pyqtSignal(str, object, float)
+
+    def __init__(self, host="0.0.0.0", port=8094, measurement="vz_measurement", field="value"):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.measurement = measurement
+        self.field = field
+        self._running = False
+
+    def run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        # Timeout, damit stop() den Thread beenden kann
+        sock.settimeout(0.5)
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    payload, _ = sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                for line in payload.decode("utf-8", errors="replace").splitlines():
+                    parsed = parse_line(line)
+                    if parsed is None:
+                        continue
+                    measurement, tags, fields, ts = parsed
+                    if measurement != self.measurement or self.field not in fields:
+                        continue
+                    uuid = tags.get("uuid")
+                    if uuid:
+                        self.sampleReceived.emit(uuid, ts, fields[self.field])
+        finally:
+            sock.close()
+
+    def stop(self):
+        self._running = False
+        self.wait()
@@ -1,49 +1,167 @@
+import copy
 import json
 import os
+import threading
 from datetime import datetime
+
+# Version des Dateiformats, ältere Dateien werden beim Laden umgewandelt
+SCHEMA_VERSION = 1
+
+# Startzeiten werden in Ortszeit als Text gespeichert (so auch in der Anzeige)
+TIME_FORMAT = "%d.%m.%Y, %H:%Mh"
+
 default_dict = {
-                        'cum_counter_start_value': None,
-                        'cum_counter_start_time': None,
-                    }
+    'schema': SCHEMA_VERSION,
+    # Name -> {'start_value': ..., 'start_time': ...} für laufende Zähler
+    'counters': {},
+    # Name -> Liste abgeschlossener Läufe (zusätzlich 'stop_value', 'stop_time')
+    'history': {},
+}
+
+
+def new_state():
+    """Frische Kopie des Standardzustands (nie default_dict selbst verändern)."""
+    return copy.deepcopy(default_dict)
+
+
+def migrate(data):
+    """Wandelt ältere Dateiformate in das aktuelle Schema um."""
+    if not isinstance(data, dict):
+        return new_state()
+    if 'schema' not in data:
+        # Version 0: ein einzelner Zähler direkt auf oberster Ebene
+        state = new_state()
+        if data.get('cum_counter_start_value') is not None and data.get('cum_counter_start_time') is not None:
+            state['counters']['default'] = {
+                'start_value': data['cum_counter_start_value'],
+                'start_time': data['cum_counter_start_time'],
+            }
+        return state
+    state = new_state()
+    state.update(data)
+    state['schema'] = SCHEMA_VERSION
+    return state
+
+
 class DataHandler:
-    def __init__(self, filename='data.json'):
+    """Dauerhafter Zustand der Anzeige (kumulative Zähler und ihr Verlauf) in einer JSON-Datei.
+
+    Geschrieben wird atomar (temporäre Datei, fsync, rename), ein Stromausfall
+    hinterlässt also entweder die alte oder die neue Datei. Änderungen werden
+    gesammelt und erst nach ``flush_delay`` Sekunden in einem Rutsch
+    geschrieben; ``flush()`` schreibt sofort (z.B. beim Beenden).
+    """
+
+    def __init__(self, filename='data.json', flush_delay=2.0, max_history=1000):
         self.filename = filename
+        self.flush_delay = flush_delay
+        self.max_history = max_history
+        self._lock = threading.RLock()
+        self._timer = None
+        self._dirty = False
+        self.writes = 0
         self.data = self.__load_data()
 
     def __load_data(self):
         """Lädt Daten aus einer JSON-Datei, erstellt eine Datei, wenn sie nicht existiert, und fängt mögliche Fehler ab."""
         try:
             if not os.path.exists(self.filename):
-                with open(self.filename, 'w') as file:
-                    json.dump(default_dict, file)  # Leeres JSON-Objekt in die Datei schreiben
-                return default_dict
+                self.data = new_state()
+                self.__write()
+                return self.data
             else:
                 with open(self.filename, 'r') as file:
-                    return json.load(file)
+                    return migrate(json.load(file))
         except json.JSONDecodeError as e:
             print(f"JSON decode error: {e}")  # Log den Fehler
-            return default_dict  # Rückgabe eines leeren Dicts, wenn das Laden fehlschlägt
+            return new_state()
         except Exception as e:
             print(f"General error when accessing file: {e}")
-            return default_dict  # Sicherstellen, dass immer ein Dict zurückgegeben wird
+            return new_state()  # Sicherstellen, dass immer ein Dict zurückgegeben wird
 
-    def __save_data(self):
-        """Speichert Daten in einer JSON-Datei, mit Fehlerbehandlung."""
+    def __write(self):
+        """Schreibt den Zustand atomar: erst in eine temporäre Datei, dann umbenennen."""
+        tmp = f"{self.filename}.tmp"
         try:
-            with open(self.filename, 'w') as file:
+            with open(tmp, 'w') as file:
                 json.dump(self.data, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp, self.filename)
+            # Auch den Verzeichniseintrag sichern, sonst kann das rename verloren gehen
+            directory = os.open(os.path.dirname(os.path.abspath(self.filename)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+            self.writes += 1
         except Exception as e:
             print(f"Error saving data to file: {e}")
 
-    def set_data(self, value):
-        self.data = {
-                        'cum_counter_start_value': value,
-                        'cum_counter_start_time': datetime.now().strftime("%d.%m.%Y, %H:%Mh")
-                    }
-        self.__save_data()
-    def reset_data(self):
-        self.data = default_dict
-        self.__save_data()
+    def __mark_dirty(self):
+        # Mehrere Änderungen kurz hintereinander ergeben nur einen Schreibvorgang
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Schreibt ausstehende Änderungen sofort."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._dirty = False
+                self.__write()
+
+    def get_counter(self, name='default'):
+        """Laufender Zähler als Dictionary (start_value, start_time) oder None."""
+        with self._lock:
+            counter = self.data['counters'].get(name)
+            return dict(counter) if counter is not None else None
+
+    def counters(self):
+        with self._lock:
+            return {name: dict(counter) for name, counter in self.data['counters'].items()}
 
-        
+    def start_counter(self, value, name='default', start_time=None):
+        start_time = start_time or datetime.now()
+        with self._lock:
+            self.data['counters'][name] = {
+                'start_value': value,
+                'start_time': start_time.strftime(TIME_FORMAT),
+            }
+            self.__mark_dirty()
+
+    def stop_counter(self, value=None, name='default', stop_time=None, summary=None):
+        """Beendet einen Zähler und legt ihn (ggf. mit ``summary``) im Verlauf ab. Gibt den Eintrag zurück."""
+        stop_time = stop_time or datetime.now()
+        with self._lock:
+            counter = self.data['counters'].pop(name, None)
+            if counter is None:
+                return None
+            entry = dict(counter, stop_value=value, stop_time=stop_time.strftime(TIME_FORMAT))
+            entry.update(summary or {})
+            history = self.data['history'].setdefault(name, [])
+            history.append(entry)
+            del history[:-self.max_history]
+            self.__mark_dirty()
+            return entry
+
+    def history(self, name='default'):
+        with self._lock:
+            return [dict(entry) for entry in self.data['history'].get(name, [])]
+
+    def histories(self):
+        """Verlauf aller Zähler: Name -> Liste abgeschlossener Läufe."""
+        with self._lock:
+            return {name: [dict(entry) for entry in runs]
+                    for name, runs in self.data['history'].items()}
+
+    def set_data(self, value):
+        self.start_counter(value)
 
+    def reset_data(self, value=None):
+        self.stop_counter(value)
@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Quantile, die für jedes Histogramm exportiert werden
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RingHistogram:
+    """Verteilung der letzten ``size`` Messwerte in einem Ring fester Größe.
+
+    Quantile beziehen sich nur auf das Fenster im Ring, Anzahl und Summe
+    zählen seit dem Start (wie bei einer Prometheus-Summary).
+    """
+
+    def __init__(self, name, help="", size=512):
+        self.name = name
+        self.help = help
+        self._values = np.zeros(size)
+        self._index = 0
+        self._filled = 0
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._values[self._index] = value
+            self._index = (self._index + 1) % len(self._values)
+            self._filled = min(self._filled + 1, len(self._values))
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Misst die Dauer des ``with``-Blocks in Sekunden."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            window = self._values[:self._filled].copy()
+            count, total = self.count, self.sum
+        result = {"count": count, "sum": total}
+        if len(window):
+            for q, value in zip(QUANTILES, np.quantile(window, QUANTILES)):
+                result[f"p{int(q * 100)}"] = float(value)
+            result["max"] = float(window.max())
+        return result
+
+
+class Counter:
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """Sammelt Histogramme, Zähler und abgeleitete Werte (Gauges).
+
+    Gauges sind Funktionen, die erst beim Export aufgerufen werden, z.B. für
+    die Zähler von InfluxService oder die Warteschlange des FetchSchedulers.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}  # name -> (funktion, hilfetext)
+
+    def histogram(self, name, help="", size=512):
+        if name not in self.histograms:
+            self.histograms[name] = RingHistogram(name, help, size)
+        return self.histograms[name]
+
+    def counter(self, name, help=""):
+        if name not in self.counters:
+            self.counters[name] = Counter(name, help)
+        return self.counters[name]
+
+    def gauge(self, name, fn, help=""):
+        self.gauges[name] = (fn, help)
+
+    def gauge_values(self):
+        values = {}
+        for name, (fn, _) in list(self.gauges.items()):
+            try:
+                values[name] = fn()
+            except Exception as e:
+                print(f"Metric {name} failed: {e}")
+        return values
+
+    def snapshot(self):
+        gauges = self.gauge_values()
+        return {
+            "histograms": {name: h.snapshot() for name, h in list(self.histograms.items())},
+            "counters": {name: c.value for name, c in list(self.counters.items())},
+            "gauges": gauges,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Export im Prometheus-Textformat (Histogramme als Summary)."""
+        lines = []
+        for name, histogram in list(self.histograms.items()):
+            snap = histogram.snapshot()
+            lines.append(f"# HELP {name} {histogram.help}")
+            lines.append(f"# TYPE {name} summary")
+            for q in QUANTILES:
+                key = f"p{int(q * 100)}"
+                if key in snap:
+                    lines.append(f'{name}{{quantile="{q}"}} {snap[key]:.6g}')
+            lines.append(f"{name}_sum {snap['sum']:.6g}")
+            lines.append(f"{name}_count {snap['count']}")
+        for name, counter in list(self.counters.items()):
+            lines.append(f"# HELP {name} {counter.help}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {counter.value}")
+        values = self.gauge_values()
+        for name, (_, help) in list(self.gauges.items()):
+            if name in values:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(values[name]):.6g}")
+        return "\n".join(lines) + "\n"
+
+
+# Gemeinsame Instanz für alle Module (Anzeige, Abfragen, Headless-Server)
+registry = MetricsRegistry()
+
+
+def serve_metrics(port=9100, host="0.0.0.0"):
+    """Stellt die Metriken unter /metrics (Prometheus) und /metrics.json bereit.
+
+    Läuft in einem eigenen Daemon-Thread, damit auch die Anzeige ohne
+    Headless-Server überwacht werden kann.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = registry.to_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body = registry.to_json().encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
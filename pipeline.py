@@ -0,0 +1,451 @@
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from time import monotonic
+
+import numpy as np
+
+from channels import flux_set
+from downsample import choose_window
+from flux_csv import parse_time, read_rows, read_series, read_series_by
+from metrics import registry
+from queries import MetricQuery, QueryLayer, until_midnight
+from rolling_stats import RollingStats
+from tariff import WH_PER_KWH
+from timeseries import LOCAL_TZ, TimeSeries
+
+PLOT_PARSE_SECONDS = registry.histogram(
+    "plot_parse_seconds", "Aufbereitung der Datensätze einer Verlaufs-Abfrage")
+
+# ---- Flux-Teilabfragen für StatsFetcher ----
+WATTAGE_FLUX = """
+// Leistung: nur neue Werte seit dem letzten Abruf
+dataWattage = from(bucket: "Strom")
+  |> range(start: %(start)s)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => r["uuid"] == "%(uuid)s")
+  |> group(columns: ["uuid"])
+  |> set(key: "_field", value: "wattage")
+"""
+
+# Letzter Wert aller Kanäle in einer Abfrage, aufgeteilt wird im Client nach uuid
+CHANNELS_FLUX = """
+channelsLatest = from(bucket: "Strom")
+  |> range(start: date.truncate(t: now(), unit: 1d), stop: now())
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => contains(value: r["uuid"], set: %(uuids)s))
+  |> group(columns: ["uuid"])
+  |> last()
+  |> set(key: "_field", value: "channel")
+"""
+
+# Zählerstände zu Tagesbeginn (Mitternacht Ortszeit, wie Kosten und Kalender),
+# ändern sich nur einmal am Tag
+STARTOFDAY_FLUX = """
+startCounters = from(bucket: "Strom")
+  |> range(start: date.truncate(t: now(), unit: 1d, location: timezone.location(name: "Europe/Berlin")), stop: now())
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => contains(value: r["uuid"], set: %(uuids)s))
+  |> group(columns: ["uuid"])
+  |> first()
+  |> set(key: "_field", value: "startofday")
+"""
+
+ANOMALY_FLUX = """
+// ---- Autoencoder: letzter Fehler ----
+latestError = from(bucket: "Strom")
+  |> range(start: -10m)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "error")
+  |> filter(fn: (r) => r["uuid"] == "%(uuid)s")
+  |> last()
+  |> set(key: "_field", value: "latestError")
+
+// ---- Autoencoder: aktueller Anomaly-Indikator (0/1) ----
+latestAnomaly = from(bucket: "Strom")
+  |> range(start: -10m)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "anomaly")
+  |> filter(fn: (r) => r["uuid"] == "%(uuid)s")
+  |> last()
+  |> set(key: "_field", value: "latestAnomaly")
+
+// ---- Autoencoder: War in den letzten 5 Minuten eine Anomalie? ----
+recentAnomaly = from(bucket: "Strom")
+  |> range(start: -5m)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "anomaly")
+  |> filter(fn: (r) => r["uuid"] == "%(uuid)s")
+  |> max()            // wenn max == 1 → es gab eine Anomalie
+  |> set(key: "_field", value: "recentAnomaly")
+"""
+
+# Zählerstände je 15 Minuten (höchster Stand im Intervall, gestempelt mit dessen Beginn)
+COUNTERS_15M_FLUX = """
+from(bucket: "Strom")
+  |> range(start: %(start)s)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => contains(value: r["uuid"], set: %(uuids)s))
+  |> aggregateWindow(every: 15m, fn: max, timeSrc: "_start", createEmpty: false)
+"""
+
+# Tageswerte je Ortszeit-Tag: höchster Zählerstand und min/max/mittlere Leistung
+ROLLUP_FLUX = """
+import "timezone"
+option location = timezone.location(name: "Europe/Berlin")
+
+rollupCounters = from(bucket: "Strom")
+  |> range(start: %(start)s, stop: %(stop)s)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => contains(value: r["uuid"], set: %(uuids)s))
+  |> aggregateWindow(every: 1d, fn: max, timeSrc: "_start", createEmpty: false)
+  |> set(key: "_field", value: "counter")
+
+rollupPower = from(bucket: "Strom")
+  |> range(start: %(start)s, stop: %(stop)s)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => r["uuid"] == "%(power)s")
+
+union(tables: [
+  rollupCounters,
+  rollupPower |> aggregateWindow(every: 1d, fn: min, timeSrc: "_start", createEmpty: false) |> set(key: "_field", value: "min_w"),
+  rollupPower |> aggregateWindow(every: 1d, fn: max, timeSrc: "_start", createEmpty: false) |> set(key: "_field", value: "max_w"),
+  rollupPower |> aggregateWindow(every: 1d, fn: mean, timeSrc: "_start", createEmpty: false) |> set(key: "_field", value: "avg_w"),
+])
+"""
+
+# Feste Felder in data_dict je Kanal-Rolle
+ROLE_FIELDS = {
+    "import": "currentCounter",
+    "export": "currentCounterDelivery",
+}
+
+
+class StatsFetcher:
+    """Holt Zählerstände, Anomalie-Flags und die 24h-Statistik der Leistung.
+
+    Läuft ohne Qt und wird sowohl vom DataThread der Anzeige als auch vom
+    Headless-Server benutzt. In den Cache wird nicht bei jedem Abruf
+    geschrieben, sondern gesammelt alle ``flush_interval`` Sekunden (wie die
+    gestreamten Werte); Einzelwerte nur, wenn sie sich geändert haben.
+    """
+
+    def __init__(self, influx, channels, cache=None, flush_interval=60):
+        self.influx = influx
+        self.channels = channels
+        self.power = channels.by_role("power")
+        self.cache = cache
+        self.flush_interval = flush_interval
+        self._unsaved_samples = None
+        self._unsaved_latest = {}
+        self._saved_latest = {}
+        self._last_flush = monotonic()
+        self._flush_lock = threading.Lock()
+        # Inkrementelle 24h-Statistik der Leistung (min/max/avg/latest). Sie wird
+        # lokal in O(1) fortgeschrieben, daher muss hier nichts zwischengespeichert werden.
+        self.stats = RollingStats(timedelta(hours=24))
+        # Leistungswerte, die der letzte Abruf neu in die Statistik übernommen hat
+        self.new_samples = TimeSeries()
+        # Zeitpunkt (UTC) des letzten erfolgreichen Abrufs, zu dem die Werte bestätigt sind
+        self.fetched_at = None
+        # Jede Teilabfrage hat ihre eigene Aktualisierungsregel: Zählerstand zu
+        # Tagesbeginn bis Mitternacht, aktuelle Werte und Anomalie-Flags bei jedem Abruf
+        # Alle Kanäle werden gemeinsam abgefragt und erst hier nach uuid aufgeteilt
+        counters = [channel for channel in channels if channel.counter]
+        self.queries = QueryLayer(influx, [
+            MetricQuery("wattage", self.wattage_query, ["dataWattage"],
+                        ["wattage"], cache=False),
+            MetricQuery("channels",
+                        CHANNELS_FLUX % {"uuids": channels.flux_set()},
+                        ["channelsLatest"], ["channel"], key=self.channel_keys,
+                        expected=[channel.key for channel in channels]),
+            MetricQuery("startofday",
+                        STARTOFDAY_FLUX % {"uuids": channels.flux_set(counters_only=True)},
+                        ["startCounters"], ["startofday"], refresh=until_midnight,
+                        key=self.startofday_keys,
+                        expected=[channel.startofday_key for channel in counters]),
+            MetricQuery("anomaly", ANOMALY_FLUX % {"uuid": self.power.uuid},
+                        ["latestError", "latestAnomaly", "recentAnomaly"],
+                        ["latestError", "latestAnomaly", "recentAnomaly"]),
+        ], imports=("date", "timezone"))
+
+    def channel_keys(self, record):
+        channel = self.channels.by_uuid(record["uuid"])
+        if channel is None:
+            return []
+        keys = [channel.key]
+        if channel.role in ROLE_FIELDS:
+            keys.append(ROLE_FIELDS[channel.role])
+        return keys
+
+    def startofday_keys(self, record):
+        channel = self.channels.by_uuid(record["uuid"])
+        if channel is None:
+            return []
+        keys = [channel.startofday_key]
+        if channel.role == "import":
+            keys.append("startofdayCounter")
+        return keys
+
+    def restore(self):
+        """Füllt die Statistik aus dem lokalen Cache und liefert die letzten bekannten Werte."""
+        if self.cache is None:
+            return {}
+        series = self.cache.load(
+            "wattage", since=datetime.now(timezone.utc) - self.stats.window)
+        for ts, value in zip(series.datetimes(), series.values.tolist()):
+            self.stats.add(ts, value)
+        data_dict = self.cache.get_latest()
+        data_dict.update(self.stats.as_records("vz_measurement", self.power.uuid))
+        return data_dict
+
+    def __remember(self, samples, data_dict):
+        with self._flush_lock:
+            if self._unsaved_samples is None:
+                self._unsaved_samples = samples
+            elif samples:
+                merged = self._unsaved_samples.concat(samples)
+                merged.replace_from = self._unsaved_samples.replace_from
+                self._unsaved_samples = merged
+            for field, record in data_dict.items():
+                if self._saved_latest.get(field) != record:
+                    self._unsaved_latest[field] = record
+                else:
+                    self._unsaved_latest.pop(field, None)
+
+    def flush(self):
+        """Schreibt die seit dem letzten Mal gesammelten Werte in den Cache (auch beim Beenden)."""
+        with self._flush_lock:
+            samples, self._unsaved_samples = self._unsaved_samples, None
+            latest, self._unsaved_latest = self._unsaved_latest, {}
+            self._saved_latest.update(latest)
+            self._last_flush = monotonic()
+        if self.cache is None:
+            return
+        if samples is not None:
+            self.cache.add_samples("wattage", samples)
+        if latest:
+            self.cache.put_latest(latest)
+
+    def wattage_query(self):
+        # Beim ersten Lauf wird das komplette 24h-Fenster geladen, danach nur noch
+        # die Werte seit dem letzten bekannten Zeitpunkt.
+        since = self.stats.since
+        if since is None:
+            wattage_start = "-24h"
+        else:
+            wattage_start = f'time(v: "{since.astimezone(timezone.utc).isoformat()}")'
+        return WATTAGE_FLUX % {"start": wattage_start, "uuid": self.power.uuid}
+
+    def fetch(self):
+        since = self.stats.since
+        fetched_at = datetime.now(timezone.utc)
+        data_dict, raw = self.queries.fetch()
+        self.fetched_at = fetched_at
+
+        # Rohwerte der Leistung gehen in die inkrementelle Statistik
+        wattage = raw.get("wattage", TimeSeries())
+        added = np.fromiter(
+            (self.stats.add(ts, value)
+             for ts, value in zip(wattage.datetimes(), wattage.values.tolist())),
+            dtype=bool, count=len(wattage))
+
+        self.new_samples = TimeSeries(wattage.times[added], wattage.values[added], since)
+        if self.cache is not None:
+            self.__remember(self.new_samples, data_dict)
+            if monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+        self.stats.evict()
+        data_dict.update(self.stats.as_records("vz_measurement", self.power.uuid))
+        return data_dict
+
+
+class EnergyFetcher:
+    """Lädt Zählerstände je 15 Minuten für die CostEngine nach.
+
+    Beim ersten Lauf werden ``history`` Tage geholt, danach nur noch ab dem
+    letzten lückenlos bekannten Intervall, getrennt je Rolle: fehlt ein Kanal
+    (z.B. keine Einspeisung) oder hat er keine Werte, holt der andere
+    trotzdem nur den Rest. Laufend fortgeschrieben wird die CostEngine aus
+    den Zählerständen jeder Statistik-Abfrage; die nimmt sie aber erst an,
+    wenn hier die Lücke davor (z.B. solange die Anzeige aus war) geschlossen
+    wurde.
+    """
+
+    def __init__(self, influx, channels, engine, history=timedelta(days=35)):
+        self.influx = influx
+        self.engine = engine
+        self.history = history
+        self.roles = {channel.uuid: channel.role for channel in channels
+                      if channel.role in ("import", "export")}
+
+    def fetch(self):
+        for uuid, role in self.roles.items():
+            last = self.engine.last_time(role)
+            if last is None:
+                start = f"-{int(self.history.total_seconds())}s"
+            else:
+                start = f'time(v: "{datetime.fromtimestamp(last, tz=timezone.utc).isoformat()}")'
+            lines = self.influx.query_lines(COUNTERS_15M_FLUX % {"start": start, "uuids": flux_set([uuid])})
+            for series in read_series_by(lines, "uuid").values():
+                self.engine.add_series(role, series.epoch_seconds(), series.values / WH_PER_KWH)
+        self.engine.persist()
+
+
+class RollupFetcher:
+    """Schreibt Tages- und Monatswerte (Energie, Leistung) in den lokalen Cache.
+
+    Abgefragt werden nur abgeschlossene Tage, die noch fehlen: beim ersten
+    Lauf ``history`` Tage in Blöcken zu ``chunk`` Tagen, danach jeweils der
+    gerade abgeschlossene Tag. Die Kalenderseite liest nur noch den Cache.
+    Die Energie eines Tags ist die Differenz der höchsten Zählerstände zum
+    letzten Tag davor mit Werten (Lücken werden also dem nächsten Tag zugerechnet).
+    """
+
+    def __init__(self, influx, channels, cache, history=timedelta(days=366),
+                 chunk=timedelta(days=31)):
+        self.influx = influx
+        self.cache = cache
+        self.history = history
+        self.chunk = chunk
+        self.power = channels.by_role("power")
+        self.roles = {channel.uuid: channel.role for channel in channels
+                      if channel.role in ("import", "export")}
+
+    def fetch(self, today=None):
+        today = today or datetime.now(LOCAL_TZ).date()
+        last = self.cache.last_rollup("day")
+        if last is None:
+            # Ein Tag mehr als Ausgangswert für die Energie des ersten Tags
+            first = today - self.history - timedelta(days=1)
+            previous = {}
+        else:
+            first = date.fromisoformat(last["start"]) + timedelta(days=1)
+            previous = {role: last[f"{role}_end"] for role in ("import", "export")}
+        while first < today:
+            stop = min(first + self.chunk, today)
+            days = self.__fetch_days(first, stop, previous)
+            self.cache.put_rollups(days)
+            first = stop
+
+    def __fetch_days(self, first, stop, previous):
+        def midnight(day):
+            local = datetime.combine(day, time(), tzinfo=LOCAL_TZ)
+            return f'time(v: "{local.astimezone(timezone.utc).isoformat()}")'
+
+        lines = self.influx.query_lines(ROLLUP_FLUX % {
+            "start": midnight(first), "stop": midnight(stop),
+            "uuids": flux_set(self.roles), "power": self.power.uuid})
+        days = {}
+        for (time_text, value_text, field, uuid), _ in read_rows(
+                lines, ("_time", "_value", "_field", "uuid")):
+            if value_text == "":
+                continue
+            day = parse_time(time_text).astimezone(LOCAL_TZ).date().isoformat()
+            row = days.setdefault(day, {"start": day})
+            if field == "counter":
+                role = self.roles.get(uuid)
+                if role is not None:
+                    row[f"{role}_end"] = float(value_text) / WH_PER_KWH
+            else:
+                row[field] = float(value_text)
+
+        result = []
+        for day in sorted(days):
+            row = days[day]
+            for role in ("import", "export"):
+                end = row.get(f"{role}_end")
+                if end is None:
+                    continue
+                start = previous.get(role)
+                # Zählertausch o.ä.: lieber keinen Wert als einen negativen
+                if start is not None and end >= start:
+                    row[f"{role}_kwh"] = end - start
+                previous[role] = end
+            result.append(row)
+        return result
+
+
+class PlotFetcher:
+    """Holt den Leistungsverlauf, nach dem ersten Abruf nur noch neue Fenster.
+
+    Das Aggregationsfenster richtet sich nach Zeitraum und Breite des Plots in
+    Pixeln (12h bei 500 px = Minutenwerte). ``fetch()`` liefert eine
+    TimeSeries, deren ``replace_from`` angibt, ab wann bereits vorhandene
+    Punkte ersetzt werden (None = kompletter Neuaufbau).
+    """
+
+    def __init__(self, influx, channels, cache=None, span=timedelta(hours=12), pixels=500):
+        self.influx = influx
+        self.power = channels.by_role("power")
+        self.cache = cache
+        self.last_time = None
+        self.span = span
+        self.pixels = pixels
+        self.every, self.every_flux = choose_window(span, pixels)
+        self._lock = threading.Lock()
+        self._requested = None
+
+    @property
+    def cacheable(self):
+        # Nur die Standardansicht (Minutenwerte) wird lokal zwischengespeichert
+        return self.every == 60
+
+    def set_range(self, span, pixels=None):
+        """Wählt einen anderen Zeitraum; wirksam ab dem nächsten Abruf (kompletter Neuaufbau)."""
+        with self._lock:
+            self._requested = (span, pixels or self.pixels)
+
+    def restore(self):
+        """Lädt den Zeitraum aus dem lokalen Cache, Influx liefert danach nur den Rest."""
+        if self.cache is None or not self.cacheable:
+            return TimeSeries()
+        series = self.cache.load(
+            "plot_1m", since=datetime.now(timezone.utc) - self.span)
+        if series:
+            self.last_time = series.last_time()
+        return series
+
+    def fetch(self):
+        with self._lock:
+            requested, self._requested = self._requested, None
+        if requested is not None:
+            self.span, self.pixels = requested
+            self.every, self.every_flux = choose_window(self.span, self.pixels)
+            self.last_time = None
+
+        # Nach dem ersten Abruf nur noch die Fenster seit dem letzten Punkt holen.
+        # Das letzte Fenster kann unvollständig gewesen sein und wird daher
+        # erneut abgefragt und im Plot ersetzt.
+        if self.last_time is None:
+            replace_from = None
+            start = f"-{int(self.span.total_seconds())}s"
+        else:
+            # aggregateWindow richtet die Fenster an der Unix-Epoche aus
+            epoch = int(self.last_time.timestamp())
+            replace_from = datetime.fromtimestamp(epoch - epoch % self.every, tz=timezone.utc)
+            start = f'time(v: "{replace_from.isoformat()}")'
+        query = """
+from(bucket: "Strom")
+  |> range(start: %s)
+  |> filter(fn: (r) => r["_measurement"] == "vz_measurement")
+  |> filter(fn: (r) => r["_field"] == "value")
+  |> filter(fn: (r) => r["uuid"] == "%s")
+  |> aggregateWindow(every: %s, fn: mean, createEmpty: false)
+""" % (start, self.power.uuid, self.every_flux)
+        lines = self.influx.query_lines(query)
+        with PLOT_PARSE_SECONDS.time():
+            # Zeitzonen werden erst bei der Anzeige (vektorisiert bzw. im Formatter)
+            # umgerechnet, hier bleibt alles in UTC
+            series = read_series(lines, replace_from)
+        if series:
+            self.last_time = series.last_time()
+        if self.cache is not None and self.cacheable:
+            self.cache.add_samples("plot_1m", series)
+        return series
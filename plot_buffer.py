@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Vorab allokierter Puffer für (x, y)-Paare mit fester Kapazität.
+
+    Intern wird doppelt so viel Speicher reserviert wie nötig, damit die
+    Daten immer als zusammenhängender View (ohne Kopie) an matplotlib
+    übergeben werden können. Erst wenn das Ende erreicht ist, werden die
+    jüngsten Werte einmalig an den Anfang verschoben.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._x = np.empty(capacity * 2, dtype=np.float64)
+        self._y = np.empty(capacity * 2, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+    def append(self, x, y):
+        if self._end == len(self._x):
+            self.__compact()
+        self._x[self._end] = x
+        self._y[self._end] = y
+        self._end += 1
+        if len(self) > self.capacity:
+            self._start += 1
+
+    def extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if len(xs) >= self.capacity:
+            # Es passen ohnehin nur die jüngsten Werte hinein
+            xs = xs[-self.capacity:]
+            ys = ys[-self.capacity:]
+            self._x[:len(xs)] = xs
+            self._y[:len(ys)] = ys
+            self._start = 0
+            self._end = len(xs)
+            return
+        if self._end + len(xs) > len(self._x):
+            self.__compact()
+        self._x[self._end:self._end + len(xs)] = xs
+        self._y[self._end:self._end + len(ys)] = ys
+        self._end += len(xs)
+        if len(self) > self.capacity:
+            self._start = self._end - self.capacity
+
+    def truncate_after(self, x):
+        """Verwirft alle Einträge mit einem x-Wert größer als ``x``."""
+        xs = self._x[self._start:self._end]
+        self._end = self._start + int(np.searchsorted(xs, x, side="right"))
+
+    def __compact(self):
+        n = len(self)
+        self._x[:n] = self._x[self._start:self._end]
+        self._y[:n] = self._y[self._start:self._end]
+        self._start = 0
+        self._end = n
+
+    def view(self):
+        """Gibt die aktuellen Daten als zusammenhängende Views zurück."""
+        return self._x[self._start:self._end], self._y[self._start:self._end]
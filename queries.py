@@ -0,0 +1,145 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from flux_csv import RECORD_COLUMNS, SeriesBuilder, convert, parse_time, read_rows
+from metrics import registry
+from timeseries import LOCAL_TZ
+
+PARSE_SECONDS = registry.histogram(
+    "stats_parse_seconds", "Aufbereitung der Datensätze einer Statistik-Abfrage")
+
+
+def ttl(seconds):
+    """Ergebnis ist ``seconds`` Sekunden gültig (0 = bei jedem Abruf neu abfragen)."""
+    def policy(now):
+        return now + timedelta(seconds=seconds)
+    return policy
+
+
+def until_midnight(now):
+    """Ergebnis ist bis Mitternacht (Ortszeit, wie ``date.truncate`` mit ``location``) gültig."""
+    local = now.astimezone(LOCAL_TZ)
+    midnight = datetime.combine(local.date() + timedelta(days=1), datetime.min.time(),
+                                tzinfo=LOCAL_TZ)
+    return midnight.astimezone(now.tzinfo or timezone.utc)
+
+
+class MetricQuery:
+    """Eine Teilabfrage mit eigener Aktualisierungsregel.
+
+    ``flux`` definiert eine oder mehrere Flux-Variablen (``outputs``), deren
+    Tabellen per ``set(key: "_field", ...)`` die Felder aus ``fields`` liefern.
+    ``flux`` darf auch eine Funktion sein, wenn die Abfrage von Laufzeitdaten
+    abhängt (z.B. "alle Werte seit ...").
+    Mit ``cache=False`` werden die Datensätze nicht zwischengespeichert, sondern
+    als TimeSeries an den Aufrufer zurückgegeben.
+    ``key(record)`` liefert die Schlüssel im data_dict, falls die Datensätze
+    eines Felds aufgeteilt werden (z.B. nach uuid); ``expected`` sind dann die
+    Schlüssel, die ein vollständiges Ergebnis enthalten muss.
+    """
+
+    def __init__(self, name, flux, outputs, fields, refresh=ttl(0), cache=True,
+                 key=None, expected=None):
+        self.name = name
+        self.flux = flux
+        self.outputs = outputs
+        self.fields = fields
+        self.refresh = refresh
+        self.cache = cache
+        self.key = key
+        self.expected = expected if expected is not None else fields
+        self.expires_at = None
+        self.results = {}
+
+    def render(self):
+        return self.flux() if callable(self.flux) else self.flux
+
+    def expired(self, now):
+        return self.expires_at is None or now >= self.expires_at
+
+
+class QueryLayer:
+    """Fasst alle fälligen Teilabfragen zu einer einzigen Union-Abfrage zusammen.
+
+    Teure Aggregate (z.B. der Zählerstand zu Tagesbeginn) werden dadurch nur
+    neu berechnet, wenn ihr Ergebnis abgelaufen ist, statt bei jedem Abruf.
+    """
+
+    def __init__(self, influx, metrics, imports=('date',)):
+        self.influx = influx
+        self.metrics = {metric.name: metric for metric in metrics}
+        self.imports = imports
+        self._field_owner = {
+            field: metric for metric in metrics for field in metric.fields
+        }
+
+    def invalidate(self, name=None):
+        for metric in self.metrics.values():
+            if name is None or metric.name == name:
+                metric.expires_at = None
+
+    def build_query(self, metrics):
+        lines = [f'import "{module}"' for module in self.imports]
+        outputs = []
+        for metric in metrics:
+            lines.append(metric.render())
+            outputs.extend(metric.outputs)
+        if len(outputs) == 1:
+            lines.append(outputs[0])
+        else:
+            lines.append("union(tables: [\n  " + ",\n  ".join(outputs) + "\n])")
+        return "\n".join(lines)
+
+    def fetch(self, now=None):
+        """Fragt alle abgelaufenen Teilabfragen ab.
+
+        Gibt ``(data_dict, raw)`` zurück: ``data_dict`` enthält die (ggf.
+        zwischengespeicherten) Ergebnisse aller cachebaren Teilabfragen,
+        ``raw`` die frischen Werte der nicht cachebaren pro Feld als TimeSeries.
+        Die Antwort wird dabei als CSV-Strom gelesen; nur die nicht cachebaren
+        Werte werden (blockweise als Arrays) gesammelt.
+        """
+        if now is None:
+            now = datetime.now(timezone.utc)
+        due = [metric for metric in self.metrics.values() if metric.expired(now)]
+        raw = {}
+        if due:
+            lines = self.influx.query_lines(self.build_query(due))
+            parse_start = time.perf_counter()
+            fresh = {metric.name: {} for metric in due}
+            builders = {}
+            for values, types in read_rows(lines, RECORD_COLUMNS):
+                time_text, value_text, field_key, measurement, uuid = values
+                metric = self._field_owner.get(field_key)
+                if metric is None or metric.name not in fresh:
+                    continue
+                if not metric.cache:
+                    builder = builders.get(field_key)
+                    if builder is None:
+                        builder = builders[field_key] = SeriesBuilder()
+                    builder.add(time_text, value_text)
+                    continue
+                entry = {
+                    "_time": parse_time(time_text) if time_text else None,
+                    "_value": convert(value_text, types[1]),
+                    "_measurement": measurement or None,
+                    "uuid": uuid or None,
+                }
+                keys = metric.key(entry) if metric.key else [field_key]
+                for key in keys:
+                    fresh[metric.name][key] = entry
+            raw = {field_key: builder.series() for field_key, builder in builders.items()}
+            for metric in due:
+                metric.results = fresh[metric.name]
+                if metric.cache and any(key not in metric.results for key in metric.expected):
+                    # Unvollständiges Ergebnis (z.B. kurz nach Mitternacht) nicht
+                    # bis zum Ablauf festhalten, sondern beim nächsten Abruf erneut holen
+                    metric.expires_at = None
+                else:
+                    metric.expires_at = metric.refresh(now)
+            PARSE_SECONDS.observe(time.perf_counter() - parse_start)
+
+        data_dict = {}
+        for metric in self.metrics.values():
+            data_dict.update(metric.results)
+        return data_dict, raw
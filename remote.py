@@ -0,0 +1,208 @@
+import http.client
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from metrics import registry
+from rolling_stats import RollingStats
+from timeseries import LOCAL_TZ, TimeSeries
+
+NOT_MODIFIED = registry.counter(
+    "server_not_modified_total", "Antworten des Headless-Servers ohne Änderung (304)")
+
+
+class DashboardClient:
+    """Liest die vom Headless-Server (server.py) aufbereiteten Daten per HTTP.
+
+    Eine Keep-Alive-Verbindung je Client; jede Ressource wird mit
+    ``If-None-Match`` abgefragt, unveränderte Daten kosten also nur eine
+    304-Antwort ohne Inhalt. ``fetched_at[path]`` ist der Zeitpunkt (UTC),
+    zu dem der Server die Daten zuletzt erfolgreich abgefragt hat, oder None,
+    solange er nur Werte aus seinem Cache hat.
+    """
+
+    def __init__(self, url, timeout=5):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        self.host = parts.hostname
+        self.port = parts.port or 5000
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.etags = {}
+        self.fetched_at = {}
+        self._connection = None
+        # Beide Abfrage-Jobs teilen sich die Verbindung
+        self._lock = threading.Lock()
+
+    def get(self, path, params=None):
+        """Gibt das JSON unter ``path`` zurück oder None, wenn es sich nicht geändert hat."""
+        with self._lock:
+            try:
+                return self.__get(path, params)
+            except (http.client.HTTPException, OSError):
+                # Abgebrochene Keep-Alive-Verbindung: einmal neu verbinden
+                self.close()
+                return self.__get(path, params)
+
+    def __get(self, path, params):
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {}
+        if path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        url = self.prefix + path
+        if params:
+            url += "?" + urlencode(params)
+        self._connection.request("GET", url, headers=headers)
+        response = self._connection.getresponse()
+        body = response.read()
+        # Als Alter übertragen, damit abweichende Uhren von Server und Client nicht stören
+        age = response.getheader("X-Data-Age")
+        if response.status in (200, 304):
+            self.fetched_at[path] = (datetime.now(timezone.utc) - timedelta(seconds=float(age))
+                                     if age is not None else None)
+        if response.status == 304:
+            NOT_MODIFIED.inc()
+            return None
+        if response.status != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status} {body[:100]!r}")
+        etag = response.getheader("ETag")
+        if etag is not None:
+            self.etags[path] = etag
+        return json.loads(body)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+
+
+def parse_data(payload):
+    """Gegenstück zu server.serialize_data: Zeitstempel wieder als datetime (UTC)."""
+    data_dict = {}
+    for field, record in payload.items():
+        record = dict(record)
+        if isinstance(record.get("_time"), str):
+            record["_time"] = datetime.fromisoformat(record["_time"])
+        data_dict[field] = record
+    return data_dict
+
+
+class RemoteStatsFetcher:
+    """Ersatz für StatsFetcher im Client-Modus (``--server URL``).
+
+    Fragt nicht die InfluxDB ab, sondern ``/api/energy/consumption`` des
+    Headless-Servers; alle Anzeigen teilen sich so dessen Abfragen. Bestätigt
+    sind die Werte zum letzten erfolgreichen Abruf des Servers, fragt der
+    keine neuen Daten mehr ab, veralten sie also auch hier.
+    """
+
+    path = "/api/energy/consumption"
+
+    def __init__(self, client):
+        self.client = client
+        # Schnittstelle wie StatsFetcher; die Statistik rechnet der Server
+        self.stats = RollingStats(timedelta(hours=24))
+        self.new_samples = TimeSeries()
+        self.fetched_at = None
+        self.data_dict = {}
+
+    def restore(self):
+        return {}
+
+    def flush(self):
+        pass
+
+    def fetch(self):
+        payload = self.client.get(self.path)
+        self.new_samples = TimeSeries()
+        self.fetched_at = self.client.fetched_at.get(self.path)
+        if payload is None:
+            # Unverändert: letzten Stand erneut liefern (die Anzeige überspringt ihn),
+            # bestätigt zum letzten Abruf des Servers
+            return dict(self.data_dict)
+        self.data_dict = parse_data(payload)
+        latest = self.data_dict.get("latestValue")
+        if latest is not None and latest.get("_value") is not None:
+            # Für die lokale Anomalieerkennung steht nur der letzte Wert zur Verfügung
+            self.new_samples = TimeSeries(
+                [np.datetime64(latest["_time"].astimezone(timezone.utc).replace(tzinfo=None), "ns")],
+                [latest["_value"]])
+        return dict(self.data_dict)
+
+
+class RemotePlotFetcher:
+    """Ersatz für PlotFetcher im Client-Modus; liest ``/api/energy/plot``.
+
+    Der Server liefert immer die letzten 12 Stunden in Minutenwerten, eine
+    andere Auswahl auf der Verlaufsseite wird daher ignoriert.
+    """
+
+    def __init__(self, client, span=timedelta(hours=12), every=60):
+        self.client = client
+        self.span = span
+        self.every = every
+        self.last_time = None
+
+    def set_range(self, span, pixels=None):
+        pass
+
+    def restore(self):
+        return TimeSeries()
+
+    def fetch(self):
+        payload = self.client.get("/api/energy/plot")
+        if payload is None:
+            # Leere Reihe ab dem letzten Punkt: der Plot bleibt unverändert
+            return TimeSeries(replace_from=self.last_time)
+        times = np.array(payload["times"], dtype="int64").astype("datetime64[ms]")
+        series = TimeSeries(times, payload["values"])
+        if series:
+            self.last_time = series.last_time()
+        return series
+
+
+class RemoteEnergyFetcher:
+    """Ersatz für EnergyFetcher im Client-Modus; liest ``/api/energy/counters``.
+
+    Der Server lädt die 15-Minuten-Zählerstände selbst aus der InfluxDB nach,
+    hier werden sie nur ab dem letzten lückenlos bekannten Intervall je Rolle
+    in die lokale CostEngine übernommen.
+    """
+
+    def __init__(self, client, engine, history=timedelta(days=35)):
+        self.client = client
+        self.engine = engine
+        self.history = history
+
+    def fetch(self):
+        for role in ("import", "export"):
+            last = self.engine.last_time(role)
+            if last is None:
+                last = (datetime.now(timezone.utc) - self.history).timestamp()
+            payload = self.client.get("/api/energy/counters", {"role": role, "since": last})
+            if payload and payload["times"]:
+                self.engine.add_series(role, np.asarray(payload["times"]) / 1000.0, payload["values"])
+        self.engine.persist()
+
+
+class RemoteRollupFetcher:
+    """Ersatz für RollupFetcher im Client-Modus; übernimmt die Tageswerte des Servers in den lokalen Cache."""
+
+    def __init__(self, client, cache, history=timedelta(days=366)):
+        self.client = client
+        self.cache = cache
+        self.history = history
+
+    def fetch(self):
+        last = self.cache.last_rollup("day")
+        if last is not None:
+            # Den letzten Tag erneut holen, falls der Server ihn inzwischen ergänzt hat
+            since = last["start"]
+        else:
+            since = (datetime.now(LOCAL_TZ).date() - self.history).isoformat()
+        days = self.client.get("/api/energy/rollups", {"since": since})
+        if days:
+            self.cache.put_rollups(days)
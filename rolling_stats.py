@@ -0,0 +1,115 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+
+class RollingStats:
+    """Inkrementelle Min/Max/Mittelwert-Statistik über ein gleitendes Zeitfenster.
+
+    Neue Messwerte werden nur angehängt, herausfallende Werte am Fensteranfang
+    verworfen. Min und Max werden über monotone Deques in O(1) (amortisiert)
+    gepflegt, der Mittelwert über eine laufende Summe.
+    """
+
+    def __init__(self, window=timedelta(hours=24)):
+        self.window = window
+        self.samples = deque()  # (zeit, wert), aufsteigend sortiert
+        self._min = deque()  # Werte aufsteigend
+        self._max = deque()  # Werte absteigend
+        self._sum = 0.0
+        self.last_time = None
+        # Werte können aus dem Abfrage-Thread und aus dem Streaming-Empfang kommen
+        self.lock = threading.RLock()
+
+    def add(self, ts, value):
+        """Fügt einen Messwert hinzu. Ältere oder doppelte Zeitpunkte werden ignoriert."""
+        if value is None:
+            return False
+        with self.lock:
+            return self.__add(ts, value)
+
+    def __add(self, ts, value):
+        if self.last_time is not None and ts <= self.last_time:
+            return False
+        sample = (ts, float(value))
+        self.samples.append(sample)
+        self._sum += sample[1]
+        while self._min and self._min[-1][1] >= sample[1]:
+            self._min.pop()
+        self._min.append(sample)
+        while self._max and self._max[-1][1] <= sample[1]:
+            self._max.pop()
+        self._max.append(sample)
+        self.last_time = ts
+        return True
+
+    def evict(self, now=None):
+        """Entfernt alle Werte, die aus dem Zeitfenster gefallen sind."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        cutoff = now - self.window
+        with self.lock:
+            self.__evict(cutoff)
+
+    def __evict(self, cutoff):
+        while self.samples and self.samples[0][0] < cutoff:
+            ts, value = self.samples.popleft()
+            self._sum -= value
+            if self._min and self._min[0][0] == ts:
+                self._min.popleft()
+            if self._max and self._max[0][0] == ts:
+                self._max.popleft()
+        if not self.samples:
+            # Rundungsfehler der laufenden Summe nicht mitschleppen
+            self._sum = 0.0
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self._min.clear()
+            self._max.clear()
+            self._sum = 0.0
+            self.last_time = None
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def since(self):
+        """Zeitpunkt, ab dem neue Werte abgefragt werden müssen (None = komplettes Fenster)."""
+        return self.last_time
+
+    def min(self):
+        return self._min[0] if self._min else None
+
+    def max(self):
+        return self._max[0] if self._max else None
+
+    def mean(self):
+        return self._sum / len(self.samples) if self.samples else None
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def as_records(self, measurement=None, uuid=None):
+        """Liefert die Kennzahlen im Format der DataThread-Ergebnisse."""
+        records = {}
+        with self.lock:
+            if not self.samples:
+                return records
+            minimum, maximum = self.min(), self.max()
+            latest, mean = self.latest(), self.mean()
+
+        def record(ts, value):
+            return {
+                "_time": ts,
+                "_value": value,
+                "_measurement": measurement,
+                "uuid": uuid,
+            }
+
+        records["minValue"] = record(*minimum)
+        records["maxValue"] = record(*maximum)
+        records["avgValue"] = record(latest[0], mean)
+        records["latestValue"] = record(*latest)
+        return records
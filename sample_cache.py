@@ -0,0 +1,211 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from timeseries import TimeSeries, to_datetime, to_datetime64
+
+# Aufbewahrungsdauer je Kanal, ältere Werte werden beim Aufräumen gelöscht
+default_retention = {
+    "wattage": timedelta(hours=25),
+    "plot_1m": timedelta(days=2),
+    "counter_import_15m": timedelta(days=400),
+    "counter_export_15m": timedelta(days=400),
+}
+
+# Spalten der Tages- und Monatswerte (Energie in kWh, Leistung in W).
+# *_end ist der Zählerstand am Ende des Tags, daraus ergibt sich der nächste Tag.
+ROLLUP_COLUMNS = ("import_kwh", "export_kwh", "import_end", "export_end",
+                  "min_w", "max_w", "avg_w")
+
+
+class SampleCache:
+    """Lokaler SQLite-Cache für bereits abgerufene Messwerte.
+
+    Beim Start kann die Anzeige sofort aus dem Cache gefüllt werden, danach
+    muss nur noch der fehlende Rest aus der InfluxDB nachgeladen werden.
+    """
+
+    def __init__(self, filename='cache.sqlite', retention=None, evict_interval=600):
+        self.filename = filename
+        self.retention = dict(default_retention)
+        if retention:
+            self.retention.update(retention)
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+        # Wird von mehreren Abfrage-Threads benutzt, Zugriff über self._lock
+        self._conn = sqlite3.connect(self.filename, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples ("
+            " channel TEXT NOT NULL, ts INTEGER NOT NULL, value REAL,"
+            " PRIMARY KEY (channel, ts)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS latest ("
+            " field TEXT PRIMARY KEY, ts INTEGER, value REAL,"
+            " measurement TEXT, uuid TEXT)"
+        )
+        # Tages- (start = 'JJJJ-MM-TT', Ortszeit) und Monatswerte (start = 'JJJJ-MM')
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            " period TEXT NOT NULL, start TEXT NOT NULL,"
+            " import_kwh REAL, export_kwh REAL, import_end REAL, export_end REAL,"
+            " min_w REAL, max_w REAL, avg_w REAL,"
+            " PRIMARY KEY (period, start)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def add_samples(self, channel, series):
+        """Speichert eine Zeitreihe. Punkte nach ``series.replace_from`` werden vorher verworfen."""
+        with self._lock:
+            if series.replace_from is not None:
+                self._conn.execute(
+                    "DELETE FROM samples WHERE channel = ? AND ts > ?",
+                    (channel, _to_ns(series.replace_from)),
+                )
+            if series:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO samples (channel, ts, value) VALUES (?, ?, ?)",
+                    zip([channel] * len(series),
+                        series.times.astype(np.int64).tolist(),
+                        series.values.tolist()),
+                )
+            self._conn.commit()
+        self.maybe_evict()
+
+    def load(self, channel, since=None, until=None):
+        """Lädt die Werte eines Kanals als TimeSeries (aufsteigend sortiert)."""
+        query = "SELECT ts, value FROM samples WHERE channel = ?"
+        params = [channel]
+        if since is not None:
+            query += " AND ts >= ?"
+            params.append(_to_ns(since))
+        if until is not None:
+            query += " AND ts < ?"
+            params.append(_to_ns(until))
+        query += " ORDER BY ts"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        if not rows:
+            return TimeSeries()
+        times = np.array([row[0] for row in rows], dtype=np.int64).view("datetime64[ns]")
+        values = np.array([row[1] for row in rows], dtype=np.float64)
+        return TimeSeries(times, values)
+
+    def last_time(self, channel):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(ts) FROM samples WHERE channel = ?", (channel,)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return to_datetime(np.int64(row[0]).view("datetime64[ns]"))
+
+    def put_latest(self, data_dict):
+        """Merkt sich die zuletzt abgerufenen Einzelwerte (Zählerstände, Anomalie-Flags ...)."""
+        rows = [
+            (field, _to_ns(record["_time"]) if record.get("_time") else None,
+             record.get("_value"), record.get("_measurement"), record.get("uuid"))
+            for field, record in data_dict.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO latest (field, ts, value, measurement, uuid)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def get_latest(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, ts, value, measurement, uuid FROM latest"
+            ).fetchall()
+        return {
+            field: {
+                "_time": to_datetime(np.int64(ts).view("datetime64[ns]")) if ts is not None else None,
+                "_value": value,
+                "_measurement": measurement,
+                "uuid": uuid,
+            }
+            for field, ts, value, measurement, uuid in rows
+        }
+
+    def put_rollups(self, days):
+        """Speichert Tageswerte (Dictionaries mit ``start`` und ROLLUP_COLUMNS) und
+        berechnet die Monatswerte der betroffenen Monate neu."""
+        if not days:
+            return
+        columns = ", ".join(ROLLUP_COLUMNS)
+        placeholders = ", ".join("?" * len(ROLLUP_COLUMNS))
+        months = sorted({day["start"][:7] for day in days})
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO rollups (period, start, {columns})"
+                f" VALUES ('day', ?, {placeholders})",
+                [(day["start"], *(day.get(column) for column in ROLLUP_COLUMNS))
+                 for day in days],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rollups (period, start, import_kwh, export_kwh,"
+                " import_end, export_end, min_w, max_w, avg_w)"
+                " SELECT 'month', substr(start, 1, 7), SUM(import_kwh), SUM(export_kwh),"
+                " MAX(import_end), MAX(export_end), MIN(min_w), MAX(max_w), AVG(avg_w)"
+                " FROM rollups WHERE period = 'day' AND substr(start, 1, 7) = ?"
+                " GROUP BY substr(start, 1, 7)",
+                [(month,) for month in months],
+            )
+            self._conn.commit()
+
+    def load_rollups(self, period, since=None, until=None):
+        """Tages- bzw. Monatswerte (``period`` 'day'/'month') mit since <= start < until."""
+        query = f"SELECT start, {', '.join(ROLLUP_COLUMNS)} FROM rollups WHERE period = ?"
+        params = [period]
+        if since is not None:
+            query += " AND start >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND start < ?"
+            params.append(until)
+        query += " ORDER BY start"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(("start",) + ROLLUP_COLUMNS, row)) for row in rows]
+
+    def last_rollup(self, period="day"):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT start, {', '.join(ROLLUP_COLUMNS)} FROM rollups"
+                " WHERE period = ? ORDER BY start DESC LIMIT 1", (period,)
+            ).fetchone()
+        return dict(zip(("start",) + ROLLUP_COLUMNS, row)) if row is not None else None
+
+    def maybe_evict(self):
+        if time.monotonic() - self._last_evict >= self.evict_interval:
+            self.evict()
+
+    def evict(self, now=None):
+        """Löscht alle Werte, die älter als die Aufbewahrungsdauer ihres Kanals sind."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        with self._lock:
+            for channel, retention in self.retention.items():
+                self._conn.execute(
+                    "DELETE FROM samples WHERE channel = ? AND ts < ?",
+                    (channel, _to_ns(now - retention)),
+                )
+            self._conn.commit()
+        self._last_evict = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _to_ns(value):
+    return int(to_datetime64(value).astype(np.int64))
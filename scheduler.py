@@ -0,0 +1,224 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FetchJob:
+    """Eine periodische Abfrage mit eigenem Intervall, Timeout und Jitter.
+
+    ``func`` ist ein synchroner Aufruf (z.B. ``DataThread.run``) und läuft im
+    Thread-Pool des Schedulers. Läuft ein Job zum nächsten Termin noch, wird
+    höchstens ``max_pending`` Mal nachgeholt, jeder weitere Termin zählt als
+    verpasst. ``background``-Jobs (lange Nachladeläufe) laufen in einem
+    eigenen Worker und belegen nie die Worker der Live-Abfragen.
+    """
+
+    def __init__(self, name, func, interval, timeout=None, jitter=0.0, max_pending=1,
+                 background=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout
+        self.jitter = jitter
+        self.max_pending = max_pending
+        self.background = background
+
+        self.running = False
+        self.pending = 0
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.missed_deadlines = 0
+        self.last_duration_ms = 0.0
+        self.max_duration_ms = 0.0
+        self.last_run = None
+        self.next_run = None
+        # Pausierte Jobs überspringen ihre Termine (z.B. solange ihre Seite verdeckt ist)
+        self.paused = False
+        # Aufrufe listener(job), sobald der nächste Termin (next_run) feststeht
+        self.listeners = []
+
+    def metrics(self):
+        return {
+            "interval": self.interval,
+            "running": self.running,
+            "pending": self.pending,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "missed_deadlines": self.missed_deadlines,
+            "last_duration_ms": self.last_duration_ms,
+            "max_duration_ms": self.max_duration_ms,
+        }
+
+
+class FetchScheduler:
+    """Plant alle Abfragen auf einer asyncio-Eventloop (unter Qt über qasync).
+
+    Die eigentlichen Abfragen laufen parallel in einem gemeinsamen Thread-Pool
+    und teilen sich den InfluxDB-Client, die Eventloop koordiniert nur Termine,
+    Timeouts und Rückstau. Hintergrund-Jobs teilen sich einen einzelnen
+    zusätzlichen Worker, laufen also nacheinander.
+    """
+
+    def __init__(self, max_workers=4, loop=None):
+        self.max_workers = max_workers
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="fetch")
+        # Threads lassen sich nicht abbrechen: ohne eigenen Worker würden zwei
+        # lange Nachladeläufe beide Worker belegen und die Anzeige anhalten
+        self.background_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="backfill")
+        self.jobs = {}
+        self._tasks = []
+        self._stopped = False
+        # Laufende Aufrufe in den Workern, stop() wartet auf sie
+        self._active = 0
+        self._idle = threading.Condition()
+        self._submitted = 0
+        self._started = 0
+
+    def add_job(self, job):
+        self.jobs[job.name] = job
+        if self._tasks:
+            self._tasks.append(self.loop.create_task(self.__tick(job)))
+        return job
+
+    def start(self):
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        for job in self.jobs.values():
+            self._tasks.append(self.loop.create_task(self.__tick(job)))
+
+    def stop(self, timeout=5.0):
+        """Plant nichts mehr ein und wartet bis zu ``timeout`` Sekunden auf laufende Abfragen.
+
+        Erst danach dürfen InfluxDB-Client und Cache geschlossen werden. Gibt
+        False zurück, wenn noch Abfragen laufen (die schlagen dann am
+        geschlossenen Client fehl, statt ihn neu zu öffnen).
+        """
+        self._stopped = True
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        # Wartende Läufe verwerfen, laufende Threads lassen sich nicht abbrechen
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.background_executor.shutdown(wait=False, cancel_futures=True)
+        with self._idle:
+            idle = self._idle.wait_for(lambda: self._active == 0, timeout)
+        if not idle:
+            print(f"{self._active} fetch job(s) still running at shutdown")
+        return idle
+
+    def trigger(self, name):
+        """Startet einen Job sofort (oder merkt ihn vor, falls er gerade läuft)."""
+        job = self.jobs[name]
+        if self._stopped:
+            return
+        if not job.running:
+            job.running = True
+            self.loop.create_task(self.__execute(job))
+        elif job.pending < job.max_pending:
+            job.pending += 1
+        else:
+            job.missed_deadlines += 1
+
+    def trigger_idle(self, name, min_interval=0):
+        """Wie trigger, aber nur, wenn der Job nicht läuft und seit ``min_interval`` Sekunden nicht lief."""
+        job = self.jobs.get(name)
+        if job is None or job.running:
+            return
+        if job.last_run is None or time.time() - job.last_run > min_interval:
+            self.trigger(name)
+
+    def pause(self, name):
+        self.jobs[name].paused = True
+
+    def resume(self, name):
+        """Setzt einen pausierten Job fort und holt den verpassten Abruf sofort nach."""
+        job = self.jobs[name]
+        if job.paused:
+            job.paused = False
+            self.trigger(name)
+
+    async def __tick(self, job):
+        next_deadline = self.loop.time()
+        while True:
+            delay = next_deadline - self.loop.time()
+            if job.jitter:
+                delay += random.uniform(0, job.jitter)
+            job.next_run = time.time() + max(delay, 0)
+            for listener in job.listeners:
+                listener(job)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not job.paused:
+                self.trigger(job.name)
+            next_deadline += job.interval
+            # Liegt die Eventloop weit zurück, nicht alle Termine nachholen
+            now = self.loop.time()
+            if next_deadline < now:
+                skipped = int((now - next_deadline) // job.interval) + 1
+                job.missed_deadlines += skipped
+                next_deadline += skipped * job.interval
+
+    async def __execute(self, job):
+        try:
+            while True:
+                await self.__run_once(job)
+                if job.pending == 0 or self._stopped:
+                    break
+                job.pending -= 1
+        finally:
+            job.running = False
+
+    async def __run_once(self, job):
+        self._submitted += 1
+
+        def call():
+            self._started += 1
+            with self._idle:
+                self._active += 1
+            start = time.perf_counter()
+            try:
+                return job.func()
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                job.last_duration_ms = elapsed
+                job.max_duration_ms = max(job.max_duration_ms, elapsed)
+                with self._idle:
+                    self._active -= 1
+                    self._idle.notify_all()
+
+        executor = self.background_executor if job.background else self.executor
+        future = self.loop.run_in_executor(executor, call)
+        job.last_run = time.time()
+        try:
+            # Der Thread lässt sich nicht abbrechen: bei Überschreitung wird nur
+            # gezählt und trotzdem auf das Ende gewartet, damit sich Läufe
+            # desselben Jobs nie überlappen
+            done, _ = await asyncio.wait({future}, timeout=job.timeout)
+            if not done:
+                job.timeouts += 1
+                job.missed_deadlines += 1
+                print(f"Fetch job '{job.name}' exceeded timeout of {job.timeout}s")
+            await future
+            job.runs += 1
+        except Exception as e:
+            job.failures += 1
+            print(f"Fetch job '{job.name}' failed: {e}")
+
+    def queue_depth(self):
+        """Anzahl der Läufe, die auf einen freien Worker oder ihren Vorgänger warten."""
+        waiting = self._submitted - self._started
+        return waiting + sum(job.pending for job in self.jobs.values())
+
+    def metrics(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "missed_deadlines": sum(job.missed_deadlines for job in self.jobs.values()),
+            "jobs": {name: job.metrics() for name, job in self.jobs.items()},
+        }
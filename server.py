@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import WSMsgType, web
+
+from channels import ChannelRegistry
+from influx_client import InfluxService
+from metrics import registry
+from pipeline import EnergyFetcher, PlotFetcher, RollupFetcher, StatsFetcher
+from sample_cache import SampleCache
+from scheduler import FetchJob, FetchScheduler
+from tariff import CostEngine, Tariff
+
+PLOT_WINDOW = timedelta(hours=12)
+
+
+def serialize_data(data_dict):
+    """data_dict aus StatsFetcher als JSON-taugliches Dictionary."""
+    return {
+        field: {
+            "_time": record["_time"].isoformat() if isinstance(record.get("_time"), datetime) else record.get("_time"),
+            "_value": record.get("_value"),
+            "_measurement": record.get("_measurement"),
+            "uuid": record.get("uuid"),
+        }
+        for field, record in data_dict.items()
+    }
+
+
+def serialize_series(series):
+    """TimeSeries als Zeitstempel (ms seit 1970, UTC) und Werte."""
+    return {
+        "times": (series.epoch_seconds() * 1000).astype("int64").tolist(),
+        "values": series.values.tolist(),
+    }
+
+
+class DashboardState:
+    """Hält die zuletzt berechneten Daten fertig serialisiert samt ETag vor.
+
+    Alle Clients bekommen dieselben Bytes; geändert wird nur, wenn sich der
+    Inhalt tatsächlich geändert hat. Wann die Daten zuletzt erfolgreich
+    abgefragt wurden, steht daher nicht im Inhalt, sondern wird je Antwort als
+    Alter (``X-Data-Age``, Sekunden) mitgeschickt.
+    """
+
+    def __init__(self):
+        self.payloads = {}  # name -> (etag, body)
+        self.fetched = {}  # name -> Unix-Zeit des letzten erfolgreichen Abrufs
+        self.subscribers = set()
+
+    def get(self, name):
+        return self.payloads.get(name)
+
+    def age(self, name):
+        """Sekunden seit dem letzten erfolgreichen Abruf oder None (nur Cache-Daten)."""
+        fetched = self.fetched.get(name)
+        if fetched is None:
+            return None
+        return max(time.time() - fetched, 0.0)
+
+    def publish(self, name, obj, fetched_at=None):
+        if fetched_at is not None:
+            self.fetched[name] = fetched_at
+        body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        current = self.payloads.get(name)
+        if current is not None and current[0] == etag:
+            return False
+        self.payloads[name] = (etag, body)
+        message = self.__message(name, etag, body)
+        for ws in list(self.subscribers):
+            asyncio.ensure_future(self.__send(ws, message))
+        return True
+
+    @staticmethod
+    def __message(name, etag, body):
+        return '{"type":"%s","etag":%s,"data":%s}' % (name, json.dumps(etag), body.decode("utf-8"))
+
+    async def __send(self, ws, message):
+        try:
+            await ws.send_str(message)
+        except (ConnectionError, RuntimeError):
+            self.subscribers.discard(ws)
+
+    async def send_all(self, ws):
+        for name, (etag, body) in list(self.payloads.items()):
+            await ws.send_str(self.__message(name, etag, body))
+
+
+def make_app(state, cache=None, costs=None):
+    async def conditional(request, name):
+        payload = state.get(name)
+        if payload is None:
+            return web.Response(status=503, text="Noch keine Daten")
+        etag, body = payload
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        age = state.age(name)
+        if age is not None:
+            headers["X-Data-Age"] = f"{age:.3f}"
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+    async def consumption(request):
+        return await conditional(request, "consumption")
+
+    async def plot(request):
+        return await conditional(request, "plot")
+
+    async def counters(request):
+        # 15-Minuten-Zählerstände (kWh) einer Rolle ab ``since`` (Unix-Zeit), für die CostEngine der Clients
+        role = request.query.get("role")
+        if role not in ("import", "export"):
+            return web.Response(status=400, text="role muss import oder export sein")
+        try:
+            since = datetime.fromtimestamp(float(request.query.get("since", 0)), tz=timezone.utc)
+        except ValueError:
+            return web.Response(status=400, text="since muss eine Unix-Zeit sein")
+        # Auch die laufend fortgeschriebenen, noch nicht gespeicherten Intervalle ausliefern
+        costs.persist()
+        series = cache.load(f"counter_{role}_15m", since=since)
+        return web.json_response(serialize_series(series))
+
+    async def rollups(request):
+        # Tageswerte ab ``since`` (JJJJ-MM-TT) für die Kalenderseite der Clients
+        return web.json_response(cache.load_rollups("day", request.query.get("since")))
+
+    async def websocket(request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        await state.send_all(ws)
+        state.subscribers.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            state.subscribers.discard(ws)
+        return ws
+
+    async def metrics(request):
+        return web.Response(text=registry.to_prometheus(), content_type="text/plain")
+
+    async def metrics_json(request):
+        return web.Response(text=registry.to_json(), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/api/energy/consumption", consumption)
+    app.router.add_get("/api/energy/plot", plot)
+    app.router.add_get("/api/energy/ws", websocket)
+    if cache is not None:
+        app.router.add_get("/api/energy/counters", counters)
+        app.router.add_get("/api/energy/rollups", rollups)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/metrics.json", metrics_json)
+    return app
+
+
+async def serve(host="0.0.0.0", port=5000):
+    loop = asyncio.get_running_loop()
+    influx = InfluxService()
+    channels = ChannelRegistry.load()
+    cache = SampleCache()
+    stats = StatsFetcher(influx, channels, cache)
+    plot = PlotFetcher(influx, channels, cache)
+    # Kosten und Kalender rechnet der Server wie die Anzeige, Clients holen sich nur das Ergebnis
+    costs = CostEngine(Tariff.load(), cache)
+    costs.restore()
+    energy = EnergyFetcher(influx, channels, costs)
+    rollups = RollupFetcher(influx, channels, cache)
+    state = DashboardState()
+
+    # Sofort aus dem lokalen Cache antworten können
+    cached = stats.restore()
+    if cached:
+        state.publish("consumption", serialize_data(cached))
+    series = plot.restore()
+    if series:
+        state.publish("plot", serialize_series(series))
+
+    def fetch_stats():
+        data = stats.fetch()
+        costs.update(data)
+        if costs.gaps:
+            loop.call_soon_threadsafe(scheduler.trigger_idle, "energy", 60)
+        payload = serialize_data(data)
+        loop.call_soon_threadsafe(
+            state.publish, "consumption", payload, stats.fetched_at.timestamp())
+
+    def fetch_plot():
+        nonlocal series
+        series = series.concat(plot.fetch()).slice_since(
+            datetime.now(timezone.utc) - PLOT_WINDOW)
+        payload = serialize_series(series)
+        loop.call_soon_threadsafe(state.publish, "plot", payload)
+
+    scheduler = FetchScheduler(max_workers=2, loop=loop)
+    scheduler.add_job(FetchJob("stats", fetch_stats, interval=2, timeout=10, jitter=0.2))
+    scheduler.add_job(FetchJob("plot", fetch_plot, interval=10, timeout=30, jitter=1))
+    scheduler.add_job(FetchJob("energy", energy.fetch, interval=3600, timeout=60, jitter=5,
+                               background=True))
+    scheduler.add_job(FetchJob("rollups", rollups.fetch, interval=3600, timeout=300, jitter=10,
+                               background=True))
+    scheduler.start()
+    registry.gauge("scheduler_queue_depth", scheduler.queue_depth,
+                   "Wartende Abfragen im FetchScheduler")
+    registry.gauge("scheduler_missed_deadlines", lambda: scheduler.metrics()["missed_deadlines"],
+                   "Verpasste Abfragetermine")
+    registry.gauge("websocket_clients", lambda: len(state.subscribers),
+                   "Verbundene WebSocket-Clients")
+
+    runner = web.AppRunner(make_app(state, cache, costs))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(f"Headless server running on http://{host}:{port}/api/energy/consumption")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.stop()
+        await runner.cleanup()
+        influx.close()
+        stats.flush()
+        costs.persist()
+        cache.close()
+
+
+def run_headless(host="0.0.0.0", port=5000):
+    """Startet Abfrage und Aufbereitung ohne Oberfläche und verteilt die Daten per HTTP/WebSocket."""
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
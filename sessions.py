@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from local_storage import TIME_FORMAT
+from timeseries import LOCAL_TZ
+
+
+def parse_time(text):
+    """Zeitangabe aus dem DataHandler (Ortszeit als Text) als datetime."""
+    return datetime.strptime(text, TIME_FORMAT).replace(tzinfo=LOCAL_TZ)
+
+
+class SessionLog:
+    """Mehrere gleichzeitig laufende, benannte Zähler-Sitzungen samt Verlauf.
+
+    Gespeichert wird über den DataHandler nur Start (und Stopp) mit
+    Zählerstand. Verbrauch und Kosten kommen aus den 15-Minuten-Zählerständen
+    der CostEngine, d.h. auch hunderte alte Sitzungen brauchen keine einzige
+    Influx-Abfrage. Beim Stoppen werden die Ergebnisse im Verlauf mitgespeichert.
+    """
+
+    def __init__(self, store, costs):
+        self.store = store
+        self.costs = costs
+
+    def running(self):
+        return self.store.counters()
+
+    def next_name(self):
+        taken = set(self.running()) | set(self.store.histories())
+        number = 1
+        while f"Sitzung {number}" in taken:
+            number += 1
+        return f"Sitzung {number}"
+
+    def start(self, name, counter):
+        self.store.start_counter(counter, name=name)
+
+    def current(self, name, counter):
+        """Verbrauch (kWh) und Kosten einer laufenden Sitzung bis jetzt."""
+        session = self.store.get_counter(name)
+        if session is None:
+            return None
+        summary = self.costs.summary(parse_time(session['start_time']))
+        return {
+            'name': name,
+            'start_time': session['start_time'],
+            'kwh': counter - session['start_value'],
+            'cost': summary['net_cost'],
+        }
+
+    def stop(self, name, counter):
+        session = self.store.get_counter(name)
+        if session is None:
+            return None
+        summary = self.costs.summary(parse_time(session['start_time']))
+        return self.store.stop_counter(counter, name=name, summary={
+            'kwh': counter - session['start_value'],
+            'cost': summary['net_cost'],
+        })
+
+    def history(self, limit=None):
+        """Abgeschlossene Sitzungen aller Namen, neueste zuerst."""
+        entries = []
+        for name, runs in self.store.histories().items():
+            for run in runs:
+                entries.append(dict(run, name=name))
+        entries.sort(key=lambda entry: parse_time(entry['stop_time']), reverse=True)
+        if limit is not None:
+            entries = entries[:limit]
+        for entry in entries:
+            if entry.get('kwh') is None or entry.get('cost') is None:
+                # Ältere Einträge ohne gespeichertes Ergebnis aus dem Index nachrechnen
+                summary = self.costs.summary(parse_time(entry['start_time']),
+                                             parse_time(entry['stop_time']))
+                if entry.get('stop_value') is not None:
+                    entry['kwh'] = entry['stop_value'] - entry['start_value']
+                else:
+                    entry['kwh'] = summary['import_kwh']
+                entry['cost'] = summary['net_cost']
+        return entries
@@ -0,0 +1,67 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+class SnapshotStore:
+    """Letzter bekannter Stand aller Anzeigewerte, je Feld mit Zeitpunkt der letzten Bestätigung.
+
+    Jeder Abruf wird nur eingemischt: Felder, die eine Teilabfrage gerade nicht
+    liefert (z.B. keine Anomalie-Werte in den letzten 10 Minuten oder kurz nach
+    Mitternacht), behalten ihren letzten Wert. Ein Feld gilt als veraltet,
+    wenn es länger als ``stale_after`` (bzw. ``overrides[feld]``) nicht mehr
+    bestätigt wurde. Werte aus dem lokalen Cache gelten bis zur ersten
+    Bestätigung durch die InfluxDB als veraltet.
+
+    Felder in ``expiring`` (z.B. Anomalie-Flags) sind Zustände statt Messwerte:
+    sie werden nicht als letzter Stand festgehalten, sondern verfallen. Ein
+    veraltetes oder nur aus dem Cache stammendes Feld gilt als nicht vorhanden.
+    """
+
+    def __init__(self, stale_after=timedelta(seconds=30), overrides=None, expiring=()):
+        self.stale_after = stale_after
+        self.overrides = overrides or {}
+        self.expiring = frozenset(expiring)
+        self._records = {}
+        self._confirmed = {}  # Feld -> Zeitpunkt (UTC) der letzten Bestätigung oder None
+        # Gelesen wird auch aus dem Thread des Metrik-Servers
+        self._lock = threading.Lock()
+
+    def merge(self, data, confirmed=True, now=None):
+        """Übernimmt alle Felder aus ``data``; fehlende Felder bleiben unverändert."""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            for field, record in data.items():
+                if record is None or record.get("_value") is None:
+                    continue
+                self._records[field] = record
+                if confirmed:
+                    self._confirmed[field] = now
+                else:
+                    self._confirmed.setdefault(field, None)
+
+    def get(self, field):
+        """Letzter bekannter Datensatz eines Felds oder None (auch bei verfallenen Feldern)."""
+        if field in self.expiring and self.is_stale(field):
+            return None
+        return self._records.get(field)
+
+    def __contains__(self, field):
+        return self.get(field) is not None
+
+    def confirmed_at(self, field):
+        return self._confirmed.get(field)
+
+    def is_stale(self, field, now=None):
+        """Feld fehlt ganz, stammt nur aus dem Cache oder wurde zu lange nicht bestätigt."""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            confirmed = self._confirmed.get(field)
+        if confirmed is None:
+            return True
+        return now - confirmed > self.overrides.get(field, self.stale_after)
+
+    def stale_fields(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            fields = [field for field in self._records if field not in self.expiring]
+        return [field for field in fields if self.is_stale(field, now)]
@@ -0,0 +1,57 @@
+import resource
+import sys
+import time
+
+# Module, deren Import den Start spürbar verlängert; im Bericht steht, ob sie
+# schon geladen wurden (sie sollten erst bei Bedarf nachgeladen werden)
+HEAVY_MODULES = ("matplotlib", "influxdb_client")
+
+
+def peak_rss_bytes():
+    """Maximaler Speicherverbrauch des Prozesses in Bytes."""
+    # ru_maxrss ist unter Linux in KiB angegeben
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StartupProfile:
+    """Zeitmarken vom Programmstart bis zur ersten Anzeige (``--profile-startup``).
+
+    Jede Marke wird nur beim ersten Erreichen gespeichert. Nach ``report()``
+    eintreffende Marken (z.B. erst später aufgebaute Seiten) werden direkt
+    ausgegeben.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.marks = {}
+        self.reported = False
+
+    def mark(self, label):
+        if label in self.marks:
+            return
+        now = time.perf_counter()
+        self.marks[label] = now
+        if self.enabled and self.reported:
+            print(f"[startup] {label}: +{(now - self.started) * 1000:.0f} ms")
+
+    def report(self, after=()):
+        """Gibt die Zeitmarken einmalig aus (nur mit ``--profile-startup``).
+
+        Mit ``after`` erst, wenn alle diese Marken erreicht sind.
+        """
+        if not self.enabled or self.reported:
+            return
+        if any(label not in self.marks for label in after):
+            return
+        self.reported = True
+        print("[startup] Marke                          seit Start   Schritt")
+        previous = self.started
+        for label, at in sorted(self.marks.items(), key=lambda item: item[1]):
+            print(f"[startup] {label:<30} {(at - self.started) * 1000:8.0f} ms "
+                  f"{(at - previous) * 1000:7.0f} ms")
+            previous = at
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        peak = peak_rss_bytes() / 2**20
+        print(f"[startup] {len(sys.modules)} Module geladen, schwer: "
+              f"{', '.join(loaded) or 'keine'}; max. RSS {peak:.0f} MiB")
@@ -0,0 +1,324 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from timeseries import LOCAL_TZ, TimeSeries
+
+# Standardtarif, falls keine tariff.json vorhanden ist (entspricht dem
+# bisherigen Festpreis ohne Einspeisevergütung)
+default_tariff = {
+    "import": {"price": 0.31, "periods": []},
+    "export": {"price": 0.0, "periods": []},
+}
+
+# Volkszähler liefert beide Zählerstände in Wh
+WH_PER_KWH = 1000.0
+
+
+class PricePeriod:
+    """Preis für ein Zeitfenster des Tages (Ortszeit), optional nur an bestimmten Wochentagen.
+
+    ``start``/``end`` als "HH:MM"; liegt ``end`` vor ``start``, geht das
+    Fenster über Mitternacht. ``days`` sind Wochentage (0 = Montag).
+    """
+
+    def __init__(self, start, end, price, days=None):
+        self.start = _minutes(start)
+        self.end = _minutes(end)
+        self.price = price
+        self.days = days
+
+    def covers(self, minute_of_day, weekday):
+        """Vektorisiert: welche (Minute, Wochentag)-Paare fallen in dieses Fenster."""
+        if self.start <= self.end:
+            mask = (minute_of_day >= self.start) & (minute_of_day < self.end)
+        else:
+            mask = (minute_of_day >= self.start) | (minute_of_day < self.end)
+        if self.days is not None:
+            mask &= np.isin(weekday, self.days)
+        return mask
+
+
+class PriceSchedule:
+    """Grundpreis plus zeitabhängige Preise (das erste passende Fenster gilt), in EUR/kWh."""
+
+    def __init__(self, price, periods=()):
+        self.price = price
+        self.periods = list(periods)
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry.get("price", 0.0),
+                   [PricePeriod(**period) for period in entry.get("periods", [])])
+
+    def prices(self, epoch_seconds):
+        """Preise für Zeitpunkte (Unix-Zeit), ausgewertet in Ortszeit."""
+        epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+        result = np.full(len(epoch_seconds), float(self.price))
+        if not self.periods or not len(epoch_seconds):
+            return result
+        local = TimeSeries.from_epoch(epoch_seconds, np.zeros(len(epoch_seconds))).local_times(LOCAL_TZ)
+        days = local.astype("datetime64[D]")
+        minute_of_day = (local - days).astype("timedelta64[m]").astype(np.int64)
+        # 1970-01-01 war ein Donnerstag
+        weekday = (days.astype(np.int64) + 3) % 7
+        # Rückwärts, damit das erste passende Fenster zuletzt schreibt und gewinnt
+        for period in reversed(self.periods):
+            result[period.covers(minute_of_day, weekday)] = period.price
+        return result
+
+
+class Tariff:
+    """Bezugspreis und Einspeisevergütung, geladen aus einer JSON-Datei."""
+
+    def __init__(self, import_schedule, export_schedule):
+        self.import_schedule = import_schedule
+        self.export_schedule = export_schedule
+
+    @classmethod
+    def load(cls, filename='tariff.json'):
+        """Lädt den Tarif aus einer JSON-Datei, bei Fehlern gilt der Standardtarif."""
+        entries = default_tariff
+        try:
+            if os.path.exists(filename):
+                with open(filename, 'r') as file:
+                    entries = json.load(file)
+        except json.JSONDecodeError as e:
+            print(f"Invalid tariff config {filename}: {e}")
+        except Exception as e:
+            print(f"General error when accessing file: {e}")
+        try:
+            return cls(PriceSchedule.from_dict(entries["import"]),
+                       PriceSchedule.from_dict(entries.get("export", {})))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Invalid tariff config {filename}: {e}")
+            return cls(PriceSchedule.from_dict(default_tariff["import"]),
+                       PriceSchedule.from_dict(default_tariff["export"]))
+
+
+class EnergyBuckets:
+    """Energie je 15-Minuten-Intervall mit Präfixsummen für Energie und Kosten.
+
+    Gespeichert wird je Intervall der höchste darin gesehene Zählerstand.
+    Zählerstände steigen monoton, daher ist die Reihenfolge der Meldungen
+    egal (Live-Werte und nachgeladene Werte können sich überholen). Die
+    Energie eines Intervalls ist die Differenz zum letzten bekannten Stand
+    davor; Lücken werden dem ersten Intervall danach zugeschlagen.
+
+    Präfixsummen werden nur ab dem ersten geänderten Intervall neu berechnet,
+    Abfragen über beliebige Zeiträume kosten danach O(1).
+    """
+
+    def __init__(self, schedule, bucket_seconds=900):
+        self.schedule = schedule
+        self.bucket_seconds = bucket_seconds
+        self.origin = None  # Index (Unix-Zeit // bucket_seconds) des ersten Intervalls
+        self.counters = np.empty(0)  # höchster Zählerstand je Intervall, NaN = keiner
+        self.prices = np.empty(0)
+        self._filled = np.empty(0)  # Zählerstände mit Lücken vorwärts aufgefüllt
+        self._energy = np.zeros(1)  # Präfixsummen, Länge n + 1
+        self._cost = np.zeros(1)
+        self._dirty = None  # erstes Intervall, ab dem die Präfixsummen veraltet sind
+        self._unsaved = None  # erstes Intervall, das noch nicht gespeichert wurde
+
+    def __len__(self):
+        return len(self.counters)
+
+    def add(self, epoch_seconds, counter):
+        self.add_series(np.array([epoch_seconds], dtype=np.float64), np.array([counter]))
+
+    def add_series(self, epoch_seconds, counters):
+        epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+        counters = np.asarray(counters, dtype=np.float64)
+        if not len(epoch_seconds):
+            return
+        buckets = (epoch_seconds // self.bucket_seconds).astype(np.int64)
+        self.__ensure(int(buckets.min()), int(buckets.max()))
+        offsets = buckets - self.origin
+        np.fmax.at(self.counters, offsets, counters)
+        first = int(offsets.min())
+        self._dirty = first if self._dirty is None else min(self._dirty, first)
+        self._unsaved = first if self._unsaved is None else min(self._unsaved, first)
+
+    def __ensure(self, first, last):
+        # Arrays nach vorn bzw. hinten um fehlende Intervalle erweitern
+        if self.origin is None:
+            self.origin = first
+        if first < self.origin:
+            missing = self.origin - first
+            starts = (first + np.arange(missing)) * self.bucket_seconds
+            self.counters = np.concatenate([np.full(missing, np.nan), self.counters])
+            self.prices = np.concatenate([self.schedule.prices(starts), self.prices])
+            self._filled = np.concatenate([np.full(missing, np.nan), self._filled])
+            self._energy = np.zeros(len(self.counters) + 1)
+            self._cost = np.zeros(len(self.counters) + 1)
+            self.origin = first
+            self._dirty = 0
+            if self._unsaved is not None:
+                self._unsaved += missing
+        end = self.origin + len(self.counters)
+        if last >= end:
+            missing = last - end + 1
+            starts = (end + np.arange(missing)) * self.bucket_seconds
+            self.counters = np.concatenate([self.counters, np.full(missing, np.nan)])
+            self.prices = np.concatenate([self.prices, self.schedule.prices(starts)])
+            self._filled = np.concatenate([self._filled, np.full(missing, np.nan)])
+            self._energy = np.concatenate([self._energy, np.zeros(missing)])
+            self._cost = np.concatenate([self._cost, np.zeros(missing)])
+
+    def __recompute(self):
+        d = self._dirty
+        if d is None:
+            return
+        previous = self._filled[d - 1] if d > 0 else np.nan
+        segment = self.counters[d:]
+        # Lücken mit dem letzten bekannten Zählerstand auffüllen
+        valid = ~np.isnan(segment)
+        index = np.where(valid, np.arange(len(segment)), -1)
+        np.maximum.accumulate(index, out=index)
+        filled = np.where(index >= 0, segment[np.maximum(index, 0)], previous)
+        self._filled[d:] = filled
+        energy = np.diff(np.concatenate([[previous], filled]))
+        # Erstes Intervall überhaupt bzw. Zählerwechsel (Stand fällt): keine Energie
+        energy = np.where(np.isnan(energy) | (energy < 0), 0.0, energy)
+        self._energy[d + 1:] = self._energy[d] + np.cumsum(energy)
+        self._cost[d + 1:] = self._cost[d] + np.cumsum(energy * self.prices[d:])
+        self._dirty = None
+
+    def __span(self, start, end):
+        if self.origin is None:
+            return 0, 0
+        first = int(start // self.bucket_seconds) - self.origin
+        last = -(-int(end) // self.bucket_seconds) - self.origin
+        n = len(self.counters)
+        return min(max(first, 0), n), min(max(last, 0), n)
+
+    def energy(self, start, end):
+        """Energie zwischen zwei Zeitpunkten (Unix-Zeit, auf Intervalle gerundet)."""
+        self.__recompute()
+        i, j = self.__span(start, end)
+        return float(self._energy[j] - self._energy[i])
+
+    def cost(self, start, end):
+        self.__recompute()
+        i, j = self.__span(start, end)
+        return float(self._cost[j] - self._cost[i])
+
+    def last_time(self):
+        """Beginn des letzten Intervalls mit Zählerstand (Unix-Zeit) oder None."""
+        valid = np.nonzero(~np.isnan(self.counters))[0]
+        if not len(valid):
+            return None
+        return float((self.origin + valid[-1]) * self.bucket_seconds)
+
+    def take_unsaved(self):
+        """Gibt die seit dem letzten Aufruf geänderten Intervalle als TimeSeries zurück."""
+        if self._unsaved is None:
+            return TimeSeries()
+        offsets = np.arange(self._unsaved, len(self.counters))
+        values = self.counters[self._unsaved:]
+        valid = ~np.isnan(values)
+        self._unsaved = None
+        return TimeSeries.from_epoch(
+            (self.origin + offsets[valid]) * self.bucket_seconds, values[valid])
+
+
+class CostEngine:
+    """Kosten für Bezug und Vergütung für Einspeisung über beliebige Zeiträume.
+
+    Wird aus den Zählerständen jeder Abfrage fortgeschrieben (``update``) und
+    beim Start aus dem SampleCache bzw. per EnergyFetcher aus der InfluxDB
+    nachgeladen. Die Werte liegen in kWh und EUR vor.
+
+    Laufende Zählerstände werden nur übernommen, wenn sie lückenlos an das
+    letzte Intervall anschließen (höchstens ``max_gap`` dazwischen). Sonst
+    landete die ganze Energie einer Lücke im ersten Intervall danach; die
+    Rolle wird stattdessen in ``gaps`` vermerkt, bis der EnergyFetcher die
+    Lücke geschlossen hat.
+    """
+
+    def __init__(self, tariff, cache=None, retention=timedelta(days=400),
+                 max_gap=timedelta(minutes=30)):
+        self.tariff = tariff
+        self.cache = cache
+        self.retention = retention
+        self.max_gap = max_gap
+        self.gaps = set()
+        self.buckets = {
+            "import": EnergyBuckets(tariff.import_schedule),
+            "export": EnergyBuckets(tariff.export_schedule),
+        }
+        self._lock = threading.Lock()
+
+    def restore(self):
+        if self.cache is None:
+            return
+        since = datetime.now(LOCAL_TZ) - self.retention
+        for role, buckets in self.buckets.items():
+            series = self.cache.load(f"counter_{role}_15m", since=since)
+            with self._lock:
+                buckets.add_series(series.epoch_seconds(), series.values)
+                buckets.take_unsaved()
+
+    def add_series(self, role, epoch_seconds, counters_kwh):
+        """Übernimmt nachgeladene Zählerstände; schließt eine vermerkte Lücke."""
+        with self._lock:
+            self.buckets[role].add_series(epoch_seconds, counters_kwh)
+            self.gaps.discard(role)
+
+    def update(self, data):
+        """Übernimmt die aktuellen Zählerstände aus einem data_dict."""
+        for role, field in (("import", "currentCounter"), ("export", "currentCounterDelivery")):
+            record = data.get(field)
+            if record is None or record.get("_time") is None:
+                continue
+            timestamp = record["_time"].timestamp()
+            with self._lock:
+                buckets = self.buckets[role]
+                last = buckets.last_time()
+                if last is None or timestamp - last > buckets.bucket_seconds + self.max_gap.total_seconds():
+                    self.gaps.add(role)
+                    continue
+                buckets.add(timestamp, record["_value"] / WH_PER_KWH)
+
+    def summary(self, start, end=None):
+        """Energie, Kosten und Vergütung zwischen ``start`` und ``end`` (datetime)."""
+        start = start.timestamp()
+        end = end.timestamp() if end is not None else time.time()
+        with self._lock:
+            imported = self.buckets["import"]
+            exported = self.buckets["export"]
+            result = {
+                "import_kwh": imported.energy(start, end),
+                "export_kwh": exported.energy(start, end),
+                "import_cost": imported.cost(start, end),
+                "export_credit": exported.cost(start, end),
+            }
+        result["net_cost"] = result["import_cost"] - result["export_credit"]
+        return result
+
+    def last_time(self, role):
+        """Letztes lückenlos bekanntes Intervall einer Rolle (Unix-Zeit) oder None.
+
+        Laufende Werte hängen nur direkt daran an, ab hier muss also nachgeladen werden.
+        """
+        with self._lock:
+            return self.buckets[role].last_time()
+
+    def persist(self):
+        if self.cache is None:
+            return
+        for role, buckets in self.buckets.items():
+            with self._lock:
+                series = buckets.take_unsaved()
+            if series:
+                self.cache.add_samples(f"counter_{role}_15m", series)
+
+
+def _minutes(text):
+    hours, minutes = text.split(":")
+    return int(hours) * 60 + int(minutes)
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+LOCAL_TZ = ZoneInfo("Europe/Berlin")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class TimeSeries:
+    """Kompakte Zeitreihe aus NumPy-Arrays.
+
+    Zeitpunkte liegen als ``datetime64[ns]`` in UTC vor, Werte als ``float64``.
+    ``replace_from`` gibt bei inkrementellen Abrufen an, ab welchem Zeitpunkt
+    bereits vorhandene Punkte ersetzt werden (None = komplette Reihe).
+    """
+
+    __slots__ = ("times", "values", "replace_from")
+
+    def __init__(self, times=None, values=None, replace_from=None):
+        if times is None:
+            times = np.empty(0, dtype="datetime64[ns]")
+        if values is None:
+            values = np.empty(0, dtype=np.float64)
+        self.times = np.asarray(times, dtype="datetime64[ns]")
+        self.values = np.asarray(values, dtype=np.float64)
+        self.replace_from = replace_from
+
+    @classmethod
+    def from_epoch(cls, seconds, values, replace_from=None):
+        """Erzeugt eine Zeitreihe aus Unix-Zeitstempeln (Sekunden, UTC)."""
+        ns = np.round(np.asarray(seconds, dtype=np.float64) * 1e9).astype(np.int64)
+        return cls(ns.view("datetime64[ns]"), values, replace_from)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __bool__(self):
+        return len(self.times) > 0
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    def last_time(self):
+        """Letzter Zeitpunkt als zeitzonenbehaftetes datetime (UTC) oder None."""
+        if not len(self.times):
+            return None
+        return to_datetime(self.times[-1])
+
+    def datetimes(self):
+        """Alle Zeitpunkte als datetime mit UTC-Zeitzone (Liste)."""
+        return [ts.replace(tzinfo=timezone.utc)
+                for ts in self.times.astype("datetime64[us]").tolist()]
+
+    def epoch_seconds(self):
+        return self.times.astype(np.int64) / 1e9
+
+    def local_times(self, tz=LOCAL_TZ):
+        """Rechnet alle Zeitpunkte vektorisiert in lokale (naive) Zeit um.
+
+        Der UTC-Offset wird nur einmal pro vorkommender Stunde über ZoneInfo
+        bestimmt, da Zeitumstellungen immer auf volle Stunden fallen.
+        """
+        if not len(self.times):
+            return self.times.copy()
+        hours = self.times.astype("datetime64[h]")
+        unique_hours, inverse = np.unique(hours, return_inverse=True)
+        offsets = np.array([
+            int(to_datetime(h).astimezone(tz).utcoffset().total_seconds())
+            for h in unique_hours
+        ], dtype=np.int64)
+        return self.times + (offsets[inverse] * 1_000_000_000).astype("timedelta64[ns]")
+
+    def slice_since(self, start):
+        """Teilreihe aller Punkte ab ``start`` (datetime oder datetime64)."""
+        start = to_datetime64(start)
+        idx = int(np.searchsorted(self.times, start, side="left"))
+        return TimeSeries(self.times[idx:], self.values[idx:])
+
+    def concat(self, other):
+        """Hängt ``other`` an und ersetzt dabei Punkte ab ``other.replace_from``."""
+        times, values = self.times, self.values
+        if other.replace_from is None:
+            return TimeSeries(other.times, other.values)
+        cut = int(np.searchsorted(times, to_datetime64(other.replace_from), side="right"))
+        return TimeSeries(
+            np.concatenate([times[:cut], other.times]),
+            np.concatenate([values[:cut], other.values]),
+        )
+
+
+def to_datetime64(value):
+    """Wandelt ein (zeitzonenbehaftetes) datetime in datetime64[ns] UTC um."""
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[ns]")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return np.datetime64(round(value.timestamp() * 1_000_000), "us").astype("datetime64[ns]")
+
+
+def to_datetime(value):
+    """Wandelt datetime64 in ein datetime mit UTC-Zeitzone um."""
+    us = int(np.asarray(value).astype("datetime64[us]").astype(np.int64))
+    return EPOCH + timedelta(microseconds=us)
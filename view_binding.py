@@ -0,0 +1,76 @@
+_MISSING = object()
+
+
+class ViewBinder:
+    """Verbindet Anzeigewerte mit Widgets und schreibt nur Änderungen durch.
+
+    Jeder Wert wird mit dem zuletzt dargestellten verglichen. Unveränderte
+    Werte lösen kein ``setText``/``display``/``setStyleSheet`` aus, Werte für
+    Widgets auf gerade nicht sichtbaren Seiten des ``QStackedWidget`` werden
+    vorgemerkt und erst beim Umblättern auf diese Seite angewendet.
+
+    Seiten können auch erst beim ersten Anzeigen aufgebaut werden: Werte für
+    noch nicht gebundene Schlüssel werden bis zum ``bind`` aufgehoben.
+    """
+
+    def __init__(self, stacked_widget):
+        self.stacked = stacked_widget
+        self._bindings = {}  # key -> (apply, seite)
+        self._rendered = {}  # key -> zuletzt dargestellter Wert
+        self._queued = {}  # seite -> {key: wert}
+        self._unbound = {}  # key -> wert, solange noch kein Widget existiert
+        self.applied = 0
+        self.skipped = 0
+        self.stacked.currentChanged.connect(self.__flush_page)
+
+    def bind(self, key, widget, apply):
+        """Registriert ``apply(wert)`` für ``key``; die Seite wird aus ``widget`` ermittelt."""
+        page = self.__page_of(widget)
+        self._bindings[key] = (apply, page)
+        if key in self._unbound:
+            value = self._unbound.pop(key)
+            if page is None or page is self.stacked.currentWidget():
+                self.set(key, value)
+            else:
+                self._queued.setdefault(page, {})[key] = value
+
+    def __page_of(self, widget):
+        # Widgets außerhalb des Stacked Widgets sind immer sichtbar (Seite None)
+        while widget is not None:
+            parent = widget.parentWidget()
+            if parent is self.stacked:
+                return widget
+            widget = parent
+        return None
+
+    def set(self, key, value):
+        """Setzt einen Anzeigewert. Gibt True zurück, wenn das Widget verändert wurde."""
+        if key not in self._bindings:
+            self._unbound[key] = value
+            self.skipped += 1
+            return False
+        apply, page = self._bindings[key]
+        if page is not None and page is not self.stacked.currentWidget():
+            queued = self._queued.setdefault(page, {})
+            if self._rendered.get(key, _MISSING) == value:
+                # Zwischenzeitliche Änderung hat sich erledigt
+                queued.pop(key, None)
+            else:
+                queued[key] = value
+            self.skipped += 1
+            return False
+        if self._rendered.get(key, _MISSING) == value:
+            self.skipped += 1
+            return False
+        apply(value)
+        self._rendered[key] = value
+        self.applied += 1
+        return True
+
+    def __flush_page(self, index):
+        page = self.stacked.widget(index)
+        for key, value in self._queued.pop(page, {}).items():
+            apply, _ = self._bindings[key]
+            apply(value)
+            self._rendered[key] = value
+            self.applied += 1